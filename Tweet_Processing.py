@@ -2,28 +2,25 @@
 A script for processing Tweets
 """
 
-import numpy as np
 import pandas as pd
-import sklearn.feature_extraction.text as text
-import re
 
-df1 = pd.read_csv("./data/sarw.csv")
-df2 = pd.read_csv("./data/info.csv")
-df3 = pd.read_csv("./data/uscg.csv")
-df4 = pd.read_csv("./data/last_week.csv")
+from incident_extractor import extract_incidents
+from keywords import RELEVANCE_RULE, KeywordMatcher
+from near_duplicates import collapse, find_clusters
+from ngrams import count_ngrams
 
-df = pd.concat([df1, df2, df3, df4])
+# incidents extracted with a lower confidence lack a date or a specific place,
+# or are statistics over a period rather than a single incident
+MIN_CONFIDENCE = 0.7
 
-tweetlist = df['Tweet'].tolist()
-
-# delete links
-for i in range(len(tweetlist)):
-    tweetlist[i] = re.sub(r'https\S+', '', tweetlist[i])
-
-    if tweetlist[i].startswith('RT'):
-        tweetlist[i] = tweetlist[i][3:]
+def confident_incidents(incidents):
+    """
+    Keeps the extracted incidents that can be added to the data: a place from the
+    gazetteer, so they can be shown on the map, and at least MIN_CONFIDENCE.
+    """
+    return incidents.loc[incidents['location'].notna() & (incidents['confidence'] >= MIN_CONFIDENCE)]
 
-def ng(t_input, max_features, ngram):
+def ng(counts, max_features, ngram):
     """
     Returns the top ngram words in a list of tweets.
     The aim is to see what words and word combinations appear to be the most common in the reports.
@@ -31,8 +28,8 @@ def ng(t_input, max_features, ngram):
 
     Parameters
     ----------
-    tweetlist : list
-        A list of tweets
+    counts : ngrams.NgramCounter
+        N-gram counts of a list of tweets, all orders counted in one pass
     max_features : int
         The maximum number of features to be used
     ngram : int
@@ -44,54 +41,10 @@ def ng(t_input, max_features, ngram):
         A pandas series of the top ngram words in the list of tweets
     
     """
-    tfidf = text.CountVectorizer(
-        input = t_input, 
-        ngram_range = (ngram, ngram),
-        max_features = max_features,
-        stop_words = 'english'
-        )
-    matrix = tfidf.fit_transform(t_input)
-    
-    return pd.Series(
-        np.array(matrix.sum(axis = 0))[0],
-        index = tfidf.get_feature_names_out()
-        ).sort_values(ascending = False).head(100)
-
-dm = []
-dates = []
-
-for tweet, date in zip(df['Tweet'], df['Date']):
-    if 'migrant' in tweet or 'migrants' in tweet:
-        if 'dead' in tweet or 'died' in tweet or 'death' in tweet or 'bodies' in tweet or 'missing' in tweet:
-            dm.append(tweet)
-            dates.append(date)
-
-unigrams = ng(
-    t_input = dm,
-    max_features = 5000,
-    ngram = 1
-    )
-bigrams = ng(
-    t_input = dm,
-    max_features = 5000,
-    ngram = 2
-    )
-trigrams = ng(
-    t_input = dm,
-    max_features = 5000,
-    ngram = 3
-    )
-
-# printing the most common words and word combinations in the tweets to get an idea of what kind of wording is used in reports
-print(unigrams.head(20))
-print(bigrams.head(20))
-print(trigrams.head(20))
-
-# print Tweets and dates for manual inspection
-for t,d in zip(dm, dates):
-    print('Tweet: ' + t + ' Date: ' + d)
-
-# manually inputting data gathered by reading processed Tweets 
+    return counts.top(ngram, limit = 100, max_features = max_features)
+
+# data gathered manually by reading processed Tweets, kept as the evaluation
+# set of the automatic extraction (benchmarks/bench_extract.py)
 data_list = [ 
     {'route' : 'Central Mediterranean', 'location' : 'Mahdia coast, Tunisia', 'number dead' : '15', 'number missing' : '0', 'date' : '2022-10-14', 'lat' : '35.513919', 'lon' : '11.090457'},
     {'route' : 'Central Mediterranean', 'location' : 'Trapani, Sicily', 'number dead' : '3', 'number missing' : '0', 'date' : '2022-10-13', 'lat' : '38.034506', 'lon' : '12.476485'},
@@ -127,14 +80,66 @@ data_list = [
     {'route' : 'Caribbean to US', 'location' : 'Islamorada', 'number dead' : '0', 'number missing' : '1', 'date' : '2022-09-02', 'lat' : '24.903589', 'lon' : '-80.608638'}]
 
 
-tweet_df = pd.DataFrame.from_dict(data_list)
+if __name__ == "__main__":
+    df1 = pd.read_csv("./data/sarw.csv")
+    df2 = pd.read_csv("./data/info.csv")
+    df3 = pd.read_csv("./data/uscg.csv")
+    df4 = pd.read_csv("./data/last_week.csv")
+
+    df = pd.concat([df1, df2, df3, df4])
+
+    # delete links and the RT prefix, and find the tweets about migrants that
+    # report deaths or disappearances, in one vectorized pass
+    matcher = KeywordMatcher(RELEVANCE_RULE)
+    tweets, relevant = matcher.clean_and_match(df['Tweet'])
+
+    dm = tweets[relevant].tolist()
+    dates = df['Date'][relevant].tolist()
+
+    # keep one tweet per story: retweets and reposts of the same report would
+    # otherwise inflate the counts below and be extracted several times
+    representatives, copies = collapse(find_clusters(dm), dm)
+    dm = [dm[i] for i in representatives]
+    dates = [dates[i] for i in representatives]
+
+    # tokenize the tweets once and count unigrams, bigrams and trigrams together
+    counts = count_ngrams(dm, orders = (1, 2, 3))
+
+    unigrams = ng(
+        counts = counts,
+        max_features = 5000,
+        ngram = 1
+        )
+    bigrams = ng(
+        counts = counts,
+        max_features = 5000,
+        ngram = 2
+        )
+    trigrams = ng(
+        counts = counts,
+        max_features = 5000,
+        ngram = 3
+        )
+
+    # printing the most common words and word combinations in the tweets to get an idea of what kind of wording is used in reports
+    print(unigrams.head(20))
+    print(bigrams.head(20))
+    print(trigrams.head(20))
+
+    # extract counts, dates and locations from the tweets instead of typing them in,
+    # keeping the incidents located well enough to be shown on the map
+    tweet_df = extract_incidents(dm, dates)
+    tweet_df = confident_incidents(tweet_df)
+
+    # print Tweets, dates and the extracted incidents for manual inspection
+    for t,d,c in zip(dm, dates, copies):
+        print('Tweet: ' + t + ' Date: ' + d + ' Copies: ' + str(c))
+    print(tweet_df)
 
-tweet_df['date'] = pd.to_datetime(tweet_df['date'])
-tweet_df['number dead'] = tweet_df['number dead'].astype(int)
-tweet_df['number missing'] = tweet_df['number missing'].astype(int)
+    tweet_df['date'] = pd.to_datetime(tweet_df['date'])
 
-# data after August
-tweet_df = tweet_df.loc[(tweet_df['date'] >= '2022-08-01')]
+    # data after August
+    tweet_df = tweet_df.loc[(tweet_df['date'] >= '2022-08-01')]
 
-# save dataframe to csv
-tweet_df.to_csv('data.csv', index = False)
+    # save dataframe to csv
+    tweet_df.to_csv('data.csv', index = False)
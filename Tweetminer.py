@@ -3,97 +3,59 @@ Script for downloading tweets from Twitter API
 
 It downloads tweets by specified users as well as tweets tweets from the last 7 days that contain specified keywords.
 The specified users are @USCGSoutheast, @SARwatchMED and @InfoMigrants
-"""
-
-import pandas as pd
-from configparser import ConfigParser
-from tweepy import OAuthHandler, API, Cursor
-
-# read tokens and keys (requires Elevated Access for twitter api)
-config = ConfigParser()
-config.read('config.ini')
-
-token = config['twdl']['token']
-token_secret = config['twdl']['token_secret']
-api_key = config['twdl']['api_key']
-api_key_secret = config['twdl']['api_key_secret']
 
-auth = OAuthHandler(api_key, api_key_secret)
-auth.set_access_token(token, token_secret)
+All sources are downloaded concurrently (see harvester.py) and written to
+last_week.csv, uscg.csv, sarw.csv and info.csv as the pages arrive. To try it
+offline, start `python fake_twitter_api.py` and pass
+`--api-url http://localhost:8765`.
 
-# initialize api
-api = API(auth)
-
-# download tweets by specified users
-uscg_tweets = Cursor(
-    api.user_timeline,
-    screen_name = 'USCGSoutheast',
-    count = 200,
-    tweet_mode = 'extended'
-    ).items(1000)
-
-sarwatch_tweets = Cursor(
-    api.user_timeline,
-    screen_name = 'SARwatchMED',
-    count = 200,
-    tweet_mode = 'extended'
-    ).items(1000)
-
-infomig_tweets = Cursor(
-    api.user_timeline,
-    screen_name = 'InfoMigrants',
-    count = 200,
-    tweet_mode = 'extended'
-    ).items(1000)
+With --incremental, each run only downloads the tweets posted since the
+previous one and appends them to the CSVs, keeping the last seen tweet ID of
+every source in checkpoints.json.
+"""
 
-columns = ['User', 'Tweet', 'Date']
-data = []
+import argparse
+from configparser import ConfigParser
 
-# tweets from last week
-last_week = []
+from tweepy import OAuthHandler
 
-lw_tweets = Cursor(
-    api.search_tweets,
-    q = 'migrants missing dead',
-    count = 200,
-    tweet_mode = 'extended'
-    ).items(1000)
+from harvester import API_URL, SOURCES, harvest
 
-# add tweets to list
-for tweet in lw_tweets:
-    last_week.append([tweet.user.screen_name, tweet.full_text, tweet.created_at])
 
-df = pd.DataFrame(
-    last_week,
-    columns = columns
-    )
-# save to csv
-df.to_csv('last_week.csv', index = False)
-print(df.head())
+def read_auth(path='config.ini'):
+    """OAuth 1 credentials from config.ini (requires Elevated Access for twitter api)"""
+    config = ConfigParser()
+    config.read(path)
 
-for tweet in uscg_tweets:
-    data.append([tweet.user.screen_name, tweet.full_text, tweet.created_at])
+    token = config['twdl']['token']
+    token_secret = config['twdl']['token_secret']
+    api_key = config['twdl']['api_key']
+    api_key_secret = config['twdl']['api_key_secret']
 
-df1 = pd.DataFrame(
-    data, 
-    columns = columns
-    )
+    auth = OAuthHandler(api_key, api_key_secret)
+    auth.set_access_token(token, token_secret)
+    return auth.apply_auth()
 
-print(df1.head())
-df1.to_csv('uscg.csv', index = False)
-data = []
 
-for tweet in sarwatch_tweets:
-    data.append([tweet.user.screen_name, tweet.full_text, tweet.created_at])
+def main():
+    parser = argparse.ArgumentParser(description='Download tweets about missing migrants')
+    parser.add_argument('--api-url', default=API_URL, help='Base URL of the Twitter API')
+    parser.add_argument('--items', type=int, default=1000, help='Tweets to download per source')
+    parser.add_argument('--output-dir', default='.')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Sources downloaded at the same time (default: all of them)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Append only the tweets newer than the last run to the CSVs')
+    args = parser.parse_args()
 
-df2 = pd.DataFrame(data, columns = columns)
-print(df2.head())
-df2.to_csv('sarw.csv', index = False)
-data = []
+    # The fake API does not check credentials
+    auth = read_auth() if args.api_url == API_URL else None
+    result = harvest(SOURCES, args.items, args.output_dir, args.api_url, auth, args.workers,
+                     incremental=args.incremental)
+    for name, count in result['tweets'].items():
+        print(f"{name}.csv: {count} {'new ' if args.incremental else ''}tweets")
+    print(f"Done in {result['seconds']:.1f}s using {sum(result['requests'].values())} requests")
 
-for tweet in infomig_tweets:
-    data.append([tweet.user.screen_name, tweet.full_text, tweet.created_at])
 
-df3 = pd.DataFrame(data, columns = columns)
-print(df3.head())
-df3.to_csv('info.csv', index = False)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the monthly curves of Explore_Regions when causes are picked.
+
+Compares the table the page plots, built from the dense route x cause x month
+tensor of src/rollups.py, with the filter and groupby the page used to run on
+the per-cause monthly table, for every route and for 1, 2, half and all of the
+causes. Both must give the same table; `sums us` is the slice and sum alone,
+without building the table. --scales repeats the dataset with the dates of every copy moved by
+whole years, so the number of months grows with it.
+
+Usage:
+    python benchmarks/bench_cause_tensor.py
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+warnings.filterwarnings('ignore')
+from dataset import compact, dataset_path, prepare, read_dataset  # noqa: E402
+from rollups import MEASURES, build_cause_tensor, monthly_measures, monthly_sums, route_tensor  # noqa: E402
+
+
+def scaled(df, scale):
+    """The dataset repeated, every copy moved back by as many years as the dataset spans"""
+    span = df['date'].dt.year.max() - df['date'].dt.year.min() + 1
+    copies = []
+    for copy in range(scale):
+        part = df.copy()
+        # seconds resolution, nanoseconds overflow a few centuries back
+        part['date'] = part['date'].astype('datetime64[s]') - pd.DateOffset(years=int(span * copy))
+        copies.append(part)
+    return compact(pd.concat(copies, ignore_index=True))
+
+
+def groupby_measures(month_by_cause, causes):
+    """What the page computed before: a filter and a groupby of the per-cause table"""
+    return month_by_cause[month_by_cause['Cause of Death'].isin(causes)].groupby(
+        ['Migration route', 'date'], observed=True)[MEASURES].sum().reset_index()
+
+
+def same_table(expected, result):
+    if len(expected) != len(result):
+        return False
+    if not (expected['date'].to_numpy() == result['date'].to_numpy()).all():
+        return False
+    return all((expected[col].astype('int64').to_numpy() == result[col].to_numpy()).all() for col in MEASURES)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cause tensor benchmark')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    base = compact(prepare(read_dataset(dataset_path())))
+    print(f"{'rows':>9} {'months':>7} {'build s':>8} {'MB':>6} {'queries':>8} "
+          f"{'groupby us':>11} {'table us':>9} {'sums us':>8} {'speedup':>8}")
+    for scale in args.scales:
+        df = scaled(base, scale)
+        start = time.perf_counter()
+        tensor = build_cause_tensor(df)
+        build_seconds = time.perf_counter() - start
+        month_by_cause = df.groupby(['Migration route', 'Cause of Death', 'date'], observed=True)[
+            MEASURES].sum().reset_index()
+        slices = {route: part for route, part in month_by_cause.groupby('Migration route', observed=True)}
+
+        groupby_seconds = tensor_seconds = sums_seconds = 0.0
+        queries = 0
+        for route in tensor['routes']:
+            route_months = route_tensor(tensor, route)
+            causes = tensor['causes']
+            for picked in [causes[:1], causes[:2], causes[:len(causes) // 2], causes]:
+                start = time.perf_counter()
+                expected = groupby_measures(slices[route], picked)
+                groupby_seconds += time.perf_counter() - start
+                start = time.perf_counter()
+                result = monthly_measures(route_months, route, picked)
+                tensor_seconds += time.perf_counter() - start
+                start = time.perf_counter()
+                monthly_sums(route_months, picked)
+                sums_seconds += time.perf_counter() - start
+                assert same_table(expected, result), (route, picked)
+                queries += 1
+        megabytes = (tensor['values'].nbytes + tensor['incidents'].nbytes) / 1e6
+        print(f"{len(df):>9} {len(tensor['months']):>7} {build_seconds:>8.3f} {megabytes:>6.1f} {queries:>8} "
+              f"{1e6 * groupby_seconds / queries:>11.0f} {1e6 * tensor_seconds / queries:>9.0f} "
+              f"{1e6 * sums_seconds / queries:>8.0f} "
+              f"{groupby_seconds / tensor_seconds:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
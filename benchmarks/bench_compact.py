@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Memory report of the compaction applied when the app loads the dataset.
+
+For the CSV and the Parquet file, prints the type and memory of every column
+as prepared and as compacted by dataset.compact(), then checks that the route
+aggregates of the Explore_Regions page and the Home statistics come out the
+same from both frames. --scale repeats the dataset to see how the saving
+grows with it.
+
+Usage:
+    python process_new_data.py --format both
+    python benchmarks/bench_compact.py
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+warnings.filterwarnings('ignore')
+from dataset import compact, data_url, memory_report, parquet_url, prepare, read_dataset  # noqa: E402
+from rollups import build_route_cube  # noqa: E402
+
+
+def same_values(left, right):
+    """Whether two aggregate tables hold the same values, whatever their dtypes"""
+    left, right = left.reset_index(drop=True), right.reset_index(drop=True)
+    if list(left.columns) != list(right.columns) or len(left) != len(right):
+        return False
+    for col in left.columns:
+        a, b = left[col], right[col]
+        if pd.api.types.is_numeric_dtype(a) and not pd.api.types.is_bool_dtype(a):
+            a, b = a.astype('float64').round(6), b.astype('float64').round(6)
+        else:
+            a, b = a.astype(str), b.astype(str)
+        if not a.equals(b):
+            return False
+    return True
+
+
+def check_aggregates(prepared, compacted):
+    before, after = build_route_cube(prepared), build_route_cube(compacted)
+    assert same_values(before['routes'], after['routes'])
+    assert before['route_options'] == after['route_options']
+    for route, tables in before['by_route'].items():
+        for name in ['season', 'causes', 'month', 'origins']:
+            assert same_values(tables[name], after['by_route'][route][name]), (route, name)
+        assert tables['stats']['top_causes'] == after['by_route'][route]['stats']['top_causes']
+        assert (tables['cause_months']['values'] == after['by_route'][route]['cause_months']['values']).all()
+    for col in ['Total Number of Dead and Missing', 'Number of Survivors']:
+        assert prepared[col].sum() == compacted[col].sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory report of the dataset compaction')
+    parser.add_argument('--scale', type=int, default=1)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    for path in [data_url, parquet_url]:
+        if not os.path.exists(path):
+            print(f'{path} not found, skipping')
+            continue
+        prepared = prepare(read_dataset(path))
+        if args.scale > 1:
+            prepared = pd.concat([prepared] * args.scale, ignore_index=True)
+        start = time.perf_counter()
+        compacted = compact(prepared)
+        seconds = time.perf_counter() - start
+        check_aggregates(prepared, compacted)
+        print(f'\n{path} ({len(prepared)} rows, compacted in {seconds:.3f} s, same aggregates)')
+        print(memory_report(prepared, compacted).to_string())
+
+
+if __name__ == '__main__':
+    main()
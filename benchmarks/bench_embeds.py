@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the tweet embed cache in src/embed_cache.py.
+
+Serves oEmbed from fake_twitter_api.py with --delay seconds per request and
+times what a page rerun waits for in every state of the cache: the direct
+request the page used to make, a first fetch, a fresh hit, a stale hit that
+is refreshed in the background, a reload of the cache file by a new process,
+and an endpoint outage with and without a cached entry.
+
+Usage:
+    python benchmarks/bench_embeds.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+from embed_cache import EmbedCache  # noqa: E402
+from fake_twitter_api import serve  # noqa: E402
+
+TWEET_URL = 'https://twitter.com/InfoMigrants/status/1579465035780304896'
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tweet embed cache benchmark')
+    parser.add_argument('--delay', type=float, default=0.5, help='seconds the fake endpoint takes per request')
+    parser.add_argument('--wait', type=float, default=1.0, help='seconds a rerun waits for a first fetch')
+    args = parser.parse_args()
+
+    server, api, url = serve(delay=args.delay)
+    endpoint = f'{url}/oembed'
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'embeds.json')
+        rows = []
+        seconds, html = timed(lambda: requests.get(endpoint, params={'url': TWEET_URL}).json()['html'])
+        rows.append(('direct request (old page)', seconds, html is not None))
+
+        cache = EmbedCache(path, endpoint, wait=args.wait)
+        rows.append(('first fetch', *timed(lambda: cache.html(TWEET_URL) is not None)))
+        # a fetch slower than --wait completes in the background
+        wait_for(lambda: not cache.pending)
+        rows.append(('fresh hit', *timed(lambda: cache.html(TWEET_URL) is not None)))
+
+        cache.ttl = 0
+        before = api.oembed_requests
+        rows.append(('stale hit', *timed(lambda: cache.html(TWEET_URL) is not None)))
+        wait_for(lambda: api.oembed_requests > before and not cache.pending)
+        assert api.oembed_requests == before + 1, 'a stale hit refreshes once in the background'
+        cache.ttl = 24 * 60 * 60
+
+        reloaded = EmbedCache(path, endpoint, wait=args.wait)
+        rows.append(('hit after reload', *timed(lambda: reloaded.html(TWEET_URL) is not None)))
+
+        api.oembed_down = True
+        reloaded.ttl = 0
+        rows.append(('outage, stale entry', *timed(lambda: reloaded.html(TWEET_URL) is not None)))
+        rows.append(('outage, no entry', *timed(lambda: reloaded.html(TWEET_URL + '0') is not None)))
+        rows.append(('outage, retry', *timed(lambda: reloaded.html(TWEET_URL + '0') is not None)))
+        wait_for(lambda: not reloaded.pending)
+    server.shutdown()
+
+    print(f"{'state':<28} {'page waits ms':>14} {'embed shown':>12}")
+    for state, seconds, shown in rows:
+        print(f'{state:<28} {seconds * 1000:>14.2f} {str(shown):>12}')
+    print(f'{api.oembed_requests} requests to the endpoint')
+
+
+if __name__ == '__main__':
+    main()
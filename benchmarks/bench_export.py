@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the chunked export of src/export.py.
+
+Checks first that every format reads back to the selected rows. Then exports
+the whole dataset repeated 1x, 10x and 100x in every format to a sink that
+only counts bytes, reporting how soon the first rows arrive, the throughput
+and the size. Finally compares the peak memory allocated while exporting
+(tracemalloc) with encoding the selection in one go, at --memory-scale.
+
+Usage:
+    python benchmarks/bench_export.py
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+warnings.filterwarnings('ignore')
+from dataset import compact, dataset_path, prepare, read_dataset  # noqa: E402
+from export import EXPORT_FORMATS, export_chunks, export_columns  # noqa: E402
+
+
+def check_round_trip(df):
+    """Every format holds exactly the selected rows"""
+    positions = np.flatnonzero(df['Migration route'].astype(str) == df['Migration route'].astype(str).iloc[0])
+    selection = df.take(positions)[export_columns(df)].reset_index(drop=True)
+    exported = {name: b''.join(export_chunks(df, positions, name, chunk_rows=1000)) for name in EXPORT_FORMATS}
+    expected = pd.read_csv(io.StringIO(selection.to_csv(index=False)))
+    assert pd.read_csv(io.BytesIO(exported['CSV'])).equals(expected)
+    assert pq.read_table(io.BytesIO(exported['Parquet'])).to_pandas().equals(selection)
+    features = json.loads(exported['GeoJSON'])['features']
+    assert len(features) == len(selection)
+    for feature, (_, row) in zip(features, selection.iterrows()):
+        if feature['geometry'] is not None:
+            assert np.allclose(feature['geometry']['coordinates'], [row['lon'], row['lat']], atol=1e-5)
+        assert feature['properties']['Main ID'] == row['Main ID']
+
+
+def stream(df, export_format):
+    """Seconds to the first rows and in total, and bytes of a whole export"""
+    start = time.perf_counter()
+    first = None
+    size = 0
+    for chunk in export_chunks(df, None, export_format):
+        size += len(chunk)
+        # the first chunk of CSV and GeoJSON is only the header
+        if first is None and size > 1024:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start, size
+
+
+def in_one_go(df, export_format):
+    """The whole export encoded at once, as pandas does it"""
+    selection = df[export_columns(df)]
+    if export_format == 'CSV':
+        return selection.to_csv(index=False).encode()
+    if export_format == 'Parquet':
+        buffer = io.BytesIO()
+        selection.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    return selection.to_json(orient='records', date_format='iso').encode()
+
+
+def peak_mb(func):
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export benchmark')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--memory-scale', type=int, default=10)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    base = compact(prepare(read_dataset(dataset_path())))
+    check_round_trip(base)
+    print('Round trip: CSV, Parquet and GeoJSON hold the selected rows\n')
+
+    print(f"{'rows':>9} {'format':>8} {'first rows ms':>14} {'total s':>8} {'MB':>8} {'MB/s':>6}")
+    for scale in args.scales:
+        df = pd.concat([base] * scale, ignore_index=True)
+        for export_format in EXPORT_FORMATS:
+            first, seconds, size = stream(df, export_format)
+            print(f"{len(df):>9} {export_format:>8} {1000 * first:>14.1f} {seconds:>8.2f} {size / 1e6:>8.1f} "
+                  f"{size / 1e6 / seconds:>6.0f}")
+
+    df = pd.concat([base] * args.memory_scale, ignore_index=True)
+    print(f"\nPeak allocated memory for {len(df)} rows")
+    print(f"{'format':>8} {'chunked MB':>11} {'in one go MB':>13}")
+    for export_format in EXPORT_FORMATS:
+        chunked = peak_mb(lambda: sum(len(chunk) for chunk in export_chunks(df, None, export_format)))
+        whole = peak_mb(lambda: in_one_go(df, export_format))
+        print(f"{export_format:>8} {chunked:>11.1f} {whole:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark and evaluation of the incident extraction in incident_extractor.py.
+
+Evaluates the incidents extracted from the relevant tweets in data/ against
+the rows typed in by hand in Tweet_Processing.py (`data_list`): a manual row is
+found when an extracted row is within --radius km of it and --days days of its
+date, and its counts are right when the dead and missing numbers match too.
+Checks that an incident without a place is not kept, however sure its counts
+and date are. Then times the extraction on the tweets repeated 1x, 10x and
+100x, in this process and on a process pool, and checks both give the same rows.
+
+Usage:
+    python benchmarks/bench_extract.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+from incident_extractor import extract_incidents  # noqa: E402
+from keywords import RELEVANCE_RULE, KeywordMatcher  # noqa: E402
+from spatial_index import haversine_km  # noqa: E402
+from Tweet_Processing import MIN_CONFIDENCE, confident_incidents, data_list  # noqa: E402
+
+DATA_FILES = ['data/sarw.csv', 'data/info.csv', 'data/uscg.csv', 'data/last_week.csv']
+PLACELESS_TWEET = 'On June 24, 12 migrants died after their boat sank'
+
+
+def relevant_tweets():
+    df = pd.concat([pd.read_csv(os.path.join(ROOT, path)) for path in DATA_FILES])
+    tweets, relevant = KeywordMatcher(RELEVANCE_RULE).clean_and_match(df['Tweet'])
+    return tweets[relevant].tolist(), df['Date'][relevant].tolist()
+
+
+def evaluate(extracted, manual, radius, days):
+    """Manual rows found, found with the right counts, and extracted rows matching a manual one"""
+    extracted = extracted.dropna(subset=['lat'])
+    found = counted = 0
+    matched = np.zeros(len(extracted), dtype=bool)
+    dates = pd.to_datetime(extracted['date'])
+    for row in manual:
+        near = haversine_km(float(row['lat']), float(row['lon']),
+                            extracted['lat'].to_numpy(), extracted['lon'].to_numpy()) <= radius
+        close = (dates - pd.Timestamp(row['date'])).abs().dt.days.to_numpy() <= days
+        candidates = near & close
+        matched |= candidates
+        if candidates.any():
+            found += 1
+            counts = extracted.loc[candidates, ['number dead', 'number missing']].astype(int)
+            counted += bool(((counts['number dead'] == int(row['number dead']))
+                             & (counts['number missing'] == int(row['number missing']))).any())
+    return found, counted, int(matched.sum()), len(extracted)
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incident extraction benchmark')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--radius', type=float, default=50, help='km between a manual and an extracted incident')
+    parser.add_argument('--days', type=int, default=3, help='days between a manual and an extracted incident')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    tweets, dates = relevant_tweets()
+    extracted = extract_incidents(tweets, dates)
+    confident = confident_incidents(extracted)
+    # counts and an explicit date but no place: nothing to put on the map
+    placeless = extract_incidents([PLACELESS_TWEET], ['2022-06-27'])
+    assert len(placeless) == 1 and confident_incidents(placeless).empty, 'placeless incident kept'
+    print(f'{len(tweets)} relevant tweets, {len(data_list)} incidents typed in by hand')
+    print(f"{'min confidence':>15} {'incidents':>10} {'found':>6} {'right counts':>13} {'precision':>10}")
+    for threshold, rows in [(0, extracted), (MIN_CONFIDENCE, confident)]:
+        found, counted, matched, total = evaluate(rows, data_list, args.radius, args.days)
+        print(f'{threshold:>15} {len(rows):>10} {found:>6} {counted:>13} {matched / max(total, 1):>10.0%}')
+
+    print(f"\n{'tweets':>8} {'in process s':>13} {'process pool s':>15} {'tweets/s':>10}")
+    for scale in args.scales:
+        corpus, corpus_dates = tweets * scale, dates * scale
+        serial_seconds, serial = timed(lambda: extract_incidents(corpus, corpus_dates, processes=1))
+        pool_seconds, pooled = timed(lambda: extract_incidents(corpus, corpus_dates, processes=args.processes,
+                                                                batch_size=max(len(corpus) // 16, 1)))
+        pd.testing.assert_frame_equal(serial, pooled)
+        print(f'{len(corpus):>8} {serial_seconds:>13.2f} {pool_seconds:>15.2f} '
+              f'{len(corpus) / min(serial_seconds, pool_seconds):>10,.0f}')
+
+
+if __name__ == '__main__':
+    main()
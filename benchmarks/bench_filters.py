@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the Home page sidebar filters.
+
+Compares the chained `isin` masks the page used to apply with the bitmap filter
+index in src/filter_index.py, on the processed dataset repeated 1x, 10x and
+100x, and checks that both select the same rows.
+
+Usage:
+    python benchmarks/bench_filters.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from dataset import dataset_path, prepare, read_dataset  # noqa: E402
+from filter_index import FILTER_COLUMNS, build_filter_index, filter_rows, options  # noqa: E402
+
+
+def chained_isin(df, selections):
+    for column, values in selections.items():
+        if len(values) > 0:
+            df = df[df[column].isin(values)]
+    return df
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Home filter micro-benchmark')
+    parser.add_argument('--input', default=None, help='Processed dataset (CSV or Parquet)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    base = prepare(read_dataset(args.input or dataset_path()))
+    print(f"{'rows':>10} {'build ms':>9} {'isin ms':>8} {'index ms':>9} "
+          f"{'options isin ms':>16} {'options index ms':>17}")
+    for scale in args.scales:
+        df = pd.concat([base] * scale, ignore_index=True) if scale > 1 else base
+        build_seconds, index = best_of(lambda: build_filter_index(df), 1)
+
+        routes, causes, years = (options(index, col) for col in FILTER_COLUMNS)
+        selections = {'Migration route': routes[:1],
+                      'Cause of Death': causes[:2],
+                      'Incident year': years[:3]}
+
+        isin_seconds, expected = best_of(lambda: chained_isin(df, selections), args.repeat)
+        index_seconds, result = best_of(lambda: filter_rows(df, index, selections), args.repeat)
+        assert expected.index.equals(result.index)
+
+        unique_seconds, _ = best_of(
+            lambda: [df[col].unique().tolist() for col in FILTER_COLUMNS], args.repeat)
+        options_seconds, _ = best_of(
+            lambda: [options(index, col) for col in FILTER_COLUMNS], args.repeat)
+
+        print(f"{len(df):>10} {build_seconds * 1000:>9.1f} {isin_seconds * 1000:>8.2f} "
+              f"{index_seconds * 1000:>9.2f} {unique_seconds * 1000:>16.2f} {options_seconds * 1000:>17.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the tweet harvester against the local fake Twitter API.
+
+Harvests the four Tweetminer.py sources one at a time (a single worker, like
+the old sequential script) and concurrently, with a fixed delay per API
+request, and checks that both write the same CSV files. A second run gives the
+fake API a tiny search rate limit to exercise the shared scheduler and the 429
+handling. A last run harvests incrementally, publishes new tweets on the fake
+API and harvests again, checking that the second run only asks for the new
+tweets and that the corpus ends up with every tweet exactly once.
+
+Usage:
+    python benchmarks/bench_harvest.py
+"""
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from fake_twitter_api import serve  # noqa: E402
+from harvester import SOURCES, RateLimitScheduler, harvest  # noqa: E402
+
+
+def run(url, items, workers, scheduler=None):
+    output_dir = tempfile.mkdtemp()
+    result = harvest(SOURCES, items, output_dir, url, workers=workers, scheduler=scheduler)
+    return output_dir, result
+
+
+def same_output(dir1, dir2):
+    names = [source['name'] + '.csv' for source in SOURCES]
+    match, mismatch, errors = filecmp.cmpfiles(dir1, dir2, names, shallow=False)
+    return not mismatch and not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tweet harvester benchmark')
+    parser.add_argument('--items', type=int, default=1000)
+    parser.add_argument('--delay', type=float, default=0.05, help='Seconds per fake API request')
+    args = parser.parse_args()
+
+    server, api, url = serve(tweets=args.items, delay=args.delay)
+    sequential_dir, sequential = run(url, args.items, workers=1)
+    concurrent_dir, concurrent = run(url, args.items, workers=None)
+    assert same_output(sequential_dir, concurrent_dir)
+    print(f"{'mode':>12} {'tweets':>7} {'seconds':>8}")
+    for mode, result in [('sequential', sequential), ('concurrent', concurrent)]:
+        print(f"{mode:>12} {sum(result['tweets'].values()):>7} {result['seconds']:>8.2f}")
+    server.shutdown()
+
+    # 3 search requests per second on both sides: the harvester must pace
+    # itself and recover from any 429 without losing pages
+    server, api, url = serve(tweets=args.items, delay=args.delay, window=1,
+                             limits={'statuses/user_timeline': 900, 'search/tweets': 3})
+    limits = {'statuses/user_timeline': (900, 1), 'search/tweets': (3, 1)}
+    limited_dir, limited = run(url, args.items, workers=None, scheduler=RateLimitScheduler(limits))
+    assert same_output(sequential_dir, limited_dir)
+    print(f"{'limited':>12} {sum(limited['tweets'].values()):>7} {limited['seconds']:>8.2f}"
+          f"  (waited {limited['rate_limit_wait']['search/tweets']:.2f}s for the search limit)")
+    server.shutdown()
+
+    server, api, url = serve(tweets=args.items, delay=args.delay)
+    corpus_dir = tempfile.mkdtemp()
+    first = harvest(SOURCES, output_dir=corpus_dir, api_url=url, incremental=True)
+    api.publish(50)
+    second = harvest(SOURCES, output_dir=corpus_dir, api_url=url, incremental=True)
+    for source in SOURCES:
+        corpus = pd.read_csv(os.path.join(corpus_dir, source['name'] + '.csv'))
+        assert corpus['ID'].is_unique and len(corpus) == args.items + 50
+    assert all(count == 50 for count in second['tweets'].values())
+    for mode, result in [('incremental', first), ('+50 new', second)]:
+        print(f"{mode:>12} {sum(result['tweets'].values()):>7} {result['seconds']:>8.2f}"
+              f"  ({sum(result['requests'].values())} requests)")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark and parity check of the incremental mode of process_new_data.py.
+
+Builds the year-partitioned store from an older slice of the raw export, then
+refreshes it with the whole export in which some rows changed and some were
+removed. After every refresh the CSV rebuilt from the store (as
+`--incremental` writes it) must be byte-identical to the CSV of a full run over
+the same export. Reports the time of a full run and of each refresh.
+
+Usage:
+    python benchmarks/bench_incremental.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import incremental  # noqa: E402
+import process_new_data  # noqa: E402
+
+
+def full_csv(raw):
+    return process_new_data.transform(raw.copy(), verbose=False).to_csv(index=False)
+
+
+def incremental_csv(raw, store_dir):
+    """Seconds of the refresh and the CSV rebuilt from the store"""
+    start = time.perf_counter()
+    incremental.update_store(raw, store_dir, verbose=False)
+    csv = incremental.read_output(raw, store_dir).to_csv(index=False)
+    return time.perf_counter() - start, csv
+
+
+def edited(raw, every):
+    """The export with one row in `every` changed and another one removed"""
+    raw = raw.copy()
+    rows = raw.index[::every]
+    raw.loc[rows, 'Number of Dead'] = raw.loc[rows, 'Number of Dead'].fillna(0) + 1
+    return raw.drop(raw.index[every // 2::every])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental ETL benchmark')
+    parser.add_argument('--input', default=process_new_data.INPUT_FILE)
+    parser.add_argument('--every', type=int, default=97, help='change and remove one row in this many')
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.input)
+    refreshes = [
+        ('first 80% of rows', raw.iloc[:int(len(raw) * 0.8)]),
+        ('whole export', raw),
+        ('changed and removed', edited(raw, args.every)),
+        ('unchanged', edited(raw, args.every)),
+        ('no rows left', raw.iloc[:0]),
+    ]
+    with tempfile.TemporaryDirectory() as store_dir:
+        print(f"{'refresh':<22} {'rows':>7} {'full s':>8} {'incremental s':>14}")
+        for name, export in refreshes:
+            start = time.perf_counter()
+            expected = full_csv(export)
+            full_seconds = time.perf_counter() - start
+            seconds, csv = incremental_csv(export, store_dir)
+            assert csv == expected, f'incremental output differs from a full run after: {name}'
+            print(f"{name:<22} {len(export):>7} {full_seconds:>8.3f} {seconds:>14.3f}")
+    print('\nIncremental CSV is byte-identical to a full run after every refresh')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the tweet relevance filter in Tweet_Processing.py.
+
+Compares the old per-tweet loops (link stripping with re.sub, then substring
+checks) with the compiled KeywordMatcher from keywords.py, on the tweets in
+data/ repeated 1x, 10x and 100x. Checks the matcher against a plain `re`
+implementation of the same rule and reports tweets per second.
+
+Usage:
+    python benchmarks/bench_keywords.py
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from keywords import LINK_PATTERN, RELEVANCE_RULE, KeywordMatcher, group_pattern  # noqa: E402
+
+DATA_FILES = ['data/sarw.csv', 'data/info.csv', 'data/uscg.csv', 'data/last_week.csv']
+
+
+def substring_loop(tweets):
+    """The filter as Tweet_Processing.py used to apply it"""
+    tweetlist = list(tweets)
+    for i in range(len(tweetlist)):
+        tweetlist[i] = re.sub(r'https\S+', '', tweetlist[i])
+        if tweetlist[i].startswith('RT'):
+            tweetlist[i] = tweetlist[i][3:]
+    relevant = []
+    for tweet in tweets:
+        relevant.append(('migrant' in tweet or 'migrants' in tweet) and (
+            'dead' in tweet or 'died' in tweet or 'death' in tweet or 'bodies' in tweet or 'missing' in tweet))
+    return tweetlist, np.array(relevant)
+
+
+def reference(tweets, groups):
+    """The rule evaluated tweet by tweet with Python's re module"""
+    patterns = [re.compile(group_pattern(group), re.IGNORECASE | re.ASCII) for group in groups]
+    cleaned, relevant = [], []
+    for tweet in tweets:
+        tweet = re.sub(LINK_PATTERN, '', tweet)
+        if tweet.startswith('RT'):
+            tweet = tweet[3:]
+        cleaned.append(tweet)
+        relevant.append(all(pattern.search(tweet) for pattern in patterns))
+    return cleaned, np.array(relevant)
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Keyword filter benchmark')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    tweets = pd.concat([pd.read_csv(os.path.join(root, path)) for path in DATA_FILES],
+                       ignore_index=True)['Tweet']
+    matcher = KeywordMatcher(RELEVANCE_RULE)
+    print(f"{'tweets':>8} {'loop tweets/s':>14} {'matcher tweets/s':>17} {'relevant (old/new)':>19}")
+    for scale in args.scales:
+        column = pd.concat([tweets] * scale, ignore_index=True)
+        loop_seconds, (_, old) = best_of(lambda: substring_loop(column), args.repeat)
+        matcher_seconds, (cleaned, new) = best_of(lambda: matcher.clean_and_match(column), args.repeat)
+        if scale == 1:
+            expected_cleaned, expected = reference(column, RELEVANCE_RULE)
+            assert cleaned.tolist() == expected_cleaned and (new == expected).all()
+        print(f"{len(column):>8} {len(column) / loop_seconds:>14,.0f} {len(column) / matcher_seconds:>17,.0f} "
+              f"{f'{old.sum()}/{new.sum()}':>19}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark for loading the processed dataset as CSV vs. Parquet.
+
+Each load runs in a fresh interpreter through dataset.read_dataset(), as the
+app loads it, so the timings include a cold parse. The resident memory added by
+the first load includes one-off costs of the reader (for Parquet: the Arrow
+code paged in, its thread pool and allocator), so the same file is then loaded
+again in that process: the second figure is what one more copy of the frame
+costs.
+
+Usage:
+    python process_new_data.py --format both
+    python benchmarks/bench_load.py
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+CSV_FILE = 'data/Missing_Migrants_Global_Figures_filtered.csv'
+PARQUET_FILE = 'data/Missing_Migrants_Global_Figures_filtered.parquet'
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Columns read by the Explore_Regions page
+EXPLORE_COLUMNS = [
+    'Incident year', 'Reported Month', 'Minimum Estimated Number of Missing',
+    'Total Number of Dead and Missing', 'Number of Survivors', 'Number of Females',
+    'Number of Males', 'Number of Children', 'Country of Origin', 'Cause of Death',
+    'Migration route', 'Season', 'Cause of Death Abbreviation'
+]
+
+# Runs inside the child interpreter and prints one JSON line
+CHILD = '''
+import json, os, resource, sys, time
+import pandas as pd
+
+
+def rss_mb():
+    """Current resident set size (Linux), falling back to the peak elsewhere."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+root, path, columns = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+sys.path.insert(0, os.path.join(root, 'src'))
+# importing the loader (pandas, pyarrow, streamlit) is a one-off cost per process, reported separately
+start = time.perf_counter()
+from dataset import read_dataset
+import_seconds = time.perf_counter() - start
+before = rss_mb()
+start = time.perf_counter()
+df = read_dataset(path, columns)
+elapsed = time.perf_counter() - start
+after = rss_mb()
+again = read_dataset(path, columns)
+print(json.dumps({
+    'seconds': elapsed,
+    'import_seconds': import_seconds,
+    'rss_delta_mb': after - before,
+    'reload_rss_delta_mb': rss_mb() - after,
+    'frame_mb': df.memory_usage(deep=True).sum() / 1e6,
+    'rows': len(df),
+}))
+'''
+
+
+def run_once(path, columns):
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD, ROOT, path, json.dumps(columns)],
+        check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench(fmt, path, columns, repeat):
+    runs = [run_once(path, columns) for _ in range(repeat)]
+    best = min(runs, key=lambda r: r['seconds'])
+    return {'format': fmt, 'columns': 'all' if columns is None else len(columns), **best}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CSV vs. Parquet load benchmark')
+    parser.add_argument('--csv', default=CSV_FILE)
+    parser.add_argument('--parquet', default=PARQUET_FILE)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for columns in (None, EXPLORE_COLUMNS):
+        results.append(bench('csv', args.csv, columns, args.repeat))
+        results.append(bench('parquet', args.parquet, columns, args.repeat))
+
+    print(f"{'format':<8} {'columns':>7} {'rows':>8} {'load ms':>9} {'import ms':>10} "
+          f"{'RSS MB':>8} {'reload MB':>10} {'frame MB':>9}")
+    for r in results:
+        print(f"{r['format']:<8} {r['columns']:>7} {r['rows']:>8} {r['seconds'] * 1000:>9.1f} "
+              f"{r['import_seconds'] * 1000:>10.1f} {r['rss_delta_mb']:>8.1f} {r['reload_rss_delta_mb']:>10.1f} {r['frame_mb']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the near-duplicate detection in near_duplicates.py.
+
+Compares the LSH clusters with an all-pairs comparison of the exact Jaccard
+similarity of the shingle sets on the first --exact tweets in data/: reports
+how many of the pairs at or above the threshold end up in the same cluster
+(recall) and how many pairs clustered together are below it, through a
+chain of similar tweets. Then times the clustering on the tweets repeated 1x,
+10x and 100x, every copy tagged with its number so that copies are near and
+not exact duplicates.
+
+Usage:
+    python benchmarks/bench_near_duplicates.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from near_duplicates import THRESHOLD, collapse, find_clusters, normalize, shingles  # noqa: E402
+
+DATA_FILES = ['data/sarw.csv', 'data/info.csv', 'data/uscg.csv', 'data/last_week.csv']
+
+
+def similar_pairs(tweets, threshold):
+    """All pairs of tweets with an exact shingle Jaccard similarity of at least threshold, and the time taken"""
+    start = time.perf_counter()
+    sets = [set(shingles(normalize(tweet)).tolist()) for tweet in tweets]
+    pairs = {(i, j) for i in range(len(sets)) for j in range(i + 1, len(sets))
+             if len(sets[i] & sets[j]) >= threshold * len(sets[i] | sets[j])}
+    return pairs, time.perf_counter() - start
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Near-duplicate detection benchmark')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--exact', type=int, default=1000, help='tweets compared pair by pair')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    tweets = pd.concat([pd.read_csv(os.path.join(root, path)) for path in DATA_FILES])['Tweet'].tolist()
+
+    sample = tweets[:args.exact]
+    expected, exact_seconds = similar_pairs(sample, args.threshold)
+    lsh_seconds, clusters = timed(lambda: find_clusters(sample, args.threshold))
+    found = sum(clusters[i] == clusters[j] for i, j in expected)
+    clustered = {(i, j) for i in range(len(sample)) for j in range(i + 1, len(sample)) if clusters[i] == clusters[j]}
+    print(f'{len(sample)} tweets: {len(expected)} pairs with Jaccard >= {args.threshold} found in '
+          f'{exact_seconds:.2f} s pair by pair, {found} of them clustered together by LSH in {lsh_seconds:.2f} s '
+          f'({found / max(len(expected), 1):.1%} recall); {len(clustered - expected)} clustered pairs are below')
+
+    print(f"\n{'tweets':>8} {'seconds':>8} {'tweets/s':>10} {'clusters':>9} {'largest':>8}")
+    for scale in args.scales:
+        corpus = [f'{tweet} {copy}' for copy in range(scale) for tweet in tweets] if scale > 1 else tweets
+        seconds, clusters = timed(lambda: find_clusters(corpus, args.threshold))
+        representatives, sizes = collapse(clusters, corpus)
+        assert sizes.sum() == len(corpus) and (clusters[representatives] == np.unique(clusters)).all()
+        print(f'{len(corpus):>8} {seconds:>8.2f} {len(corpus) / seconds:>10,.0f} {len(sizes):>9} {sizes.max():>8}')
+
+
+if __name__ == '__main__':
+    main()
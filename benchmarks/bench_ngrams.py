@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the n-gram counting in Tweet_Processing.py.
+
+Compares three CountVectorizer fits (one per order, as the script used to do)
+with the single-pass NgramCounter and the batched HashingNgramCounter from
+ngrams.py, on the tweets in data/ repeated 1x, 10x and 100x. Checks that the
+exact counter finds the same vocabulary and counts as CountVectorizer, that
+the hashing counter gives the same result fed in batches as in one go, and
+reports how many of the exact top 100 phrases per order it also finds
+(colliding phrases share a bucket, so it can only over-count).
+
+Usage:
+    python benchmarks/bench_ngrams.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+import sklearn.feature_extraction.text as text
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ngrams import HashingNgramCounter, NgramCounter  # noqa: E402
+
+DATA_FILES = ['data/sarw.csv', 'data/info.csv', 'data/uscg.csv', 'data/last_week.csv']
+ORDERS = (1, 2, 3)
+
+
+def vectorizer_counts(tweets, n):
+    vectorizer = text.CountVectorizer(ngram_range=(n, n), stop_words='english')
+    matrix = vectorizer.fit_transform(tweets)
+    return dict(zip(vectorizer.get_feature_names_out(), matrix.sum(axis=0).A1.tolist()))
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def hashed_in_batches(tweets, batch_size):
+    counter = HashingNgramCounter(ORDERS)
+    for start in range(0, len(tweets), batch_size):
+        counter.update(tweets[start:start + batch_size])
+    return counter
+
+
+def main():
+    parser = argparse.ArgumentParser(description='N-gram counting benchmark')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    tweets = pd.concat([pd.read_csv(os.path.join(root, path)) for path in DATA_FILES])['Tweet'].tolist()
+    print(f"{'tweets':>8} {'3x vectorizer s':>16} {'single pass s':>14} {'hashing s':>10} {'hashing top 100 recall':>23}")
+    for scale in args.scales:
+        corpus = tweets * scale
+        vectorizer_seconds, expected = timed(lambda: {n: vectorizer_counts(corpus, n) for n in ORDERS})
+        single_seconds, counter = timed(lambda: NgramCounter(ORDERS).update(corpus))
+        hashing_seconds, hashed = timed(lambda: hashed_in_batches(corpus, args.batch_size))
+        one_go = HashingNgramCounter(ORDERS).update(corpus)
+        recall = []
+        for n in ORDERS:
+            assert dict(counter.counts[n]) == expected[n]
+            assert (hashed.counts[n] == one_go.counts[n]).all()
+            top = hashed.top(n, 100)
+            assert all(count >= counter.counts[n][phrase] for phrase, count in top.items())
+            recall.append(len(set(top.index) & set(counter.top(n, 100).index)))
+        print(f"{len(corpus):>8} {vectorizer_seconds:>16.2f} {single_seconds:>14.2f} {hashing_seconds:>10.2f} "
+              f"{' / '.join(map(str, recall)):>23}")
+
+
+if __name__ == '__main__':
+    main()
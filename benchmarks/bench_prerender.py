@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the pre-rendered Explore_Regions artifacts of src/prerender.py.
+
+Writes the artifacts of the dataset to a temporary directory and checks that
+every pre-rendered figure spec is the one the page would serialize live, and
+that the statistics, origins, routes table and options match the route cube.
+Then times the Explore_Regions script (through benchmarks/streamlit_stub.py)
+cold and warm, with and without the artifacts, for every route without a
+cause filter, and with a cause picked, which always computes live.
+
+Usage:
+    python benchmarks/bench_prerender.py
+"""
+import argparse
+import contextlib
+import io
+import os
+import runpy
+import sys
+import tempfile
+import time
+import warnings
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [os.path.dirname(os.path.abspath(__file__)), os.path.join(ROOT, 'src')]
+warnings.filterwarnings('ignore')
+import streamlit_stub  # noqa: E402
+
+streamlit_stub.install()
+import prerender  # noqa: E402
+import route_figures  # noqa: E402
+from dataset import compact, dataset_path, prepare, read_dataset  # noqa: E402
+from figure_cache import serialize  # noqa: E402
+from rollups import build_route_cube  # noqa: E402
+
+PAGE = 'src/pages/Explore_Regions.py'
+
+
+def check_artifacts(cube, directory):
+    manifest = prerender.read_manifest(directory)
+    # JSON gives back plain dtypes, the values are what matters
+    pd.testing.assert_frame_equal(manifest['routes'], cube['routes'], check_dtype=False, check_categorical=False)
+    assert manifest['route_options'] == cube['route_options']
+    assert [option == option and option for option in manifest['cause_options']] == \
+        [option == option and option for option in cube['cause_options']]
+    for route, route_cube in cube['by_route'].items():
+        route_data = prerender.read_route(directory, manifest['files'][route])
+        for name, build in route_figures.DEFAULT_FIGURES.items():
+            assert route_data['figures'][name] == serialize(build(route, route_cube)), (route, name)
+        stats = route_cube['stats']
+        assert route_data['stats']['totals'] == {name: int(value) for name, value in stats['totals'].items()}
+        assert route_data['stats']['top_causes'] == stats['top_causes']
+        assert route_data['stats']['worst_month'] == stats['worst_month']
+        assert route_data['stats']['worst_month_total'] == stats['worst_month_total']
+        pd.testing.assert_frame_equal(route_data['origins'], route_cube['origins'], check_dtype=False, rtol=1e-12)
+    return manifest
+
+
+def run_page(routes, causes):
+    """Runs the page once per route"""
+    for route in routes:
+        streamlit_stub.CHOICES['Migration Route'] = lambda options: route
+        streamlit_stub.CHOICES['Cause of Death'] = lambda options: options[:causes]
+        with contextlib.redirect_stdout(io.StringIO()):
+            runpy.run_path(PAGE, run_name='__main__')
+
+
+def timings(routes, causes, repeat):
+    """Best cold (first route with empty caches) and warm (every route) seconds"""
+    cold, warm = [], []
+    for _ in range(repeat):
+        streamlit_stub.clear_singletons()
+        start = time.perf_counter()
+        run_page(routes[:1], causes)
+        cold.append(time.perf_counter() - start)
+        run_page(routes, causes)
+        start = time.perf_counter()
+        run_page(routes, causes)
+        warm.append((time.perf_counter() - start) / len(routes))
+    return min(cold), min(warm)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-rendered Explore_Regions benchmark')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    path = dataset_path()
+    cube = build_route_cube(compact(prepare(read_dataset(path))))
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        target = prerender.prerender(path, directory)
+        seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(folder, name))
+                   for folder, _, names in os.walk(target) for name in names)
+        check_artifacts(cube, target)
+        print(f'Pre-rendered {len(cube["by_route"])} routes in {seconds:.2f} s ({size / 1e6:.1f} MB); '
+              'specs, statistics, origins and options match the live page\n')
+
+        routes = cube['route_options']
+        print(f"{'artifacts':>10} {'causes':>7} {'cold ms':>8} {'warm ms/route':>14}")
+        for label, artifacts in [('no', os.path.join(directory, 'missing')), ('yes', directory)]:
+            prerender.PRERENDER_DIR = artifacts
+            for causes in (0, 2):
+                cold, warm = timings(routes, causes, args.repeat)
+                print(f"{label:>10} {causes:>7} {1000 * cold:>8.1f} {1000 * warm:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
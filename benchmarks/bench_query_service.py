@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the JSON query service in query_service.py.
+
+Starts the service on a free port and checks its answers against pandas on the
+same frame: options, filtered and paged incidents, grouped aggregates, 304s on
+If-None-Match, gzip with its own ETag, a streamed CSV export and a 500 on an
+unexpected error. Then measures requests per
+second over keep-alive connections for a mix of filter combinations, served
+from the response cache, with the cache turned off, and as 304 revalidations.
+The clients run in the same process, so their time counts against the server.
+
+Usage:
+    python benchmarks/bench_query_service.py
+"""
+import argparse
+import gzip
+import http.client
+import io
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import warnings
+from urllib.parse import urlencode, urlparse
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+warnings.filterwarnings('ignore')
+from query_service import serve  # noqa: E402
+from rollups import MEASURES  # noqa: E402
+
+
+def get(connection, path, headers=None):
+    connection.request('GET', path, headers=headers or {})
+    response = connection.getresponse()
+    return response, response.read()
+
+
+def check_answers(connection, service, df):
+    _, body = get(connection, '/options')
+    values = json.loads(body)
+    assert values['route'] == df['Migration route'].dropna().unique().tolist()
+    route, cause = values['route'][0], values['cause'][:2]
+
+    response, body = get(connection, '/incidents?' + urlencode({'route': route, 'limit': 50, 'offset': 10}))
+    page = json.loads(body)
+    expected = df[df['Migration route'] == route]
+    assert page['total'] == len(expected)
+    assert [row['Main ID'] for row in page['incidents']] == expected['Main ID'].iloc[10:60].tolist()
+
+    query = urlencode({'by': 'route,year', 'cause': cause}, doseq=True)
+    response, body = get(connection, f'/aggregates?{query}')
+    groups = pd.DataFrame(json.loads(body)['groups'])
+    selected = df[df['Cause of Death'].isin(cause)]
+    expected = selected.groupby(['Migration route', 'Incident year'], observed=True)[MEASURES].sum()
+    expected.insert(0, 'incidents', selected.groupby(['Migration route', 'Incident year'], observed=True).size())
+    expected = expected.reset_index().rename(columns={'Migration route': 'route', 'Incident year': 'year'})
+    assert list(groups.columns) == list(expected.columns)
+    assert (groups.to_numpy() == expected.astype({col: 'int64' for col in MEASURES}).to_numpy()).all()
+
+    etag = response.getheader('ETag')
+    response, unmodified = get(connection, f'/aggregates?{query}', {'If-None-Match': etag})
+    assert response.status == 304 and unmodified == b''
+    assert response.getheader('Vary') == 'Accept-Encoding'
+    response, zipped = get(connection, f'/aggregates?{query}', {'Accept-Encoding': 'gzip'})
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert gzip.decompress(zipped) == body
+    gzip_etag = response.getheader('ETag')
+    assert gzip_etag != etag and response.getheader('Vary') == 'Accept-Encoding'
+    response, _ = get(connection, f'/aggregates?{query}', {'Accept-Encoding': 'gzip', 'If-None-Match': gzip_etag})
+    assert response.status == 304 and response.getheader('ETag') == gzip_etag
+    # a client without gzip can't use the gzipped body
+    response, _ = get(connection, f'/aggregates?{query}', {'If-None-Match': gzip_etag})
+    assert response.status == 200 and response.getheader('ETag') == etag
+
+    response, body = get(connection, '/incidents?' + urlencode({'route': route, 'format': 'csv'}),
+                         {'Accept-Encoding': 'gzip'})
+    assert len(pd.read_csv(io.BytesIO(gzip.decompress(body)))) == (df['Migration route'] == route).sum()
+    response, body = get(connection, '/incidents?year=x')
+    assert response.status == 400
+
+    def fail(query):
+        raise RuntimeError('failure in a handler')
+
+    aggregates, service.aggregates = service.aggregates, fail
+    logging.getLogger('query_service').disabled = True
+    try:
+        response, body = get(connection, '/aggregates?by=cause&year=1900')
+        assert response.status == 500 and 'error' in json.loads(body)
+        assert get(connection, '/options')[0].status == 200
+    finally:
+        service.aggregates = aggregates
+        logging.getLogger('query_service').disabled = False
+
+
+def queries(values, count):
+    """A mix of filter combinations on the incidents and aggregates endpoints"""
+    paths = []
+    for route, year in itertools.islice(itertools.product(values['route'], values['year']), count // 2):
+        paths.append('/incidents?' + urlencode({'route': route, 'year': year, 'limit': 20}))
+        paths.append('/aggregates?' + urlencode({'by': 'cause', 'route': route, 'year': year}))
+    return paths
+
+
+def load(url, paths, seconds, clients, headers_of=None):
+    """Requests per second answered by `clients` keep-alive connections cycling through `paths`"""
+    address = urlparse(url)
+    counts = [0] * clients
+    deadline = time.perf_counter() + seconds
+
+    def client(number):
+        connection = http.client.HTTPConnection(address.hostname, address.port)
+        for path in itertools.cycle(paths[number::clients] or paths):
+            if time.perf_counter() > deadline:
+                break
+            response, _ = get(connection, path, headers_of(path) if headers_of else None)
+            assert response.status in (200, 304)
+            counts[number] += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(number,)) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query service benchmark')
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=200, help='distinct queries in the mix')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    server, service, url = serve()
+    _, df, _ = service.current()
+    address = urlparse(url)
+    connection = http.client.HTTPConnection(address.hostname, address.port)
+    check_answers(connection, service, df)
+    print('Answers match pandas; 304, gzip, ETags, streamed CSV and errors behave\n')
+
+    values = json.loads(get(connection, '/options')[1])
+    paths = queries(values, args.queries)
+    for path in paths:
+        get(connection, path)
+    cached = load(url, paths, args.seconds, args.clients)
+    etags = {path: get(connection, path)[0].getheader('ETag') for path in paths}
+    revalidated = load(url, paths, args.seconds, args.clients, lambda path: {'If-None-Match': etags[path]})
+    server.shutdown()
+
+    server, service, url = serve(max_entries=0)
+    uncached = load(url, paths, args.seconds, args.clients)
+    server.shutdown()
+    print(f'{len(paths)} distinct queries, {args.clients} keep-alive clients')
+    print(f"{'cached':>10} {cached:>8.0f} requests/s")
+    print(f"{'304':>10} {revalidated:>8.0f} requests/s")
+    print(f"{'uncached':>10} {uncached:>8.0f} requests/s")
+
+
+if __name__ == '__main__':
+    main()
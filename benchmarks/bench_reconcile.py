@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the reconciliation of tweet incidents with the IOM dataset in
+src/reconcile.py.
+
+Builds candidate incidents from the processed dataset (IOM incidents moved up
+to 20 km and a few days, some with another route or other counts, plus made-up
+incidents far from any of them), then times the date sweep against comparing
+every candidate with the whole archive, for the archive and the candidates
+repeated 1x, 10x and 100x. The all-pairs comparison only runs on the first
+--brute candidates, its time is extrapolated to all of them; both must pick
+the same IOM incidents.
+
+Usage:
+    python benchmarks/bench_reconcile.py
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+warnings.filterwarnings('ignore')
+from dataset import dataset_path, prepare, read_dataset  # noqa: E402
+from reconcile import RADIUS_KM, WINDOW_DAYS, day_numbers, month_spans, reconcile  # noqa: E402
+from spatial_index import haversine_km  # noqa: E402
+
+COLUMNS = ['Main ID', 'Migration route', 'Number of Dead', 'Minimum Estimated Number of Missing', 'date', 'lat', 'lon']
+
+
+def make_archive(iom, scale, rng):
+    """The archive repeated, every copy after the first moved up to 1 degree and 60 days"""
+    copies = [iom]
+    for copy in range(1, scale):
+        part = iom.copy()
+        part['date'] = part['date'] + pd.to_timedelta(rng.integers(-60, 61, len(part)), unit='D')
+        part['lat'] = part['lat'] + rng.uniform(-1, 1, len(part)).astype('float32')
+        part['lon'] = part['lon'] + rng.uniform(-1, 1, len(part)).astype('float32')
+        part['Main ID'] = part['Main ID'].astype(str) + f'.{copy}'
+        copies.append(part)
+    return pd.concat(copies, ignore_index=True)
+
+
+def make_candidates(archive, count, rng):
+    """Tweet-like incidents: most near an archive incident, some with disagreements, some new"""
+    rows = archive.iloc[rng.choice(len(archive), count, replace=False)].reset_index(drop=True)
+    days = rng.integers(0, 28, count)
+    candidates = pd.DataFrame({
+        'route': rows['Migration route'].astype(str).to_numpy(),
+        'number dead': rows['Number of Dead'].fillna(0).astype(int).to_numpy(),
+        'number missing': rows['Minimum Estimated Number of Missing'].fillna(0).astype(int).to_numpy(),
+        'date': rows['date'] + pd.to_timedelta(days, unit='D'),
+        'lat': rows['lat'].to_numpy(dtype='float64') + rng.uniform(-0.15, 0.15, count),
+        'lon': rows['lon'].to_numpy(dtype='float64') + rng.uniform(-0.15, 0.15, count),
+    })
+    other_route = rng.random(count) < 0.1
+    candidates.loc[other_route, 'route'] = 'Somewhere else'
+    other_counts = rng.random(count) < 0.1
+    candidates.loc[other_counts, 'number dead'] += 50
+    new = rng.random(count) < 0.2
+    candidates.loc[new, 'lat'] = rng.uniform(-60, -50, new.sum())
+    return candidates
+
+
+def all_pairs(candidates, reference, radius_km, window_days):
+    """Closest reference row of every candidate, comparing it with every reference row"""
+    days = day_numbers(candidates['date'])
+    first, last = month_spans(reference['date'])
+    ref_lat = reference['lat'].to_numpy(dtype='float64')
+    ref_lon = reference['lon'].to_numpy(dtype='float64')
+    rows = np.arange(len(reference))
+    matches = np.full(len(candidates), -1)
+    for position, (lat, lon) in enumerate(zip(candidates['lat'].to_numpy(), candidates['lon'].to_numpy())):
+        gap = np.maximum(np.maximum(first - days[position], days[position] - last), 0)
+        distance = haversine_km(lat, lon, ref_lat, ref_lon)
+        close = (gap <= window_days) & (distance <= radius_km) & ~np.isnan(distance)
+        if close.any():
+            score = distance[close] / radius_km + gap[close] / window_days
+            matches[position] = rows[close][np.lexsort((rows[close], score))[0]]
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconciliation benchmark')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--candidates', type=int, default=100, help='candidates per scale step')
+    parser.add_argument('--brute', type=int, default=200, help='candidates compared with the whole archive')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    iom = prepare(read_dataset(dataset_path()))[COLUMNS]
+    rng = np.random.default_rng(0)
+    print(f"{'archive':>8} {'tweets':>7} {'sweep s':>8} {'all pairs s':>12} "
+          f"{'matched':>8} {'conflicting':>12} {'new':>5}")
+    for scale in args.scales:
+        archive = make_archive(iom, scale, rng)
+        candidates = make_candidates(archive, args.candidates * scale, rng)
+        start = time.perf_counter()
+        result = reconcile(candidates, archive)
+        sweep_seconds = time.perf_counter() - start
+        sample = candidates.head(args.brute)
+        start = time.perf_counter()
+        expected = all_pairs(sample, archive, RADIUS_KM, WINDOW_DAYS)
+        # extrapolated to all candidates
+        brute_seconds = (time.perf_counter() - start) * len(candidates) / len(sample)
+        assert (result['IOM position'].to_numpy()[:len(sample)] == expected).all()
+        statuses = result['status'].value_counts()
+        print(f"{len(archive):>8} {len(candidates):>7} {sweep_seconds:>8.2f} {brute_seconds:>12.2f} "
+              f"{statuses['matched']:>8} {statuses['conflicting']:>12} {statuses['new']:>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Check and benchmark of figure_cache.show_spec() against st.plotly_chart.
+
+Runs the real Streamlit in this process, with a script run context that
+collects the messages a page would send to the browser. The Explore_Regions
+figures of every route are drawn with st.plotly_chart, then their serialized
+specs with show_spec(), in the main area, inside `with st.sidebar:` and a
+column, and into an explicit container: both must send the same messages. It
+also checks the fallback through st.plotly_chart for Streamlit versions
+show_spec() was not checked on, then times drawing a figure both ways.
+
+Run it after upgrading Streamlit, before adding the version to
+figure_cache.SPEC_STREAMLIT_VERSIONS.
+
+Usage:
+    python benchmarks/bench_show_spec.py
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import warnings
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+warnings.filterwarnings('ignore')
+import streamlit as st  # noqa: E402
+from streamlit.runtime.scriptrunner import ScriptRunContext, add_script_run_ctx  # noqa: E402
+from streamlit.runtime.state import SafeSessionState, SessionState  # noqa: E402
+from streamlit.runtime.uploaded_file_manager import UploadedFileManager  # noqa: E402
+
+import figure_cache  # noqa: E402
+import route_figures  # noqa: E402
+from dataset import compact, dataset_path, prepare, read_dataset  # noqa: E402
+from figure_cache import serialize, show_spec  # noqa: E402
+from rollups import build_route_cube  # noqa: E402
+
+
+def run_script(draw):
+    """Messages sent by `draw()` in a fresh script run, as (delta path, element) pairs"""
+    messages = []
+    context = ScriptRunContext('bench', messages.append, '', SafeSessionState(SessionState()),
+                               UploadedFileManager(), 'bench', {})
+    add_script_run_ctx(threading.current_thread(), context)
+    draw()
+    return [(list(message.metadata.delta_path), message.delta.new_element) for message in messages]
+
+
+def draw_everywhere(plot, figures):
+    """Draws every figure in the main area, the sidebar, a column and an explicit container"""
+    for figure in figures:
+        plot(figure)
+    with st.sidebar:
+        plot(figures[0])
+    column, _ = st.columns(2)
+    with column:
+        plot(figures[0])
+    plot(figures[0], st.sidebar)
+
+
+def check(figures):
+    specs = {id(fig): serialize(fig) for fig in figures}
+    expected = run_script(lambda: draw_everywhere(
+        lambda fig, container=None: (container or st).plotly_chart(fig), figures))
+    sent = run_script(lambda: draw_everywhere(
+        lambda fig, container=None: show_spec(specs[id(fig)], container), figures))
+    # the columns block is not a chart
+    assert sum(element.WhichOneof('type') == 'plotly_chart' for _, element in sent) == len(figures) + 3
+    assert sent == expected, 'show_spec() and st.plotly_chart sent different messages'
+
+    versions = figure_cache.SPEC_STREAMLIT_VERSIONS
+    figure_cache.SPEC_STREAMLIT_VERSIONS = ()
+    try:
+        fallback = run_script(lambda: draw_everywhere(
+            lambda fig, container=None: show_spec(specs[id(fig)], container), figures))
+    finally:
+        figure_cache.SPEC_STREAMLIT_VERSIONS = versions
+    assert [path for path, _ in fallback] == [path for path, _ in expected]
+    for (_, drawn), (_, element) in zip(fallback, expected):
+        if element.WhichOneof('type') == 'plotly_chart':
+            # st.plotly_chart writes the JSON of the parsed spec again, spaced its own way
+            assert json.loads(drawn.plotly_chart.figure.spec) == json.loads(element.plotly_chart.figure.spec)
+            assert drawn.plotly_chart.figure.config == element.plotly_chart.figure.config
+
+
+def per_call(draw, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        draw()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description='show_spec() check and benchmark')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    cube = build_route_cube(compact(prepare(read_dataset(dataset_path()))))
+    figures = [build(route, route_cube) for route, route_cube in cube['by_route'].items()
+               for build in route_figures.DEFAULT_FIGURES.values()]
+    print(f'Streamlit {st.__version__}, checked versions: {", ".join(figure_cache.SPEC_STREAMLIT_VERSIONS)}')
+    check(figures)
+    print(f'show_spec() sends what st.plotly_chart sends for {len(figures)} figures, '
+          'in every container; the fallback draws the same figures\n')
+
+    fig = max(figures, key=lambda fig: len(serialize(fig)))
+    spec = serialize(fig)
+    run_script(lambda: None)
+    timings = [
+        ('st.plotly_chart(figure)', per_call(lambda: st.plotly_chart(fig), args.repeat)),
+        ('show_spec(spec)', per_call(lambda: show_spec(spec), args.repeat)),
+    ]
+    print(f'largest figure, {len(spec) / 1e3:.0f} kB of spec')
+    print(f"{'call':<26} {'ms':>8}")
+    for name, seconds in timings:
+        print(f'{name:<26} {seconds * 1000:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the spatial queries behind the Home page Location filter.
+
+Compares the radius, bounding-box and k-nearest queries of the grid index in
+src/spatial_index.py with a brute-force haversine scan over every incident, on
+the processed dataset repeated 1x, 10x and 100x, and checks that both return
+the same rows.
+
+Usage:
+    python benchmarks/bench_spatial.py
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from dataset import dataset_path, prepare, read_dataset  # noqa: E402
+from spatial_index import build_spatial_index, haversine_km, nearest, within_bbox, within_radius  # noqa: E402
+
+# (lat, lon) query points: Lampedusa, the Sonoran desert, the Bay of Bengal and
+# Fiji, next to the antimeridian
+POINTS = [(35.50, 12.60), (31.90, -112.00), (21.00, 91.00), (-17.70, 178.00)]
+RADIUS_KM = 100
+BOX = (30.0, 40.0, -10.0, 30.0)
+K = 20
+
+
+def brute_radius(lat, lon, lats, lons, radius_km):
+    return np.flatnonzero(haversine_km(lat, lon, lats, lons) <= radius_km)
+
+
+def brute_bbox(lats, lons, min_lat, max_lat, min_lon, max_lon):
+    return np.flatnonzero((lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon))
+
+
+def brute_nearest(lat, lon, lats, lons, k):
+    distances = haversine_km(lat, lon, lats, lons)
+    distances = np.where(np.isnan(distances), np.inf, distances)
+    closest = np.argsort(distances, kind='stable')[:k]
+    return closest, distances[closest]
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Spatial query micro-benchmark')
+    parser.add_argument('--input', default=None, help='Processed dataset (CSV or Parquet)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    base = prepare(read_dataset(args.input or dataset_path()))
+    print(f"{'rows':>10} {'build ms':>9} {'query':>8} {'brute ms':>9} {'index ms':>9} {'speedup':>8}")
+    for scale in args.scales:
+        df = pd.concat([base] * scale, ignore_index=True) if scale > 1 else base
+        lats = df['lat'].to_numpy(dtype='float64')
+        lons = df['lon'].to_numpy(dtype='float64')
+        build_seconds, index = best_of(lambda: build_spatial_index(df), 1)
+
+        def radius_queries(query):
+            return [query(lat, lon) for lat, lon in POINTS]
+
+        queries = {
+            'radius': (lambda: radius_queries(lambda lat, lon: brute_radius(lat, lon, lats, lons, RADIUS_KM)),
+                       lambda: radius_queries(lambda lat, lon: within_radius(index, lat, lon, RADIUS_KM))),
+            'bbox': (lambda: [brute_bbox(lats, lons, *BOX)],
+                     lambda: [within_bbox(index, *BOX)]),
+            'nearest': (lambda: radius_queries(lambda lat, lon: brute_nearest(lat, lon, lats, lons, K)[1]),
+                        lambda: radius_queries(lambda lat, lon: nearest(index, lat, lon, K)[1])),
+        }
+        for position, (name, (brute, indexed)) in enumerate(queries.items()):
+            brute_seconds, expected = best_of(brute, args.repeat)
+            index_seconds, result = best_of(indexed, args.repeat)
+            for want, got in zip(expected, result):
+                # Ties make the k nearest rows ambiguous, so compare their distances
+                assert np.array_equal(want, got) if name != 'nearest' else np.allclose(want, got)
+            rows = f'{len(df):>10} {build_seconds * 1000:>9.1f}' if position == 0 else ' ' * 20
+            print(f"{rows} {name:>8} {brute_seconds * 1000:>9.2f} {index_seconds * 1000:>9.3f} "
+                  f"{brute_seconds / index_seconds:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
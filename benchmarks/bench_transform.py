@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark and parity check for the process_new_data.py transform.
+
+Runs the row-by-row reference transform and the vectorized one over the raw
+export (optionally repeated to simulate a larger archive), checks that both
+produce the same frame and CSV bytes, and reports rows/sec for each.
+
+Usage:
+    python benchmarks/bench_transform.py
+    python benchmarks/bench_transform.py --scale 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import process_new_data  # noqa: E402
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='process_new_data.py transform benchmark')
+    parser.add_argument('--input', default=process_new_data.INPUT_FILE)
+    parser.add_argument('--scale', type=int, default=1,
+                        help='Repeat the export this many times')
+    parser.add_argument('--chunksize', type=int, default=50000)
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.input)
+    if args.scale > 1:
+        raw = pd.concat([raw] * args.scale, ignore_index=True)
+    rows = len(raw)
+
+    before, rowwise_seconds = timed(
+        process_new_data.transform, raw.copy(), verbose=False, rowwise=True)
+    after, vectorized_seconds = timed(
+        process_new_data.transform, raw.copy(), verbose=False)
+
+    # Parity: same frame and byte-identical CSV output
+    pd.testing.assert_frame_equal(before, after)
+    assert before.to_csv(index=False) == after.to_csv(index=False)
+
+    start = time.perf_counter()
+    for begin in range(0, rows, args.chunksize):
+        process_new_data.transform(raw.iloc[begin:begin + args.chunksize].copy(), verbose=False)
+    chunked_seconds = time.perf_counter() - start
+
+    print(f"Parity check passed on {rows} rows")
+    print(f"{'mode':<22} {'seconds':>8} {'rows/sec':>12}")
+    for mode, seconds in [('row-wise (before)', rowwise_seconds),
+                          ('vectorized (after)', vectorized_seconds),
+                          (f'vectorized, {args.chunksize} chunk', chunked_seconds)]:
+        print(f"{mode:<22} {seconds:>8.3f} {rows / seconds:>12,.0f}")
+
+
+if __name__ == '__main__':
+    main()
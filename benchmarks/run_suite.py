@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the whole pipeline, with results saved as JSON.
+
+For every scale, a synthetic export with that many times the rows of the real
+one is generated (see synthetic.py) and pushed through:
+
+- transform: the process_new_data.py transform of the raw export;
+- load csv / load parquet: reading the processed dataset and preparing it;
+- home / explore cold: a first run of the page script, building the shared
+  data structures and figures; home / explore warm: a rerun;
+- home filters: the Home page with two routes, a cause and two years picked;
+- keywords, near duplicates, ngrams, extraction: the tweet stages of
+  Tweet_Processing.py on the tweets in data/ repeated as many times.
+
+Page scripts run against a stubbed Streamlit (streamlit_stub.py). Results go
+to benchmarks/results/<commit>.json unless --output is given; --baseline
+prints the speedup over an earlier results file.
+
+Usage:
+    python benchmarks/run_suite.py
+    python benchmarks/run_suite.py --scales 1 10 --baseline benchmarks/results/abc1234.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import runpy
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(BENCHMARKS, '..')
+sys.path[:0] = [BENCHMARKS, ROOT, os.path.join(ROOT, 'src')]
+import streamlit_stub  # noqa: E402
+
+streamlit_stub.install()
+import dataset  # noqa: E402
+import process_new_data  # noqa: E402
+from incident_extractor import extract_incidents  # noqa: E402
+from keywords import RELEVANCE_RULE, KeywordMatcher  # noqa: E402
+from near_duplicates import find_clusters  # noqa: E402
+from ngrams import count_ngrams  # noqa: E402
+from synthetic import synthesize  # noqa: E402
+
+TWEET_FILES = ['data/sarw.csv', 'data/info.csv', 'data/uscg.csv', 'data/last_week.csv']
+HOME_PAGE = os.path.join(ROOT, 'src', 'Home.py')
+EXPLORE_PAGE = os.path.join(ROOT, 'src', 'pages', 'Explore_Regions.py')
+# Sidebar picks of the "home filters" stage
+FILTER_CHOICES = {
+    'Migration Route': lambda options: options[:2],
+    'Cause of Death': lambda options: options[:1],
+    'Year': lambda options: options[-2:],
+}
+
+
+def best_of(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def run_page(path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        runpy.run_path(path, run_name='__main__')
+
+
+def page_stages(name, path, repeat):
+    """Cold (empty caches) and warm timings of a page script"""
+    def cold():
+        streamlit_stub.clear_singletons()
+        run_page(path)
+
+    cold_seconds, _ = best_of(cold, repeat)
+    warm_seconds, _ = best_of(lambda: run_page(path), repeat)
+    return {f'{name} cold': cold_seconds, f'{name} warm': warm_seconds}
+
+
+def dataset_stages(raw, directory, repeat):
+    """Timings of the transform, the loads and the page scripts on one raw export"""
+    seconds = {}
+    seconds['transform'], processed = best_of(lambda: process_new_data.transform(raw.copy(), verbose=False), repeat)
+    csv_path = os.path.join(directory, 'processed.csv')
+    parquet_path = os.path.join(directory, 'processed.parquet')
+    processed.to_csv(csv_path, index=False)
+    process_new_data.write_parquet(processed, parquet_path)
+    seconds['load csv'], _ = best_of(lambda: dataset.prepare(dataset.read_dataset(csv_path)), repeat)
+    seconds['load parquet'], _ = best_of(lambda: dataset.prepare(dataset.read_dataset(parquet_path)), repeat)
+
+    dataset.data_url, dataset.parquet_url = csv_path, parquet_path
+    seconds.update(page_stages('home', HOME_PAGE, repeat))
+    streamlit_stub.CHOICES.update(FILTER_CHOICES)
+    try:
+        seconds['home filters'], _ = best_of(lambda: run_page(HOME_PAGE), repeat)
+    finally:
+        streamlit_stub.CHOICES.clear()
+    seconds.update(page_stages('explore', EXPLORE_PAGE, repeat))
+    streamlit_stub.clear_singletons()
+    return seconds, len(processed)
+
+
+def tweet_stages(tweets, dates, repeat):
+    """Timings of the Tweet_Processing.py stages"""
+    matcher = KeywordMatcher(RELEVANCE_RULE)
+    seconds = {}
+    seconds['keywords'], (cleaned, relevant) = best_of(lambda: matcher.clean_and_match(tweets), repeat)
+    seconds['near duplicates'], _ = best_of(lambda: find_clusters(cleaned.tolist()), repeat)
+    kept = cleaned[relevant].tolist()
+    kept_dates = dates[relevant].tolist()
+    seconds['ngrams'], _ = best_of(lambda: count_ngrams(kept), repeat)
+    seconds['extraction'], _ = best_of(lambda: extract_incidents(kept, kept_dates), repeat)
+    return seconds
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark suite')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to write (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--baseline', help='Earlier JSON results to compare with')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    warnings.filterwarnings('ignore')
+    raw = pd.read_csv(process_new_data.INPUT_FILE)
+    tweets = pd.concat([pd.read_csv(path) for path in TWEET_FILES], ignore_index=True)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for scale in args.scales:
+            synthetic = synthesize(raw, len(raw) * scale, args.seed)
+            seconds, processed_rows = dataset_stages(synthetic, directory, args.repeat)
+            rows = {'transform': len(synthetic)}
+            scaled = pd.concat([tweets] * scale, ignore_index=True)
+            tweet_seconds = tweet_stages(scaled['Tweet'], scaled['Date'], args.repeat)
+            for stage, value in {**seconds, **tweet_seconds}.items():
+                count = rows.get(stage, len(scaled) if stage in tweet_seconds else processed_rows)
+                results.append({'stage': stage, 'scale': scale, 'rows': count, 'seconds': round(value, 6),
+                                'rows_per_second': round(count / value, 1) if value else None})
+                print(f"{stage:<16} {scale:>4}x {count:>9} rows {value:>9.3f} s", flush=True)
+
+    commit = git_commit()
+    report = {
+        'commit': commit,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'versions': {'pandas': pd.__version__, 'numpy': np.__version__, 'pyarrow': pyarrow.__version__},
+        'scales': args.scales,
+        'results': results,
+    }
+    output = args.output or os.path.join(BENCHMARKS, 'results', f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'\nResults written to {output}')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = {(row['stage'], row['scale']): row['seconds'] for row in json.load(file)['results']}
+        print(f"\n{'stage':<16} {'scale':>5} {'baseline s':>11} {'now s':>9} {'speedup':>8}")
+        for row in results:
+            before = baseline.get((row['stage'], row['scale']))
+            if before:
+                print(f"{row['stage']:<16} {row['scale']:>4}x {before:>11.3f} {row['seconds']:>9.3f} "
+                      f"{before / row['seconds']:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Headless stand-in for the parts of Streamlit the app uses, to time page scripts.
+
+install() puts a fake `streamlit` package in sys.modules before the pages are
+imported. Widgets return their default value, or what CHOICES picks from their
+options by label; output calls do nothing, and st.experimental_singleton
+caches per argument tuple like the real one, so a second run of a page shows
+the cost of a warm rerun:
+
+    import streamlit_stub
+    streamlit_stub.install()
+    runpy.run_path('src/Home.py', run_name='__main__')
+    streamlit_stub.clear_singletons()
+"""
+import functools
+import sys
+import types
+
+SINGLETONS = []
+# Widget label -> function of the options returning the value to use
+CHOICES = {}
+
+
+def singleton(func=None, **kwargs):
+    """st.experimental_singleton: one cached result per argument tuple"""
+    if func is None:
+        return lambda func: singleton(func)
+    cached = functools.lru_cache(maxsize=None)(func)
+    cached.clear = cached.cache_clear
+    SINGLETONS.append(cached)
+    return cached
+
+
+def clear_singletons():
+    for cached in SINGLETONS:
+        cached.clear()
+
+
+def argument(args, kwargs, position, name, default=None):
+    if name in kwargs:
+        return kwargs[name]
+    return args[position] if len(args) > position else default
+
+
+class Container:
+    """st, st.sidebar and st.columns() items: widgets return defaults, output is dropped"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        # st.markdown, st.plotly_chart, st.metric, ...
+        return lambda *args, **kwargs: None
+
+    def selectbox(self, label, options, *args, **kwargs):
+        options = list(options)
+        if label in CHOICES:
+            return CHOICES[label](options)
+        return options[argument(args, kwargs, 0, 'index', 0)] if options else None
+
+    def multiselect(self, label, options, *args, **kwargs):
+        if label in CHOICES:
+            return list(CHOICES[label](list(options)))
+        return list(argument(args, kwargs, 0, 'default', None) or [])
+
+    def slider(self, label, *args, **kwargs):
+        return argument(args, kwargs, 2, 'value', argument(args, kwargs, 0, 'min_value'))
+
+    def select_slider(self, label, options=(), *args, **kwargs):
+        return kwargs.get('value', list(options)[0] if options else None)
+
+    def number_input(self, label, *args, **kwargs):
+        return argument(args, kwargs, 2, 'value', argument(args, kwargs, 0, 'min_value', 0.0))
+
+    def columns(self, spec, **kwargs):
+        return [Container() for _ in range(spec if isinstance(spec, int) else len(spec))]
+
+
+class PlotlyChart:
+    """streamlit.proto.PlotlyChart_pb2.PlotlyChart with settable fields"""
+
+    def __init__(self):
+        self.figure = types.SimpleNamespace(spec='', config='')
+        self.use_container_width = False
+
+
+def install():
+    """Registers the fake streamlit modules, replacing any imported real ones"""
+    streamlit = types.ModuleType('streamlit')
+    main = Container()
+    for name in dir(Container):
+        if not name.startswith('__'):
+            setattr(streamlit, name, getattr(main, name))
+    streamlit.__getattr__ = main.__getattr__
+    streamlit.sidebar = Container()
+    # the pinned version (requirements.txt), so figure_cache sends specs as is
+    streamlit.__version__ = '1.13.0'
+    streamlit._main = types.SimpleNamespace(_enqueue=lambda *args, **kwargs: None)
+    streamlit.experimental_singleton = singleton
+    streamlit.experimental_memo = singleton
+    streamlit.cache = singleton
+
+    proto = types.ModuleType('streamlit.proto')
+    plotly_chart = types.ModuleType('streamlit.proto.PlotlyChart_pb2')
+    plotly_chart.PlotlyChart = PlotlyChart
+    components = types.ModuleType('streamlit.components')
+    components_v1 = types.ModuleType('streamlit.components.v1')
+    components_v1.html = lambda *args, **kwargs: None
+    components.v1 = components_v1
+    streamlit.components = components
+    streamlit.proto = proto
+    proto.PlotlyChart_pb2 = plotly_chart
+    sys.modules.update({
+        'streamlit': streamlit,
+        'streamlit.proto': proto,
+        'streamlit.proto.PlotlyChart_pb2': plotly_chart,
+        'streamlit.components': components,
+        'streamlit.components.v1': components_v1,
+    })
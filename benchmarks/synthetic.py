@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Synthetic Missing Migrants exports scaled from the real one.
+
+Rows are drawn from the raw export by column group: the columns of a group
+are copied together from one real row (so routes keep their regions, causes
+and coordinates, and counts stay consistent with each other) while different
+groups come from independent rows. Every column therefore keeps its real
+distribution at any size. Coordinates are moved by up to --jitter degrees in
+their original notation, and incident IDs are renumbered to stay unique.
+
+Usage:
+    python benchmarks/synthetic.py --scale 10 --output /tmp/raw_10x.csv
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import process_new_data  # noqa: E402
+
+# Columns drawn together from the same real row
+COLUMN_GROUPS = [
+    ['Region of Incident', 'Migration Route', 'Location of Incident', 'Coordinates', 'UNSD Geographical Grouping',
+     'Cause of Death'],
+    ['Incident Date', 'Incident Year', 'Month'],
+    ['Number of Dead', 'Minimum Estimated Number of Missing', 'Total Number of Dead and Missing',
+     'Number of Survivors', 'Number of Females', 'Number of Males', 'Number of Children'],
+    ['Country of Origin', 'Region of Origin'],
+]
+ID_COLUMNS = ['Main ID', 'Incident ID']
+JITTER_DEGREES = 0.05
+
+
+def jitter_coordinates(coordinates, jitter, rng):
+    """Coordinates moved by up to `jitter` degrees, keeping their notation; unparsable ones unchanged"""
+    x, y = process_new_data.extract_coordinates_vectorized(coordinates)
+    x = np.asarray(x, dtype='float64') + rng.uniform(-jitter, jitter, len(coordinates))
+    y = np.asarray(y, dtype='float64') + rng.uniform(-jitter, jitter, len(coordinates))
+    parsed = ~(np.isnan(x) | np.isnan(y))
+    point = coordinates.astype(str).str.startswith('POINT').to_numpy()
+    moved = coordinates.to_numpy(dtype=object).copy()
+    lat, lon = np.round(np.clip(y, -90, 90), 5), np.round(np.clip(x, -180, 180), 5)
+    moved[parsed & point] = [f'POINT ({a:.5f} {b:.5f})' for a, b in zip(lon[parsed & point], lat[parsed & point])]
+    moved[parsed & ~point] = [f'{a:.5f}, {b:.5f}' for a, b in zip(lat[parsed & ~point], lon[parsed & ~point])]
+    return pd.Series(moved, index=coordinates.index)
+
+
+def synthesize(raw, rows, seed=0, jitter=JITTER_DEGREES):
+    """A synthetic export of `rows` rows with the column distributions of `raw`"""
+    rng = np.random.default_rng(seed)
+    grouped = [column for group in COLUMN_GROUPS for column in group]
+    groups = [[column for column in group if column in raw.columns] for group in COLUMN_GROUPS]
+    # every other column is drawn on its own
+    groups += [[column] for column in raw.columns if column not in grouped and column not in ID_COLUMNS]
+    parts = {}
+    for group in groups:
+        sample = raw[group].iloc[rng.integers(0, len(raw), rows)].reset_index(drop=True)
+        parts.update({column: sample[column] for column in group})
+    years = parts['Incident Year'] if 'Incident Year' in parts else pd.Series(['0'] * rows)
+    for column in ID_COLUMNS:
+        if column in raw.columns:
+            parts[column] = years.astype(str) + '.MMP' + pd.Series(np.arange(rows)).astype(str).str.zfill(7)
+    if 'Coordinates' in parts:
+        parts['Coordinates'] = jitter_coordinates(parts['Coordinates'], jitter, rng)
+    return pd.DataFrame(parts)[list(raw.columns)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic Missing Migrants export')
+    parser.add_argument('--input', default=process_new_data.INPUT_FILE)
+    parser.add_argument('--scale', type=float, default=1, help='Rows as a multiple of the real export')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args()
+
+    raw = pd.read_csv(args.input)
+    synthetic = synthesize(raw, int(len(raw) * args.scale), args.seed)
+    synthetic.to_csv(args.output, index=False)
+    print(f'Wrote {len(synthetic)} rows to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
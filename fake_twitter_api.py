@@ -0,0 +1,196 @@
+"""
+Local stand-in for the parts of the Twitter v1.1 API that Tweetminer.py uses
+
+Serves deterministic fake tweets for GET /1.1/statuses/user_timeline.json and
+GET /1.1/search/tweets.json, with count/max_id/since_id paging, a configurable
+delay per request and per-endpoint rate limits reported through the usual
+x-rate-limit-* headers and 429 responses. Used to run and benchmark the
+harvester offline:
+
+    python fake_twitter_api.py --port 8765
+    python Tweetminer.py --api-url http://localhost:8765
+
+GET /oembed stands in for publish.twitter.com/oembed, which the Recent data
+page embeds tweets with; setting `oembed_down` makes it answer 503:
+
+    OEMBED_URL=http://localhost:8765/oembed streamlit run src/Home.py
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ENDPOINTS = {
+    '/1.1/statuses/user_timeline.json': 'statuses/user_timeline',
+    '/1.1/search/tweets.json': 'search/tweets',
+}
+TEMPLATES = [
+    'At least {n} migrants dead and {m} missing after a boat capsized off the coast #migrants',
+    'Rescue crews saved {n} people, {m} still missing at sea',
+    '{n} bodies recovered near the border, authorities say {m} people are unaccounted for',
+    'Update: search for {m} missing migrants continues, {n} survivors brought ashore',
+]
+NEWEST = datetime(2022, 10, 19, 12, 0, tzinfo=timezone.utc)
+NEWEST_ID = 1582000000000000000
+
+
+def source_seed(name):
+    return sum(ord(char) * (i + 1) for i, char in enumerate(name))
+
+
+def make_tweet(source, position):
+    """The position-th newest tweet of a source (a screen name or a query)"""
+    seed = source_seed(source)
+    created_at = NEWEST - timedelta(minutes=37 * position + seed % 37)
+    text = TEMPLATES[(seed + position) % len(TEMPLATES)].format(n=(seed + position) % 40 + 1,
+                                                                 m=(seed * 7 + position) % 90)
+    return {
+        'id': NEWEST_ID - position * 1000 - seed % 1000,
+        'created_at': created_at.strftime('%a %b %d %H:%M:%S %z %Y'),
+        'full_text': text,
+        'user': {'screen_name': source if not source.count(' ') else f'user{(seed + position) % 500}'},
+    }
+
+
+class FakeTwitter:
+    """Timeline state and rate-limit windows shared by all request handlers"""
+
+    def __init__(self, tweets=1000, delay=0.0, limits=None, window=900):
+        self.tweets = tweets
+        self.delay = delay
+        self.limits = limits or {'statuses/user_timeline': 900, 'search/tweets': 180}
+        self.window = window
+        self.windows = {}
+        self.requests = dict.fromkeys(self.limits, 0)
+        self.published = 0
+        self.oembed_requests = 0
+        self.oembed_down = False
+        self.lock = threading.Lock()
+
+    def publish(self, tweets):
+        """Adds new tweets on top of every source, newer than all existing ones"""
+        with self.lock:
+            self.published += tweets
+
+    def take_request(self, endpoint):
+        """Counts a request against the endpoint's window; returns (allowed, remaining, reset)"""
+        with self.lock:
+            now = time.time()
+            start, used = self.windows.get(endpoint, (now, 0))
+            if now >= start + self.window:
+                start, used = now, 0
+            allowed = used < self.limits[endpoint]
+            if allowed:
+                used += 1
+                self.requests[endpoint] += 1
+            self.windows[endpoint] = (start, used)
+            return allowed, self.limits[endpoint] - used, int(start + self.window)
+
+    def page(self, source, count, max_id=None, since_id=None):
+        tweets = []
+        # Published tweets have negative positions: later dates, higher IDs
+        for position in range(-self.published, self.tweets):
+            tweet = make_tweet(source, position)
+            if max_id is not None and tweet['id'] > max_id:
+                continue
+            if since_id is not None and tweet['id'] <= since_id:
+                break
+            tweets.append(tweet)
+            if len(tweets) == count:
+                break
+        return tweets
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, body, headers=()):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_oembed(self, query):
+            with api.lock:
+                api.oembed_requests += 1
+            time.sleep(api.delay)
+            if api.oembed_down:
+                self.send_json(503, {'errors': [{'code': 130, 'message': 'Over capacity'}]})
+                return
+            tweet_url = query.get('url', '')
+            self.send_json(200, {
+                'url': tweet_url,
+                'author_name': tweet_url.split('/')[3] if tweet_url.count('/') >= 3 else '',
+                'html': f'<blockquote class="twitter-tweet"><p>Fake tweet</p>&mdash; '
+                        f'<a href="{tweet_url}">{tweet_url}</a></blockquote>',
+            })
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/oembed':
+                self.send_oembed({key: values[0] for key, values in parse_qs(url.query).items()})
+                return
+            endpoint = ENDPOINTS.get(url.path)
+            if endpoint is None:
+                self.send_json(404, {'errors': [{'code': 34, 'message': 'Sorry, that page does not exist.'}]})
+                return
+            allowed, remaining, reset = api.take_request(endpoint)
+            headers = [('x-rate-limit-limit', str(api.limits[endpoint])),
+                       ('x-rate-limit-remaining', str(max(remaining, 0))),
+                       ('x-rate-limit-reset', str(reset))]
+            if not allowed:
+                self.send_json(429, {'errors': [{'code': 88, 'message': 'Rate limit exceeded'}]}, headers)
+                return
+            time.sleep(api.delay)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            source = query.get('screen_name') or query.get('q', '')
+            tweets = api.page(source, min(int(query.get('count', 20)), 200),
+                              int(query['max_id']) if 'max_id' in query else None,
+                              int(query['since_id']) if 'since_id' in query else None)
+            body = {'statuses': tweets, 'search_metadata': {'count': len(tweets)}} \
+                if endpoint == 'search/tweets' else tweets
+            self.send_json(200, body, headers)
+
+    return Handler
+
+
+def serve(port=0, **kwargs):
+    """Starts the fake API on a background thread; returns (server, FakeTwitter, base URL)
+
+    Port 0 picks a free port. Stop it with server.shutdown().
+    """
+    api = FakeTwitter(**kwargs)
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(api))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, api, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Twitter v1.1 API for offline harvesting')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--tweets', type=int, default=1000, help='Tweets available per source')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to wait before each response')
+    args = parser.parse_args()
+
+    server, _, url = serve(args.port, tweets=args.tweets, delay=args.delay)
+    print(f'Fake Twitter API on {url} (Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
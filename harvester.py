@@ -0,0 +1,301 @@
+"""
+Concurrent, rate-limit-aware harvesting of tweets from the Twitter v1.1 API
+
+Every source (a user timeline or a keyword search) is harvested by its own
+worker thread. All workers share one RateLimitScheduler, which keeps each
+endpoint under its request window and pauses an endpoint when the API reports
+that its window is used up. Pages are appended to the output CSV as they arrive
+instead of being collected in memory, so the total harvest time is close to the
+time of the slowest source.
+
+With incremental=True each source only asks for tweets newer than the last
+one it has seen (its since_id checkpoint in checkpoints.json) and appends them
+to its CSV, skipping tweet IDs the file already holds. The CSVs then form an
+append-only corpus that grows without gaps between runs, and the API quota
+used by a run scales with the new activity.
+
+The API base URL is configurable, so the harvester can be run offline against
+fake_twitter_api.py.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlencode
+
+import requests
+
+API_URL = 'https://api.twitter.com'
+COLUMNS = ['User', 'Tweet', 'Date']
+# Incremental corpus files also keep the tweet ID to deduplicate on
+CORPUS_COLUMNS = COLUMNS + ['ID']
+CHECKPOINTS_FILE = 'checkpoints.json'
+PAGE_SIZE = 200
+# A 429 without a usable reset time is retried after this many seconds,
+# doubling for every further 429 in a row up to the endpoint's window
+BACKOFF_SECONDS = 60
+# 429s in a row on the same page before the source gives up
+MAX_RETRIES = 5
+
+# Requests allowed per window (seconds) for each endpoint with user auth
+RATE_LIMITS = {
+    'statuses/user_timeline': (900, 15 * 60),
+    'search/tweets': (180, 15 * 60),
+}
+
+# One entry per output CSV: file name, endpoint and request parameters
+SOURCES = [
+    {'name': 'last_week', 'endpoint': 'search/tweets', 'params': {'q': 'migrants missing dead'}},
+    {'name': 'uscg', 'endpoint': 'statuses/user_timeline', 'params': {'screen_name': 'USCGSoutheast'}},
+    {'name': 'sarw', 'endpoint': 'statuses/user_timeline', 'params': {'screen_name': 'SARwatchMED'}},
+    {'name': 'info', 'endpoint': 'statuses/user_timeline', 'params': {'screen_name': 'InfoMigrants'}},
+]
+
+
+class RateLimitScheduler:
+    """Shared gate that spaces requests to stay within each endpoint's window
+
+    Workers call acquire() before every request. It blocks while the endpoint
+    has used up its sliding window, or while the API has told us (through the
+    x-rate-limit headers or a 429) to wait until the window resets.
+    """
+
+    def __init__(self, limits=RATE_LIMITS, clock=time.monotonic, sleep=time.sleep):
+        self.limits = limits
+        self.clock = clock
+        self.sleep = sleep
+        self.sent = {endpoint: deque() for endpoint in limits}
+        self.blocked_until = dict.fromkeys(limits, 0.0)
+        self.waited = dict.fromkeys(limits, 0.0)
+        self.requests = dict.fromkeys(limits, 0)
+        self.lock = threading.Lock()
+
+    def acquire(self, endpoint):
+        while True:
+            with self.lock:
+                requests_allowed, window = self.limits[endpoint]
+                sent = self.sent[endpoint]
+                now = self.clock()
+                while sent and sent[0] <= now - window:
+                    sent.popleft()
+                wait = self.blocked_until[endpoint] - now
+                if wait <= 0 and len(sent) < requests_allowed:
+                    sent.append(now)
+                    self.requests[endpoint] += 1
+                    return
+                if wait <= 0:
+                    wait = sent[0] + window - now
+                self.waited[endpoint] += wait
+            self.sleep(wait)
+
+    def update(self, endpoint, headers):
+        """Pauses the endpoint until its reset time when the API reports no requests left
+
+        Returns whether it did.
+        """
+        remaining = headers.get('x-rate-limit-remaining')
+        reset = headers.get('x-rate-limit-reset')
+        if remaining is None or reset is None or int(remaining) > 0:
+            return False
+        # The reset time is a Unix timestamp, translate it to the scheduler clock
+        self.pause(endpoint, max(float(reset) - time.time(), 0) + 1)
+        return True
+
+    def pause(self, endpoint, seconds):
+        """Blocks the endpoint for at least `seconds` from now"""
+        with self.lock:
+            self.blocked_until[endpoint] = max(self.blocked_until[endpoint], self.clock() + seconds)
+
+
+def retry_delay(headers, retries, window):
+    """Seconds to wait after the `retries`-th 429 in a row without a reset time
+
+    Honours Retry-After when the API sends it, otherwise backs off
+    exponentially from BACKOFF_SECONDS up to the endpoint's window.
+    """
+    retry_after = headers.get('retry-after')
+    if retry_after is not None and retry_after.strip().isdigit():
+        return int(retry_after)
+    return min(BACKOFF_SECONDS * 2 ** (retries - 1), window)
+
+
+def tweet_row(tweet):
+    """User, full text and creation time of a v1.1 tweet object"""
+    created_at = datetime.strptime(tweet['created_at'], '%a %b %d %H:%M:%S %z %Y')
+    return [tweet['user']['screen_name'], tweet['full_text'], str(created_at)]
+
+
+def fetch_pages(session, scheduler, source, items=None, api_url=API_URL, since_id=None):
+    """Yields pages of tweets of a source, newest first, until `items` tweets
+
+    Pages follow each other with max_id like tweepy's Cursor. With since_id,
+    only newer tweets are requested, and with items=None paging goes on until
+    the API has none left. A 429 response pauses the endpoint until its reset
+    time (or, without one, for retry_delay()) and retries the same page, up to
+    MAX_RETRIES times in a row before raising.
+    """
+    endpoint = source['endpoint']
+    params = dict(source['params'], count=PAGE_SIZE, tweet_mode='extended')
+    if since_id is not None:
+        params['since_id'] = since_id
+    fetched = 0
+    retries = 0
+    while items is None or fetched < items:
+        scheduler.acquire(endpoint)
+        response = session.get(f'{api_url}/1.1/{endpoint}.json', params=params, timeout=30)
+        paused = scheduler.update(endpoint, response.headers)
+        if response.status_code == 429:
+            retries += 1
+            if retries > MAX_RETRIES:
+                response.raise_for_status()
+            if not paused:
+                scheduler.pause(endpoint, retry_delay(response.headers, retries, scheduler.limits[endpoint][1]))
+            continue
+        retries = 0
+        response.raise_for_status()
+        page = response.json()
+        tweets = page['statuses'] if isinstance(page, dict) else page
+        if not tweets:
+            return
+        if items is not None:
+            tweets = tweets[:items - fetched]
+        fetched += len(tweets)
+        yield tweets
+        params['max_id'] = min(tweet['id'] for tweet in tweets) - 1
+
+
+def harvest_source(session, scheduler, source, items, output_dir='.', api_url=API_URL):
+    """Streams the tweets of one source to <output_dir>/<name>.csv, returns the count
+
+    Rows go to a .part file that replaces the output once the source is done,
+    so an interrupted run never leaves a truncated CSV behind.
+    """
+    path = os.path.join(output_dir, source['name'] + '.csv')
+    count = 0
+    with open(path + '.part', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for tweets in fetch_pages(session, scheduler, source, items, api_url):
+            writer.writerows(tweet_row(tweet) for tweet in tweets)
+            f.flush()
+            count += len(tweets)
+    os.replace(path + '.part', path)
+    return count
+
+
+def source_key(source):
+    """Checkpoint key of a source: its endpoint and request parameters"""
+    return f"{source['endpoint']}?{urlencode(sorted(source['params'].items()))}"
+
+
+def read_checkpoints(output_dir):
+    path = os.path.join(output_dir, CHECKPOINTS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_checkpoints(output_dir, checkpoints):
+    path = os.path.join(output_dir, CHECKPOINTS_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(checkpoints, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def corpus_ids(path):
+    """Tweet IDs already in a corpus CSV
+
+    A CSV written by a full harvest has no ID column; it is upgraded in place
+    with an empty ID for its rows, which are kept as they are.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    if rows and rows[0] == COLUMNS:
+        with open(path + '.tmp', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CORPUS_COLUMNS)
+            writer.writerows(row + [''] for row in rows[1:])
+        os.replace(path + '.tmp', path)
+        return set()
+    return {int(row[3]) for row in rows[1:] if row[3]}
+
+
+def append_source(session, scheduler, source, since_id, output_dir='.', api_url=API_URL):
+    """Appends the tweets of one source newer than since_id to <output_dir>/<name>.csv
+
+    Tweets whose ID is already in the file are skipped, so pages fetched again
+    after an interrupted run are not duplicated. Returns the number of tweets
+    added and the newest ID now in the file.
+    """
+    path = os.path.join(output_dir, source['name'] + '.csv')
+    # Without a checkpoint the whole window is fetched again: the newest ID in
+    # the file may come from a run that stopped before reaching older pages
+    seen = corpus_ids(path)
+    newest = since_id
+    count = 0
+    new_file = not os.path.exists(path)
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(CORPUS_COLUMNS)
+        for tweets in fetch_pages(session, scheduler, source, None, api_url, since_id):
+            tweets = [tweet for tweet in tweets if tweet['id'] not in seen]
+            writer.writerows(tweet_row(tweet) + [tweet['id']] for tweet in tweets)
+            f.flush()
+            seen.update(tweet['id'] for tweet in tweets)
+            count += len(tweets)
+            if tweets:
+                newest = max(newest or 0, max(tweet['id'] for tweet in tweets))
+    return count, newest
+
+
+def harvest(sources=SOURCES, items=1000, output_dir='.', api_url=API_URL, auth=None, workers=None,
+            scheduler=None, incremental=False):
+    """Harvests all sources concurrently, one worker per source
+
+    By default every source's CSV is replaced by its `items` newest tweets.
+    With incremental=True, each source's new tweets since its checkpoint are
+    appended instead (`items` does not apply, so no new tweet is skipped) and
+    its checkpoint moves forward once the source is done.
+
+    Returns a dict with the number of tweets written per source, the
+    wall-clock time, the requests sent and the time spent waiting on the rate
+    limit per endpoint.
+    """
+    scheduler = scheduler or RateLimitScheduler()
+    local = threading.local()
+    checkpoints = read_checkpoints(output_dir) if incremental else {}
+    checkpoints_lock = threading.Lock()
+
+    def session():
+        # requests sessions are not thread-safe, keep one per worker
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            local.session.auth = auth
+        return local.session
+
+    def work(source):
+        if not incremental:
+            return harvest_source(session(), scheduler, source, items, output_dir, api_url)
+        key = source_key(source)
+        count, newest = append_source(session(), scheduler, source, checkpoints.get(key), output_dir, api_url)
+        if newest is not None:
+            with checkpoints_lock:
+                checkpoints[key] = newest
+                write_checkpoints(output_dir, checkpoints)
+        return count
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or len(sources)) as pool:
+        futures = {source['name']: pool.submit(work, source) for source in sources}
+        counts = {name: future.result() for name, future in futures.items()}
+    return {'tweets': counts, 'seconds': time.perf_counter() - start,
+            'requests': dict(scheduler.requests), 'rate_limit_wait': dict(scheduler.waited)}
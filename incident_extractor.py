@@ -0,0 +1,237 @@
+"""
+Rule-based extraction of incidents from tweets
+
+Turns tweets about dead or missing migrants into rows in the data.csv schema
+(route, location, number dead, number missing, date, lat, lon) plus a
+confidence score between 0 and 1:
+
+- counts come from phrases such as "15 migrants dead", "bodies of eight
+  people", "death toll has climbed to 23" or "22 are missing", with numbers in
+  digits or words;
+- the incident date is the tweet date moved by relative expressions such as
+  "yesterday", "on Friday", "last week", "two weeks ago" or an explicit
+  "on June 24";
+- location, coordinates and migration route come from a small gazetteer of the
+  places that show up in the harvested tweets, most specific place first.
+
+The confidence grows with what was found (a count, a specific place rather
+than a country, an explicit rather than an assumed date) and drops for
+statistics over a period or incidents of another year.
+
+Tweets are processed in batches on a pool of processes, so a full harvest is
+handled in seconds:
+
+    incidents = extract_incidents(df['Tweet'], df['Date'])
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+import pandas as pd
+
+COLUMNS = ['route', 'location', 'number dead', 'number missing', 'date', 'lat', 'lon', 'confidence']
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14,
+    'fifteen': 15, 'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19, 'twenty': 20,
+    'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70, 'eighty': 80, 'ninety': 90,
+    'hundred': 100,
+}
+NUMBER = r'(?P<number>\d[\d,]*|' + '|'.join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r')'
+# Up to four words between a number and what it counts ("15 African migrants died")
+WORDS = r"(?:[#A-Za-z'’-]+\s+){0,4}?"
+
+DEAD_PATTERNS = [
+    re.compile(r'\b' + NUMBER + r'\s+' + WORDS +
+               r'(?:dead|died|deceased|drowned|killed|bodies|corpses|lost their lives|have died|were found dead)\b',
+               re.IGNORECASE),
+    re.compile(r'\b(?:bodies|remains) of (?:at least |some |about |around )?' + NUMBER + r'\b', re.IGNORECASE),
+    re.compile(r'\bdeath toll\D{0,40}?\b' + NUMBER + r'\b', re.IGNORECASE),
+]
+MISSING_PATTERNS = [
+    re.compile(r'\b' + NUMBER + r'\s+' + WORDS + r'(?:(?:are|were|remain|still|reported|declared as) )*missing\b',
+               re.IGNORECASE),
+]
+# Statistics over a period rather than one incident
+AGGREGATE_PATTERN = re.compile(r'\b(?:this year|so far this|first quarter|years)\b', re.IGNORECASE)
+YEAR_PATTERN = re.compile(r'\b(?:19|20)\d\d\b')
+
+MONTHS = {month: number for number, names in enumerate([
+    ('january', 'jan'), ('february', 'feb'), ('march', 'mar'), ('april', 'apr'), ('may',), ('june', 'jun'),
+    ('july', 'jul'), ('august', 'aug'), ('september', 'sep', 'sept'), ('october', 'oct'),
+    ('november', 'nov'), ('december', 'dec')], start=1) for month in names}
+MONTH = r'(?P<month>' + '|'.join(sorted(MONTHS, key=len, reverse=True)) + r')\.?'
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+EXPLICIT_DATE_PATTERNS = [
+    re.compile(r'\b' + MONTH + r'\s+(?P<day>\d{1,2})\b(?!,? ?\d{3})', re.IGNORECASE),
+    re.compile(r'\b(?P<day>\d{1,2})\s+' + MONTH + r'\b', re.IGNORECASE),
+]
+WEEKDAY_PATTERN = re.compile(r'\b(?:on|last|since|this) (?P<weekday>' + '|'.join(WEEKDAYS) + r')\b', re.IGNORECASE)
+AGO_PATTERN = re.compile(r'\b' + NUMBER + r' (?P<unit>days?|weeks?) ago\b', re.IGNORECASE)
+RELATIVE_DAYS = [
+    (re.compile(r'\byesterday\b', re.IGNORECASE), 1),
+    (re.compile(r'\b(?:today|tonight|this morning)\b', re.IGNORECASE), 0),
+    (re.compile(r'\b(?:at the|this|over the) weekend\b', re.IGNORECASE), None),
+    (re.compile(r'\blast week\b', re.IGNORECASE), 7),
+]
+
+CENTRAL_MED = 'Central Mediterranean'
+EASTERN_MED = 'Eastern Mediterranean'
+WESTERN_MED = 'Western Mediterranean'
+SAHARA = 'Sahara Desert crossing'
+US_MEXICO = 'US-Mexico border crossing'
+CARIBBEAN = 'Caribbean to US'
+
+# (place pattern, location, lat, lon, route), most specific places first.
+# Place names are matched case-sensitively so that e.g. "van" is not Van.
+PLACES = [
+    (r'Mahdia', 'Mahdia coast, Tunisia', 35.513919, 11.090457, CENTRAL_MED),
+    (r'Trapani', 'Trapani, Sicily', 38.034506, 12.476485, CENTRAL_MED),
+    (r'Zarzis', 'Zarzis, Tunisia', 33.509019, 11.134580, CENTRAL_MED),
+    (r'Sabratha|Sbaratha', 'Sbaratha, Libya', 32.874355, 12.461700, CENTRAL_MED),
+    (r'Zawiya', 'Zawiya, Libya', 32.757100, 12.727800, CENTRAL_MED),
+    (r'Pozzallo', 'Pozzallo, Sicily', 36.723665, 14.854199, CENTRAL_MED),
+    (r'Chebba', 'Tunisia, Chebba', 35.238334, 11.184468, CENTRAL_MED),
+    (r'Skhira', 'Tunisia, Skhira', 34.285009, 10.107038, CENTRAL_MED),
+    (r'Sfax', 'Tunisia, Coast of Sfax', 34.687726, 10.814120, CENTRAL_MED),
+    (r'Calabria', 'Italy, off the Calabrian coast', 36.856427, 17.276735, CENTRAL_MED),
+    (r'Lampedusa', 'Lampedusa, Italy', 35.508400, 12.604600, CENTRAL_MED),
+    (r'Kythira|Kythera|Diakofti', 'Kythira, Greece', 36.245586, 23.161616, EASTERN_MED),
+    (r'Lesbos|Lesvos', 'Lesbos', 39.239494, 26.517556, EASTERN_MED),
+    (r'Crete', 'Crete, Greece', 34.705937, 24.399454, EASTERN_MED),
+    (r'Izmir', 'Turkey, coast of Izmir', 38.437494, 27.070782, EASTERN_MED),
+    (r'Rhodes', 'Rhodes, Greece', 36.434000, 28.217000, EASTERN_MED),
+    (r'Delos', 'Greece, Aegean sea, near Delos', 37.370551, 25.296742, EASTERN_MED),
+    (r'Evros', 'Evros river, Greece-Türkiye border', 41.000000, 26.300000, EASTERN_MED),
+    (r'Melilla', 'Morocco, Melilla Border', 35.288345, -2.959516, WESTERN_MED),
+    (r'Ceuta', 'Ceuta, Spain', 35.889300, -5.321300, WESTERN_MED),
+    (r'Escombreras|southern coast of Spain', 'Spain, near Escombreras', 37.537481, -0.910363, WESTERN_MED),
+    (r'Fuerteventura', 'Canary Islands, Fuerteventura', 28.124122, -13.638271, WESTERN_MED),
+    (r'Tarfaya', 'Morocco, Tarfaya', 27.959682, -12.933955, WESTERN_MED),
+    (r'Akhfennir', 'Morocco, Akhfennir', 28.099619, -12.053869, WESTERN_MED),
+    (r'Canary Island|CanaryIslands', 'Spain / Canary Islands', 28.652163, -15.661686, WESTERN_MED),
+    (r'Dirkou', 'Niger, near Dirkou', 20.023729, 13.161012, SAHARA),
+    (r'Kufra|border with Chad|near Chad', 'Libya, Kufra, Libya-Chad border', 21.253623, 21.408366, SAHARA),
+    (r'border with Sudan|Darfur', 'Libya, Libya-Sudan border', 20.193175, 24.422461, SAHARA),
+    (r'San Antonio', 'US, San Antonio', 29.385168, -98.508756, US_MEXICO),
+    (r'Rio Grande', 'US, Rio Grande', 26.050000, -97.500000, US_MEXICO),
+    (r'Islamorada', 'Islamorada', 24.903589, -80.608638, CARIBBEAN),
+    (r'Mona Island', 'Mona Island, Puerto Rico', 18.087000, -67.894000, CARIBBEAN),
+    (r'Van\b', 'Turkey, Van', 38.502345, 43.235299, 'Iran to Türkiye'),
+]
+# Countries and seas, when nothing more specific is mentioned
+REGIONS = [
+    (r'Niger\b', 'Niger', 19.000000, 12.500000, SAHARA),
+    (r'Syria', 'Syria, near Arida Border', 34.633319, 35.973976, EASTERN_MED),
+    (r'Lebanon|Lebanese', 'Lebanon, Tripoli', 34.469548, 35.790515, EASTERN_MED),
+    (r'Aegean', 'Aegean Sea, Turkey', 38.083909, 25.454807, EASTERN_MED),
+    (r'Greece|Greek', 'Greece', 37.500000, 24.500000, EASTERN_MED),
+    (r'Tunisia', 'Tunisia', 34.500000, 10.800000, CENTRAL_MED),
+    (r'Libya', 'Libya', 32.900000, 13.200000, CENTRAL_MED),
+    (r'Sicily', 'Sicily', 37.000000, 14.500000, CENTRAL_MED),
+    (r'Central Med', 'Central Mediterranean', 34.844949, 17.664421, CENTRAL_MED),
+    (r'Algeria', 'Algerian coast', 36.824771, 2.969724, WESTERN_MED),
+    (r'Morocc', 'Morocco', 35.500000, -5.500000, WESTERN_MED),
+]
+GAZETTEER = PLACES + REGIONS
+PLACE_PATTERNS = [re.compile(r'\b(?:' + pattern + ')') for pattern, *_ in GAZETTEER]
+
+
+def parse_number(text):
+    text = text.lower().replace(',', '')
+    return int(text) if text.isdigit() else NUMBER_WORDS[text]
+
+
+def largest_count(patterns, text):
+    """Largest number any pattern finds in the text, or None"""
+    counts = [parse_number(match.group('number')) for pattern in patterns for match in pattern.finditer(text)]
+    return max(counts) if counts else None
+
+
+def find_place(text):
+    """Gazetteer entry of the most specific place in the text and whether it is specific"""
+    for position, pattern in enumerate(PLACE_PATTERNS):
+        if pattern.search(text):
+            return GAZETTEER[position], position < len(PLACES)
+    return None, False
+
+
+def incident_date(text, tweeted):
+    """Date the tweet refers to and how sure we are of it (1 explicit, 0.8 relative, 0.5 tweet date)"""
+    tweeted = pd.Timestamp(tweeted).tz_localize(None).normalize()
+    for pattern in EXPLICIT_DATE_PATTERNS:
+        match = pattern.search(text)
+        if match and 1 <= int(match.group('day')) <= 31:
+            try:
+                date = tweeted.replace(month=MONTHS[match.group('month').lower()], day=int(match.group('day')))
+            except ValueError:
+                continue
+            # A date after the tweet is from the previous year
+            return (date if date <= tweeted else date.replace(year=date.year - 1)), 1.0
+    match = WEEKDAY_PATTERN.search(text)
+    if match:
+        days_back = (tweeted.weekday() - WEEKDAYS.index(match.group('weekday').lower())) % 7
+        return tweeted - timedelta(days=days_back), 0.8
+    match = AGO_PATTERN.search(text)
+    if match:
+        days = parse_number(match.group('number')) * (7 if match.group('unit').startswith('week') else 1)
+        return tweeted - timedelta(days=days), 0.8
+    for pattern, days_back in RELATIVE_DAYS:
+        if pattern.search(text):
+            if days_back is None:
+                # the last Saturday up to the tweet date
+                days_back = (tweeted.weekday() - 5) % 7
+            return tweeted - timedelta(days=days_back), 0.8
+    return tweeted, 0.5
+
+
+def extract_incident(text, tweeted):
+    """One incident row (a dict with COLUMNS) from a tweet, or None when it reports no counts"""
+    dead = largest_count(DEAD_PATTERNS, text)
+    missing = largest_count(MISSING_PATTERNS, text)
+    if dead is None and missing is None:
+        return None
+    place, specific = find_place(text)
+    date, date_confidence = incident_date(text, tweeted)
+    confidence = 0.4 + (0.3 if specific else 0.15 if place else 0) + 0.2 * date_confidence + 0.1
+    # statistics, or an incident of another year
+    if AGGREGATE_PATTERN.search(text) or any(int(year) != date.year for year in YEAR_PATTERN.findall(text)):
+        confidence -= 0.3
+    _, location, lat, lon, route = place or (None, None, None, None, None)
+    return {
+        'route': route,
+        'location': location,
+        'number dead': dead or 0,
+        'number missing': missing or 0,
+        'date': date.strftime('%Y-%m-%d'),
+        'lat': lat,
+        'lon': lon,
+        'confidence': round(min(max(confidence, 0.0), 1.0), 2),
+    }
+
+
+def extract_batch(batch):
+    """Incidents of a batch of (text, tweet date) pairs"""
+    incidents = (extract_incident(text, tweeted) for text, tweeted in batch)
+    return [incident for incident in incidents if incident is not None]
+
+
+def extract_incidents(tweets, dates, processes=None, batch_size=2000):
+    """Incident rows with confidence from tweets and their dates, most confident first
+
+    Batches run on a pool of `processes` worker processes (default: one per
+    CPU); inputs of a single batch are handled in this process. Tweets that
+    produce the same row (retweets, repeated posts) give it once.
+    """
+    pairs = list(zip(tweets, dates))
+    batches = [pairs[start:start + batch_size] for start in range(0, len(pairs), batch_size)]
+    if len(batches) <= 1 or processes == 1:
+        results = map(extract_batch, batches)
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            results = list(pool.map(extract_batch, batches))
+    incidents = pd.DataFrame([row for rows in results for row in rows], columns=COLUMNS)
+    incidents = incidents.sort_values('confidence', ascending=False, kind='stable')
+    return incidents.drop_duplicates(subset=COLUMNS[:-1]).reset_index(drop=True)
@@ -0,0 +1,216 @@
+"""
+Incremental mode for process_new_data.py.
+
+Each raw row is fingerprinted by its `Main ID`/`Incident ID` key plus a hash of
+its content. Only new or changed rows go through the transform, and they are
+upserted into a processed store partitioned by incident year:
+
+    data/processed/
+        2014.parquet ... 2026.parquet   processed rows of each year
+        fingerprints.parquet            key, content hash and year of every raw row,
+                                        in the order of the raw export
+        manifest.json                   what the last refresh changed
+
+Downstream caches can read `manifest.json` and only invalidate the years listed
+under `years`.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import process_new_data
+
+STORE_DIR = 'data/processed'
+FINGERPRINTS_FILE = 'fingerprints.parquet'
+MANIFEST_FILE = 'manifest.json'
+KEY_COLUMN = '_key'
+# The schema of the Parquet output, but with coordinates kept at full
+# precision: the CSV output is rebuilt from the store and must match a full run
+STORE_SCHEMA = {**process_new_data.SCHEMA, 'X': 'float64', 'Y': 'float64'}
+
+
+def row_keys(df):
+    """`Main ID|Incident ID` key of each row, numbered when it repeats."""
+    keys = df['Main ID'].astype(str) + '|' + df['Incident ID'].astype(str)
+    repeat = keys.groupby(keys).cumcount()
+    return keys.where(repeat == 0, keys + '#' + repeat.astype(str)).to_numpy(dtype=object)
+
+
+def content_hashes(raw):
+    """64-bit hash of every raw row.
+
+    Numeric columns are hashed as float64 so a column flipping between int and
+    float inference across exports does not look like a change to every row.
+    """
+    normalized = raw.copy()
+    numeric = normalized.select_dtypes('number').columns
+    normalized[numeric] = normalized[numeric].astype('float64')
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+def fingerprint(raw):
+    """Key and content hash of every row in a raw export."""
+    return pd.DataFrame({'key': row_keys(raw), 'hash': content_hashes(raw)})
+
+
+def partition_path(store_dir, year):
+    return os.path.join(store_dir, f'{int(year)}.parquet')
+
+
+def to_partition_table(df):
+    """Arrow table of processed rows plus their fingerprint key column."""
+    table = process_new_data.to_arrow(df.drop(columns=KEY_COLUMN), STORE_SCHEMA)
+    return table.append_column(KEY_COLUMN, pa.array(df[KEY_COLUMN].to_numpy(dtype=object), pa.string()))
+
+
+def upsert_partition(store_dir, year, fresh, stale_keys):
+    """Replace the stale rows of a year partition and append the fresh ones."""
+    path = partition_path(store_dir, year)
+    table = to_partition_table(fresh)
+    if os.path.exists(path):
+        existing = pq.read_table(path)
+        keep = pc.invert(pc.is_in(existing[KEY_COLUMN], value_set=pa.array(stale_keys, pa.string())))
+        # partitions written with float32 coordinates are widened to STORE_SCHEMA
+        table = pa.concat_tables([existing.filter(keep).cast(table.schema), table])
+    if table.num_rows == 0:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    pq.write_table(table, path)
+
+
+def partition_years(store_dir):
+    """Years that currently have a partition in the store, ascending."""
+    if not os.path.isdir(store_dir):
+        return []
+    return sorted(int(name[:-len('.parquet')]) for name in os.listdir(store_dir)
+                  if name.endswith('.parquet') and name[:-len('.parquet')].isdigit())
+
+
+def read_store(store_dir=STORE_DIR, columns=None):
+    """Concatenate all year partitions into one processed frame.
+
+    Rows come back in the order of the last raw export, like a full run
+    writes them, not grouped by year.
+    """
+    years = partition_years(store_dir)
+    if not years:
+        # every row was removed or dropped by the transform
+        return pd.DataFrame(columns=[col for col in process_new_data.COLUMNS_ORDER
+                                     if columns is None or col in columns])
+    columns = None if columns is None else list(columns) + [KEY_COLUMN]
+    frames = [pd.read_parquet(partition_path(store_dir, year), columns=columns) for year in years]
+    df = pd.concat(frames, ignore_index=True)
+    fingerprints_path = os.path.join(store_dir, FINGERPRINTS_FILE)
+    if os.path.exists(fingerprints_path):
+        # The fingerprints are written in the row order of the raw export
+        keys = pd.read_parquet(fingerprints_path, columns=['key'])['key']
+        order = np.argsort(pd.Index(keys).get_indexer(df[KEY_COLUMN]), kind='stable')
+        df = df.take(order).reset_index(drop=True)
+    return df.drop(columns=KEY_COLUMN, errors='ignore')
+
+
+def read_output(raw, store_dir=STORE_DIR):
+    """The processed dataset rebuilt from the store, as a full run over `raw` writes it.
+
+    Same rows, order and dtypes as transform(raw), so its CSV is byte-identical:
+    counts with missing values go back to float64 and categories to text.
+    """
+    df = read_store(store_dir)
+    # transform() keeps the dtypes the export was read with
+    dtypes = process_new_data.transform(raw.iloc[:0].copy(), verbose=False).dtypes
+    return df[list(dtypes.index)].astype(dtypes.to_dict())
+
+
+def dataset_version(fingerprints):
+    """Short content hash of the whole store, changes whenever any row does."""
+    ordered = fingerprints.sort_values('key')
+    digest = hashlib.sha1(ordered['key'].str.cat().encode())
+    digest.update(ordered['hash'].to_numpy(dtype=np.uint64).tobytes())
+    return digest.hexdigest()[:12]
+
+
+def update_store(raw, store_dir=STORE_DIR, verbose=True):
+    """Upsert the new and changed rows of a raw export into the store.
+
+    Returns the manifest describing the refresh, which is also written to
+    `manifest.json` in the store.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    current = fingerprint(raw)
+    keys = current['key'].to_numpy(dtype=object)
+    hashes = current['hash'].to_numpy()
+    fingerprints_path = os.path.join(store_dir, FINGERPRINTS_FILE)
+    if os.path.exists(fingerprints_path):
+        previous = pd.read_parquet(fingerprints_path)
+    else:
+        previous = pd.DataFrame({'key': pd.Series(dtype=object),
+                                 'hash': pd.Series(dtype=np.uint64),
+                                 'year': pd.Series(dtype='Int16')})
+    previous_keys = previous['key'].to_numpy(dtype=object)
+
+    # Position of each current row in the previous fingerprints, -1 if new
+    position = pd.Index(previous_keys).get_indexer(keys)
+    known = position >= 0
+    added = ~known
+    changed = np.zeros(len(keys), dtype=bool)
+    changed[known] = previous['hash'].to_numpy()[position[known]] != hashes[known]
+    removed = pd.Index(keys).get_indexer(previous_keys) < 0
+    stale = np.flatnonzero(removed)
+    stale = np.concatenate([stale, position[changed]])
+    if verbose:
+        print(f"{added.sum()} new, {changed.sum()} changed, {removed.sum()} removed rows")
+
+    # Transform only the delta
+    delta = added | changed
+    processed = process_new_data.transform(raw[delta].copy(), verbose=False)
+    processed[KEY_COLUMN] = keys[delta][raw.index[delta].get_indexer(processed.index)]
+
+    # Years whose partitions must be rewritten: where stale rows lived and
+    # where the freshly processed rows go
+    years = set(previous['year'].iloc[stale].dropna().astype(int))
+    years |= set(processed['Incident year'].dropna().astype(int))
+    stale_keys = previous_keys[stale]
+
+    for year in sorted(years):
+        upsert_partition(store_dir, year, processed[processed['Incident year'] == year], stale_keys)
+
+    # Unchanged rows keep their partition year. Rows the transform dropped (no
+    # coordinates) get an empty year, so fixing them later shows up as a change.
+    year = np.full(len(keys), np.nan)
+    unchanged = known & ~changed
+    year[unchanged] = previous['year'].to_numpy(dtype=float, na_value=np.nan)[position[unchanged]]
+    fresh_year = pd.Series(processed['Incident year'].to_numpy(dtype=float, na_value=np.nan),
+                           index=processed[KEY_COLUMN])
+    year[delta] = fresh_year.reindex(keys[delta]).to_numpy()
+    fingerprints = pd.DataFrame({'key': keys, 'hash': hashes,
+                                 'year': pd.array(year, dtype='Float64').astype('Int16')})
+    fingerprints.to_parquet(fingerprints_path, index=False)
+
+    manifest = {
+        'version': dataset_version(fingerprints),
+        'updated': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'rows': int(len(keys)),
+        'added': int(added.sum()),
+        'changed': int(changed.sum()),
+        'removed': int(removed.sum()),
+        'unchanged': int(unchanged.sum()),
+        'years': sorted(years),
+        'partitions': {str(year): int(pq.read_metadata(partition_path(store_dir, year)).num_rows)
+                       for year in partition_years(store_dir)},
+    }
+    with open(os.path.join(store_dir, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(store_dir=STORE_DIR):
+    with open(os.path.join(store_dir, MANIFEST_FILE)) as f:
+        return json.load(f)
@@ -0,0 +1,99 @@
+"""
+Keyword rules for selecting relevant tweets
+
+A rule is a list of keyword groups: a tweet matches when it contains at least
+one keyword of every group (OR within a group, AND across groups). Keywords
+match whole words, case-insensitively; a trailing `*` matches any word ending
+(`migrant*` matches migrant, migrants and migration) and a keyword of several
+words matches them separated by any whitespace.
+
+Each group is compiled once to a single regular expression and evaluated with
+Arrow's RE2 kernels over the column, after the links and retweet prefix have
+been stripped in the same vectorized pass; every group only runs on the tweets
+that matched the previous ones. Word boundaries follow RE2,
+which treats only ASCII letters, digits and `_` as word characters.
+
+    matcher = KeywordMatcher(RELEVANCE_RULE)
+    tweets, relevant = matcher.clean_and_match(df['Tweet'])
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Tweets about migrants that report deaths or disappearances
+RELEVANCE_RULE = [
+    ['migrant', 'migrants'],
+    ['dead', 'died', 'death', 'bodies', 'missing'],
+]
+
+LINK_PATTERN = r'https\S+'
+# A leading "RT" and the character after it, as in "RT @user: ..."
+RETWEET_PATTERN = r'^RT(?s:.)?'
+
+
+def keyword_pattern(keyword):
+    """Regular expression of one keyword, without the word boundaries"""
+    prefix = keyword.endswith('*')
+    words = keyword.rstrip('*').split()
+    return r'\s+'.join(re.escape(word) for word in words) + (r'\w*' if prefix else '')
+
+
+def group_pattern(keywords, boundaries=True):
+    """One regular expression matching any keyword of a group, as whole words by default"""
+    pattern = '(?:' + '|'.join(keyword_pattern(keyword) for keyword in keywords) + ')'
+    return r'\b' + pattern + r'\b' if boundaries else pattern
+
+
+def clean_tweets(tweets, strip_links=True, strip_retweet=True):
+    """Tweets as an Arrow string array with links and the RT prefix removed"""
+    tweets = pa.array(tweets, type=pa.large_string(), from_pandas=True)
+    if strip_links:
+        tweets = pc.replace_substring_regex(tweets, LINK_PATTERN, '')
+    if strip_retweet:
+        tweets = pc.replace_substring_regex(tweets, RETWEET_PATTERN, '')
+    return tweets
+
+
+class KeywordMatcher:
+    """A keyword rule compiled for vectorized matching over a column of tweets"""
+
+    def __init__(self, groups, ignore_case=True, strip_links=True, strip_retweet=True):
+        self.groups = [list(group) for group in groups]
+        # Word boundaries make RE2 much slower, so each group is first checked
+        # without them and only the candidates are checked again with them
+        self.patterns = [(group_pattern(group, boundaries=False), group_pattern(group)) for group in self.groups]
+        self.ignore_case = ignore_case
+        self.strip_links = strip_links
+        self.strip_retweet = strip_retweet
+
+    def match_clean(self, tweets):
+        """Boolean mask of the already cleaned tweets matching every group
+
+        Each pattern only runs on the tweets that matched all the previous ones.
+        """
+        matches = np.zeros(len(tweets), dtype=bool)
+        positions = np.arange(len(tweets))
+        for prefilter, pattern in self.patterns:
+            for regex in (prefilter, pattern):
+                # missing tweets never match
+                found = pc.fill_null(pc.match_substring_regex(tweets, regex, ignore_case=self.ignore_case), False)
+                found = found.to_numpy(zero_copy_only=False)
+                tweets, positions = tweets.filter(found), positions[found]
+        matches[positions] = True
+        return matches
+
+    def clean_and_match(self, tweets):
+        """Cleaned tweets (pandas Series) and the mask of those matching the rule"""
+        cleaned = clean_tweets(tweets, self.strip_links, self.strip_retweet)
+        series = cleaned.to_pandas()
+        if isinstance(tweets, pd.Series):
+            series.index = tweets.index
+        return series, self.match_clean(cleaned)
+
+    def match(self, tweets):
+        """Boolean mask of the tweets matching the rule, after cleaning"""
+        return self.match_clean(clean_tweets(tweets, self.strip_links, self.strip_retweet))
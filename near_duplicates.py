@@ -0,0 +1,152 @@
+"""
+Near-duplicate detection for the tweet corpus
+
+Retweets, quote tweets and the same story posted by several accounts are
+grouped into clusters so that every later stage (n-gram counts, incident
+extraction) sees each story once, with the number of tweets that carried it:
+
+    clusters = find_clusters(tweets)
+    representatives, sizes = collapse(clusters, tweets)
+
+Tweets are normalized (retweet attribution, links, punctuation and case
+removed) and cut into overlapping character shingles. A MinHash signature of
+`num_perm` values estimates the Jaccard similarity of two shingle sets, and
+the signatures are split into `bands` bands: tweets that agree on a whole band
+land in the same bucket and become candidate pairs. Only candidates are
+compared, so the work grows with the number of tweets rather than with the
+number of pairs. Candidates whose estimated similarity reaches `threshold` are
+joined into the same cluster.
+"""
+
+import re
+
+import numpy as np
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 32
+THRESHOLD = 0.5
+# Shingles hashed per vectorized step, bounding the memory to about
+# NUM_PERM x BATCH_SHINGLES x 8 bytes
+BATCH_SHINGLES = 1 << 16
+
+ATTRIBUTION_PATTERN = re.compile(r'^(?:RT\s+)?@\w+:\s*')
+LINK_PATTERN = re.compile(r'https?\S+')
+NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize(tweet):
+    """Lowercased words of a tweet without retweet attribution, links and punctuation"""
+    tweet = LINK_PATTERN.sub(' ', ATTRIBUTION_PATTERN.sub('', tweet))
+    return NON_WORD_PATTERN.sub(' ', tweet.lower()).strip()
+
+
+def shingles(tweet, size=SHINGLE_SIZE):
+    """Distinct character shingles of a normalized tweet, packed into integers
+
+    The UTF-8 bytes of every window of `size` bytes (at most 8) are packed into
+    one uint64, so equal shingles give equal values without hashing.
+    """
+    data = np.frombuffer(tweet.encode('utf-8').ljust(size), dtype=np.uint8).astype(np.uint64)
+    windows = np.lib.stride_tricks.sliding_window_view(data, size)
+    return np.unique((windows << (np.arange(size, dtype=np.uint64) * np.uint64(8))).sum(axis=1, dtype=np.uint64))
+
+
+def permutations(num_perm=NUM_PERM, seed=1):
+    """Multipliers and offsets of `num_perm` multiply-shift hash functions"""
+    rng = np.random.default_rng(seed)
+    multipliers = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    offsets = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    return multipliers[:, None], offsets[:, None]
+
+
+def signatures(texts, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+    """MinHash signatures of normalized tweets, one row of `num_perm` uint32 values per tweet"""
+    sets = [shingles(text, shingle_size) for text in texts]
+    multipliers, offsets = permutations(num_perm, seed)
+    result = np.empty((len(sets), num_perm), dtype=np.uint32)
+    start = 0
+    while start < len(sets):
+        # as many tweets as fit in a batch, and at least one
+        stop, total = start + 1, len(sets[start])
+        while stop < len(sets) and total + len(sets[stop]) <= BATCH_SHINGLES:
+            total += len(sets[stop])
+            stop += 1
+        values = np.concatenate(sets[start:stop])
+        offsets_in_batch = np.cumsum([0] + [len(s) for s in sets[start:stop - 1]])
+        with np.errstate(over='ignore'):
+            hashed = (multipliers * values + offsets) >> np.uint64(32)
+        result[start:stop] = np.minimum.reduceat(hashed, offsets_in_batch, axis=1).T
+        start = stop
+    return result
+
+
+def candidate_pairs(signature, bands):
+    """Pairs (first, other) of tweets sharing a bucket in at least one band
+
+    Every tweet of a bucket is paired with the first tweet of that bucket only,
+    which is enough to connect the whole bucket.
+    """
+    rows = signature.shape[1] // bands
+    pairs = []
+    for band in range(bands):
+        keys = np.ascontiguousarray(signature[:, band * rows:(band + 1) * rows]).view(f'V{4 * rows}').ravel()
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        new_bucket = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        firsts = order[np.flatnonzero(new_bucket)][np.cumsum(new_bucket) - 1]
+        pairs.append(firsts[~new_bucket].astype(np.int64) * len(keys) + order[~new_bucket])
+    pairs = np.unique(np.concatenate(pairs)) if pairs else np.empty(0, dtype=np.int64)
+    return pairs // len(signature), pairs % len(signature)
+
+
+def find_root(parents, i):
+    while parents[i] != i:
+        parents[i] = parents[parents[i]]
+        i = parents[i]
+    return i
+
+
+def find_clusters(tweets, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, shingle_size=SHINGLE_SIZE, seed=1):
+    """Cluster label of every tweet: the position of the first tweet of its cluster
+
+    Tweets that are equal once normalized are clustered before any hashing.
+    `bands` must divide `num_perm`: more bands catch less similar pairs as
+    candidates, fewer bands compare fewer pairs.
+    """
+    if num_perm % bands:
+        raise ValueError('bands must divide num_perm')
+    texts = {}
+    distinct = np.array([texts.setdefault(normalize(tweet), len(texts)) for tweet in tweets], dtype=np.int64)
+    if not texts:
+        return distinct
+    signature = signatures(list(texts), num_perm, shingle_size, seed)
+    firsts, others = candidate_pairs(signature, bands)
+    similar = np.empty(len(firsts), dtype=bool)
+    for start in range(0, len(firsts), BATCH_SHINGLES):
+        batch = slice(start, start + BATCH_SHINGLES)
+        similar[batch] = (signature[firsts[batch]] == signature[others[batch]]).mean(axis=1) >= threshold
+    parents = list(range(len(texts)))
+    for first, other in zip(firsts[similar].tolist(), others[similar].tolist()):
+        parents[find_root(parents, other)] = find_root(parents, first)
+    roots = np.array([find_root(parents, i) for i in range(len(parents))], dtype=np.int64)[distinct]
+    # label each cluster by its first tweet
+    unique_roots, positions = np.unique(roots, return_index=True)
+    return positions[np.searchsorted(unique_roots, roots)]
+
+
+def collapse(clusters, tweets=None):
+    """Position of one representative per cluster and the number of tweets in it
+
+    The representative is the longest tweet of the cluster when the tweets are
+    given (a full post rather than a truncated retweet), else the first one.
+    Clusters are in the order of their first tweet.
+    """
+    clusters = np.asarray(clusters)
+    labels, sizes = np.unique(clusters, return_counts=True)
+    if tweets is None:
+        return labels, sizes
+    lengths = np.array([len(tweet) for tweet in tweets])
+    # longest tweet first within each cluster, ties by position
+    order = np.lexsort((np.arange(len(clusters)), -lengths, clusters))
+    return order[np.searchsorted(clusters[order], labels)], sizes
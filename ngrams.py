@@ -0,0 +1,157 @@
+"""
+N-gram counting for the tweet corpus
+
+Tweets are tokenized once, the way scikit-learn's CountVectorizer does it
+(lowercased, words of two or more characters, English stop words removed),
+and the counts of every requested n-gram order are collected in the same pass.
+
+Two counters share the same interface, update() with a batch of tweets,
+merge() with another counter and top() for the most frequent phrases:
+
+- NgramCounter keeps exact counts per phrase.
+- HashingNgramCounter keeps counts in a fixed-size array indexed by a stable
+  hash of the phrase, so its memory does not grow with the archive and counts
+  from separate batches or runs can be added together. Colliding phrases share
+  a bucket, which is reported under the first phrase seen in it.
+"""
+
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+TOKEN_PATTERN = re.compile(r'(?u)\b\w\w+\b')
+ORDERS = (1, 2, 3)
+
+
+def tokenize(tweet, stop_words=ENGLISH_STOP_WORDS):
+    """Lowercased word tokens of a tweet without stop words, like CountVectorizer"""
+    return [token for token in TOKEN_PATTERN.findall(tweet.lower()) if token not in stop_words]
+
+
+def ngrams(tokens, n):
+    """Space-joined n-grams of a token list"""
+    if n == 1:
+        return tokens
+    return [' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+
+
+def top_series(counts, limit, max_features=None):
+    """Most frequent phrases as a Series sorted by count, then alphabetically
+
+    max_features first keeps only the most frequent phrases of the whole
+    vocabulary, like CountVectorizer's max_features.
+    """
+    counts = pd.Series(counts, dtype='int64')
+    counts = counts.iloc[np.lexsort((counts.index.to_numpy(dtype=str), -counts.to_numpy()))]
+    if max_features is not None:
+        counts = counts.head(max_features)
+    return counts.head(limit)
+
+
+class NgramCounter:
+    """Exact n-gram counts of several orders, built from one tokenization"""
+
+    def __init__(self, orders=ORDERS):
+        self.orders = tuple(orders)
+        self.counts = {n: Counter() for n in self.orders}
+        self.tweets = 0
+
+    def update(self, tweets):
+        for tweet in tweets:
+            tokens = tokenize(tweet)
+            for n in self.orders:
+                self.counts[n].update(ngrams(tokens, n))
+            self.tweets += 1
+        return self
+
+    def merge(self, other):
+        for n in self.orders:
+            self.counts[n].update(other.counts[n])
+        self.tweets += other.tweets
+        return self
+
+    def top(self, n, limit=100, max_features=None):
+        """The `limit` most frequent n-grams of order n"""
+        return top_series(self.counts[n], limit, max_features)
+
+
+def stable_hash(phrase):
+    """Hash of a phrase that is the same in every process (unlike hash())"""
+    return zlib.crc32(phrase.encode('utf-8'))
+
+
+class HashingNgramCounter:
+    """N-gram counts of several orders in fixed-size hashed arrays
+
+    Memory is bounded by orders x n_features counts plus the name of one phrase
+    per occupied bucket. Counters with the same n_features can be merged, and
+    saved to and loaded from .npz files to keep running totals over a growing
+    archive.
+    """
+
+    def __init__(self, orders=ORDERS, n_features=2 ** 20):
+        self.orders = tuple(orders)
+        self.n_features = n_features
+        self.counts = {n: np.zeros(n_features, dtype=np.int64) for n in self.orders}
+        self.names = {n: {} for n in self.orders}
+        self.tweets = 0
+
+    def update(self, tweets):
+        batch = {n: Counter() for n in self.orders}
+        for tweet in tweets:
+            tokens = tokenize(tweet)
+            for n in self.orders:
+                batch[n].update(ngrams(tokens, n))
+            self.tweets += 1
+        for n in self.orders:
+            names = self.names[n]
+            buckets = np.fromiter((stable_hash(phrase) % self.n_features for phrase in batch[n]),
+                                  dtype=np.int64, count=len(batch[n]))
+            np.add.at(self.counts[n], buckets, np.fromiter(batch[n].values(), dtype=np.int64, count=len(batch[n])))
+            for bucket, phrase in zip(buckets.tolist(), batch[n]):
+                names.setdefault(bucket, phrase)
+        return self
+
+    def merge(self, other):
+        if other.n_features != self.n_features:
+            raise ValueError('Hashing counters need the same n_features to be merged')
+        for n in self.orders:
+            self.counts[n] += other.counts[n]
+            for bucket, phrase in other.names[n].items():
+                self.names[n].setdefault(bucket, phrase)
+        self.tweets += other.tweets
+        return self
+
+    def top(self, n, limit=100, max_features=None):
+        """The `limit` most frequent n-grams of order n"""
+        names = self.names[n]
+        buckets = np.fromiter(names, dtype=np.int64, count=len(names))
+        return top_series(dict(zip(names.values(), self.counts[n][buckets].tolist())), limit, max_features)
+
+    def save(self, path):
+        arrays = {'orders': np.array(self.orders), 'tweets': np.array(self.tweets)}
+        for n in self.orders:
+            arrays[f'counts_{n}'] = self.counts[n]
+            arrays[f'buckets_{n}'] = np.fromiter(self.names[n], dtype=np.int64, count=len(self.names[n]))
+            arrays[f'names_{n}'] = np.array(list(self.names[n].values()), dtype=str)
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            orders = arrays['orders'].tolist()
+            counter = cls(orders, len(arrays[f'counts_{orders[0]}']))
+            counter.tweets = int(arrays['tweets'])
+            for n in orders:
+                counter.counts[n] = arrays[f'counts_{n}']
+                counter.names[n] = dict(zip(arrays[f'buckets_{n}'].tolist(), arrays[f'names_{n}'].tolist()))
+        return counter
+
+
+def count_ngrams(tweets, orders=ORDERS):
+    """Exact counts of every order in `orders` from a single pass over the tweets"""
+    return NgramCounter(orders).update(tweets)
@@ -1,9 +1,90 @@
 #!/usr/bin/env python3
 """
 Process the new Missing Migrants data to match the format of the existing dataset.
+
+Usage:
+    python process_new_data.py                    # CSV output (default)
+    python process_new_data.py --format parquet   # typed columnar output
+    python process_new_data.py --format both
+    python process_new_data.py --chunksize 100000   # stream a large export in bounded memory
+    python process_new_data.py --incremental        # only transform new or changed rows
+    python process_new_data.py --prerender          # also pre-render the Explore_Regions figures
 """
-import pandas as pd
+import argparse
+import os
 import re
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+INPUT_FILE = 'data/Missing_Migrants_Global_Figures_allData_NEW.csv'
+OUTPUT_FILE = 'data/Missing_Migrants_Global_Figures_filtered.csv'
+PARQUET_OUTPUT_FILE = 'data/Missing_Migrants_Global_Figures_filtered.parquet'
+
+# Reorder columns to match old format
+COLUMNS_ORDER = [
+    'Main ID', 'Incident ID', 'Incident Type', 'Region of Incident',
+    'Incident year', 'Reported Month', 'Number of Dead',
+    'Minimum Estimated Number of Missing', 'Total Number of Dead and Missing',
+    'Number of Survivors', 'Number of Females', 'Number of Males',
+    'Number of Children', 'Country of Origin', 'Region of Origin',
+    'Cause of Death', 'Migration route', 'Location of death',
+    'Information Source', 'Coordinates', 'UNSD Geographical Grouping',
+    'X', 'Y', 'Season', 'Cause of Death Abbreviation'
+]
+
+# Explicit schema for the columnar output. Low-cardinality text becomes
+# categorical, the counts become nullable 16-bit ints (they contain NaNs and
+# no single incident comes close to 32k people) and coordinates float32.
+COUNT_COLUMNS = [
+    'Number of Dead', 'Minimum Estimated Number of Missing',
+    'Total Number of Dead and Missing', 'Number of Survivors',
+    'Number of Females', 'Number of Males', 'Number of Children'
+]
+CATEGORY_COLUMNS = [
+    'Incident Type', 'Region of Incident', 'Reported Month',
+    'Region of Origin', 'Cause of Death', 'Migration route',
+    'UNSD Geographical Grouping', 'Season', 'Cause of Death Abbreviation'
+]
+SCHEMA = {
+    'Incident year': 'Int16',
+    **{col: 'Int16' for col in COUNT_COLUMNS},
+    **{col: 'category' for col in CATEGORY_COLUMNS},
+    'X': 'float32',
+    'Y': 'float32',
+}
+
+# Fast-path patterns for extract_coordinates_vectorized. Strings they do not
+# match cleanly (unicode whitespace, "inf", malformed numbers...) are handed to
+# extract_coordinates one by one so the result stays identical.
+POINT_PATTERN = r'POINT\s*\((?P<x>[0-9.-]+)\s+(?P<y>[0-9.-]+)\)'
+POINT_NUMBER_PATTERN = r'^-?(?:[0-9]+\.?[0-9]*|\.[0-9]+)$'
+NUMBER = r'[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?'
+LAT_LON_PATTERN = rf'^\s*(?P<lat>{NUMBER})\s*,\s*(?P<lon>{NUMBER})\s*$'
+
+# Lookup table equivalent of get_season
+SEASON_BY_MONTH = {
+    **dict.fromkeys(['december', 'january', 'february', '12', '1', '2'], 'Winter'),
+    **dict.fromkeys(['march', 'april', 'may', '3', '4', '5'], 'Spring'),
+    **dict.fromkeys(['june', 'july', 'august', '6', '7', '8'], 'Summer'),
+    **dict.fromkeys(['september', 'october', 'november', '9', '10', '11'], 'Fall'),
+}
+
+# Ordered keyword rules equivalent of get_cause_abbreviation: the first rule
+# with a keyword contained in the lowercased cause wins.
+CAUSE_RULES = [
+    (('drown',), 'Drowning'),
+    (('harsh', 'environmental'), 'Harsh conditions'),
+    (('vehicle', 'accident'), 'Vehicle accident'),
+    (('violence',), 'Violence'),
+    (('sickness', 'medical', 'illness'), 'Sickness'),
+    (('mixed', 'unknown'), 'Mixed or unknown'),
+]
+
 
 def extract_coordinates(coord_string):
     """Extract X and Y coordinates from coordinate string (lat, lon format)."""
@@ -71,63 +152,271 @@ def get_cause_abbreviation(cause):
     else:
         return cause.title()
 
-# Load the new data
-print("Loading new data...")
-df = pd.read_csv('data/Missing_Migrants_Global_Figures_allData_NEW.csv')
-print(f"Loaded {len(df)} rows from 2014 to {df['Incident Year'].max()}")
-
-# Extract X and Y coordinates
-print("Extracting coordinates...")
-coords = df['Coordinates'].apply(extract_coordinates)
-df['X'] = coords.apply(lambda x: x[0])
-df['Y'] = coords.apply(lambda x: x[1])
-
-# Add Season column
-print("Adding season...")
-df['Season'] = df['Month'].apply(get_season)
-
-# Add Cause of Death Abbreviation
-print("Adding cause of death abbreviations...")
-df['Cause of Death Abbreviation'] = df['Cause of Death'].apply(get_cause_abbreviation)
-
-# Rename columns to match old format
-print("Renaming columns...")
-df = df.rename(columns={
-    'Incident Year': 'Incident year',
-    'Month': 'Reported Month',
-    'Migration Route': 'Migration route',
-    'Location of Incident': 'Location of death'
-})
+def extract_coordinates_vectorized(coords):
+    """Vectorized extract_coordinates, returns X and Y as float Series."""
+    x = np.full(len(coords), np.nan)
+    y = np.full(len(coords), np.nan)
+    present = np.flatnonzero(coords.notna().to_numpy())
+    text = pa.array(coords.iloc[present].astype(str).to_numpy(dtype=object), type=pa.string())
+
+    # Try POINT format first (old format)
+    point = pc.extract_regex(text, POINT_PATTERN)
+    is_point = point.is_valid().to_numpy(zero_copy_only=False)
+    point_x, point_y = pc.struct_field(point, 'x'), pc.struct_field(point, 'y')
+    clean_point = pc.fill_null(pc.and_(
+        pc.match_substring_regex(point_x, POINT_NUMBER_PATTERN),
+        pc.match_substring_regex(point_y, POINT_NUMBER_PATTERN)
+    ), False).to_numpy(zero_copy_only=False)
+    rows = present[clean_point]
+    x[rows] = pc.cast(point_x.filter(clean_point), pa.float64()).to_numpy()
+    y[rows] = pc.cast(point_y.filter(clean_point), pa.float64()).to_numpy()
+
+    # Try "lat, lon" format (new format)
+    lat_lon = pc.extract_regex(text, LAT_LON_PATTERN)
+    clean_lat_lon = ~is_point & lat_lon.is_valid().to_numpy(zero_copy_only=False)
+    rows = present[clean_lat_lon]
+    lat_lon = lat_lon.filter(clean_lat_lon)
+    x[rows] = pc.cast(pc.struct_field(lat_lon, 'lon'), pa.float64()).to_numpy()  # X=lon
+    y[rows] = pc.cast(pc.struct_field(lat_lon, 'lat'), pa.float64()).to_numpy()  # Y=lat
+
+    # Everything else goes through the row-wise parser
+    for row in present[~(clean_point | clean_lat_lon)]:
+        x[row], y[row] = extract_coordinates(coords.iat[row])
+    return pd.Series(x, index=coords.index), pd.Series(y, index=coords.index)
+
+def get_season_vectorized(months):
+    """Vectorized get_season using the SEASON_BY_MONTH lookup table."""
+    codes, uniques = pd.factorize(months)
+    keys = pd.Series(uniques, dtype=object).astype(str).str.strip().str.lower()
+    # factorize marks missing months with code -1
+    seasons = np.append(keys.map(SEASON_BY_MONTH).to_numpy(dtype=object), None)
+    seasons[pd.isna(seasons)] = None
+    return pd.Series(seasons[codes], index=months.index)
+
+def get_cause_abbreviation_vectorized(causes):
+    """Vectorized get_cause_abbreviation applying CAUSE_RULES in order.
+
+    The rules are evaluated once per distinct cause and broadcast back to the
+    rows, as there are only a few hundred distinct causes in the export.
+    """
+    codes, uniques = pd.factorize(causes)
+    lowered = pd.Series(uniques, dtype=object).astype(str).str.lower()
+    conditions = [
+        np.logical_or.reduce([lowered.str.contains(k, regex=False).to_numpy() for k in keywords])
+        for keywords, _ in CAUSE_RULES
+    ]
+    labels = [label for _, label in CAUSE_RULES]
+    abbreviations = np.select(conditions, labels, default=lowered.str.title().to_numpy())
+    # factorize marks missing causes with code -1
+    abbreviations = np.append(abbreviations.astype(object), 'Unknown')
+    return pd.Series(abbreviations[codes], index=causes.index)
+
+def add_derived_columns_rowwise(df):
+    """Row-by-row reference implementation of add_derived_columns."""
+    coords = df['Coordinates'].apply(extract_coordinates)
+    df['X'] = coords.apply(lambda x: x[0])
+    df['Y'] = coords.apply(lambda x: x[1])
+    df['Season'] = df['Month'].apply(get_season)
+    df['Cause of Death Abbreviation'] = df['Cause of Death'].apply(get_cause_abbreviation)
+    return df
+
+def add_derived_columns(df, verbose=True):
+    """Add X, Y, Season and Cause of Death Abbreviation to a raw export."""
+    # Extract X and Y coordinates
+    if verbose:
+        print("Extracting coordinates...")
+    df['X'], df['Y'] = extract_coordinates_vectorized(df['Coordinates'])
+
+    # Add Season column
+    if verbose:
+        print("Adding season...")
+    df['Season'] = get_season_vectorized(df['Month'])
+
+    # Add Cause of Death Abbreviation
+    if verbose:
+        print("Adding cause of death abbreviations...")
+    df['Cause of Death Abbreviation'] = get_cause_abbreviation_vectorized(df['Cause of Death'])
+    return df
+
+def transform(df, verbose=True, rowwise=False):
+    """Apply all derived columns, renames and filtering to a raw export."""
+    if rowwise:
+        df = add_derived_columns_rowwise(df)
+    else:
+        df = add_derived_columns(df, verbose=verbose)
+
+    # Rename columns to match old format
+    if verbose:
+        print("Renaming columns...")
+    df = df.rename(columns={
+        'Incident Year': 'Incident year',
+        'Month': 'Reported Month',
+        'Migration Route': 'Migration route',
+        'Location of Incident': 'Location of death'
+    })
+
+    # Only include columns that exist
+    columns_to_keep = [col for col in COLUMNS_ORDER if col in df.columns]
+    df = df[columns_to_keep]
+
+    # Remove rows with missing coordinates
+    if verbose:
+        print(f"Removing rows with missing coordinates...")
+    initial_count = len(df)
+    df = df.dropna(subset=['X', 'Y'])
+    if verbose:
+        print(f"Removed {initial_count - len(df)} rows with missing coordinates")
+    return df
+
+def apply_schema(df, schema=SCHEMA):
+    """Cast the processed frame to the explicit columnar schema."""
+    dtypes = {col: dtype for col, dtype in schema.items() if col in df.columns}
+    return df.astype(dtypes)
+
+def arrow_schema(columns, schema=SCHEMA):
+    """Arrow schema matching SCHEMA, fixed up front so chunks can be appended."""
+    arrow_types = {
+        'category': pa.dictionary(pa.int32(), pa.string()),
+        'Int16': pa.int16(),
+        'float32': pa.float32(),
+        'float64': pa.float64(),
+    }
+    return pa.schema([(col, arrow_types.get(schema.get(col), pa.string())) for col in columns])
+
+def to_arrow(df, schema=SCHEMA):
+    """Convert a processed frame to an Arrow table with the explicit schema."""
+    return pa.Table.from_pandas(apply_schema(df, schema), schema=arrow_schema(df.columns, schema),
+                                preserve_index=False)
+
+def write_parquet(df, path):
+    """Write the processed frame as a typed Parquet file (requires pyarrow)."""
+    pq.write_table(to_arrow(df), path)
+
+def scan_csv_dtypes(input_file, chunksize):
+    """Numeric dtypes pandas infers for each column when reading the whole file.
+
+    Chunks are parsed independently, so a count column without NaNs in one
+    chunk would come back as int and be written as "3" instead of "3.0".
+    Pinning the dtypes seen across the file keeps chunked output identical.
+    """
+    kinds = {}
+    for chunk in pd.read_csv(input_file, chunksize=chunksize):
+        for col, dtype in chunk.dtypes.items():
+            kinds.setdefault(col, set()).add(dtype.kind)
+    dtypes = {}
+    for col, col_kinds in kinds.items():
+        if col_kinds == {'i'}:
+            dtypes[col] = 'int64'
+        elif col_kinds <= {'i', 'f'}:
+            dtypes[col] = 'float64'
+    return dtypes
+
+def process_in_chunks(input_file, chunksize, formats):
+    """Stream the export through transform() without holding it in memory.
+
+    Returns the number of rows read and the processed row count per year.
+    """
+    dtypes = scan_csv_dtypes(input_file, chunksize)
+    writer = None
+    rows_read = 0
+    rows_by_year = pd.Series(dtype='int64')
+    for i, chunk in enumerate(pd.read_csv(input_file, chunksize=chunksize, dtype=dtypes)):
+        rows_read += len(chunk)
+        chunk = transform(chunk, verbose=False)
+        if 'csv' in formats:
+            chunk.to_csv(OUTPUT_FILE, index=False, mode='w' if i == 0 else 'a', header=i == 0)
+        if 'parquet' in formats:
+            table = to_arrow(chunk)
+            if writer is None:
+                writer = pq.ParquetWriter(PARQUET_OUTPUT_FILE, table.schema)
+            writer.write_table(table)
+        rows_by_year = rows_by_year.add(chunk['Incident year'].value_counts(), fill_value=0)
+        print(f"Processed {rows_read} rows...")
+    if writer is not None:
+        writer.close()
+    return rows_read, rows_by_year.astype('int64').sort_index()
+
+def prerender_figures():
+    """Write the pre-rendered Explore_Regions artifacts of the dataset the app reads."""
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+    import prerender
+
+    print(f"\nPre-rendering route figures to {prerender.PRERENDER_DIR}...")
+    print(f"Wrote {prerender.prerender()}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--input', default=INPUT_FILE)
+    parser.add_argument('--format', choices=['csv', 'parquet', 'both'], default='csv',
+                        help='Output format of the processed dataset')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='Stream the export in chunks of this many rows')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Upsert only new or changed rows into the year-partitioned '
+                             'store in data/processed and rebuild the outputs from it')
+    parser.add_argument('--prerender', action='store_true',
+                        help='Pre-render the Explore_Regions figures and panels of every '
+                             'route once the dataset is written (see src/prerender.py)')
+    args = parser.parse_args()
+    formats = ['csv', 'parquet'] if args.format == 'both' else [args.format]
+    if args.chunksize and args.incremental:
+        parser.error('--chunksize and --incremental cannot be combined')
+
+    process(args, formats)
+    if args.prerender:
+        prerender_figures()
+
+def process(args, formats):
+    """Write the processed dataset in the requested formats."""
+    if args.incremental:
+        import incremental
+
+        print("Loading new data...")
+        raw = pd.read_csv(args.input)
+        print(f"Loaded {len(raw)} rows, fingerprinting...")
+        manifest = incremental.update_store(raw)
+        print(f"Updated years: {manifest['years']} (dataset version {manifest['version']})")
+        df = incremental.read_output(raw)
+        if 'csv' in formats:
+            print(f"\nSaving processed data to {OUTPUT_FILE}...")
+            df.to_csv(OUTPUT_FILE, index=False)
+        if 'parquet' in formats:
+            print(f"\nSaving processed data to {PARQUET_OUTPUT_FILE}...")
+            write_parquet(df, PARQUET_OUTPUT_FILE)
+        print(f"\nProcessing complete!")
+        print(f"Final dataset: {len(df)} rows")
+        return
+
+    if args.chunksize:
+        print(f"Streaming new data in chunks of {args.chunksize} rows...")
+        rows_read, rows_by_year = process_in_chunks(args.input, args.chunksize, formats)
+        print(f"\nProcessing complete!")
+        print(f"Read {rows_read} rows, final dataset: {rows_by_year.sum()} rows")
+        print(f"\nRows by year:")
+        print(rows_by_year)
+        return
+
+    # Load the new data
+    print("Loading new data...")
+    df = pd.read_csv(args.input)
+    print(f"Loaded {len(df)} rows from 2014 to {df['Incident Year'].max()}")
+
+    df = transform(df)
+
+    # Save the processed data
+    if 'csv' in formats:
+        print(f"\nSaving processed data to {OUTPUT_FILE}...")
+        df.to_csv(OUTPUT_FILE, index=False)
+    if 'parquet' in formats:
+        print(f"\nSaving processed data to {PARQUET_OUTPUT_FILE}...")
+        write_parquet(df, PARQUET_OUTPUT_FILE)
+
+    print(f"\nProcessing complete!")
+    print(f"Final dataset: {len(df)} rows")
+    print(f"Year range: {df['Incident year'].min()} to {df['Incident year'].max()}")
+    print(f"\nRows by year:")
+    print(df['Incident year'].value_counts().sort_index())
 
-# Reorder columns to match old format
-columns_order = [
-    'Main ID', 'Incident ID', 'Incident Type', 'Region of Incident',
-    'Incident year', 'Reported Month', 'Number of Dead',
-    'Minimum Estimated Number of Missing', 'Total Number of Dead and Missing',
-    'Number of Survivors', 'Number of Females', 'Number of Males',
-    'Number of Children', 'Country of Origin', 'Region of Origin',
-    'Cause of Death', 'Migration route', 'Location of death',
-    'Information Source', 'Coordinates', 'UNSD Geographical Grouping',
-    'X', 'Y', 'Season', 'Cause of Death Abbreviation'
-]
 
-# Only include columns that exist
-columns_to_keep = [col for col in columns_order if col in df.columns]
-df = df[columns_to_keep]
-
-# Remove rows with missing coordinates
-print(f"Removing rows with missing coordinates...")
-initial_count = len(df)
-df = df.dropna(subset=['X', 'Y'])
-print(f"Removed {initial_count - len(df)} rows with missing coordinates")
-
-# Save the processed data
-output_file = 'data/Missing_Migrants_Global_Figures_filtered.csv'
-print(f"\nSaving processed data to {output_file}...")
-df.to_csv(output_file, index=False)
-
-print(f"\nProcessing complete!")
-print(f"Final dataset: {len(df)} rows")
-print(f"Year range: {df['Incident year'].min()} to {df['Incident year'].max()}")
-print(f"\nRows by year:")
-print(df['Incident year'].value_counts().sort_index())
+if __name__ == '__main__':
+    main()
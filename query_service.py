@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+JSON query service over the processed Missing Migrants dataset.
+
+Serves the filters and aggregates of the app to other programs, from the same
+processed dataset (Parquet when present, as the app does) with the same bitmap
+filter index:
+
+    GET /options                           route, cause and year values
+    GET /incidents?route=...&year=2022     filtered incidents, paged with
+                                           limit (default 100) and offset
+    GET /incidents?...&format=geojson      the whole selection streamed as
+                                           csv, parquet or geojson
+    GET /aggregates?by=route,year&cause=...  incidents and summed measures
+                                           per group of route, cause or year
+    GET /version                           dataset version and cache stats
+
+Filters repeat to select several values (`?cause=Drowning&cause=Violence`);
+values of different filters must all match. Every response carries the dataset
+version (X-Dataset-Version) and an ETag, answered with 304 on If-None-Match;
+gzipped bodies have their own ETag. JSON responses are kept in an in-process
+LRU cache and gzipped when the client accepts it; the dataset is reloaded, and
+the cache emptied, when its file changes. An unexpected error is logged and
+answered with a JSON 500.
+
+    python query_service.py --port 8600
+    curl 'http://localhost:8600/aggregates?by=year&route=Central%20Mediterranean'
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+from dataset import compact, dataset_version, prepare, read_dataset  # noqa: E402
+from export import EXPORT_FORMATS, export_chunks, export_columns  # noqa: E402
+from figure_cache import FigureCache  # noqa: E402
+from filter_index import build_filter_index, filter_positions, options  # noqa: E402
+from rollups import MEASURES  # noqa: E402
+
+# Query parameter -> dataset column, for filters and groups
+COLUMNS = {'route': 'Migration route', 'cause': 'Cause of Death', 'year': 'Incident year'}
+STREAM_FORMATS = {name.lower(): name for name in EXPORT_FORMATS}
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 10000
+MAX_ENTRIES = 4096
+MAX_BYTES = 256 * 1024 * 1024
+# Smaller responses are not worth compressing
+GZIP_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+GZIP_MAGIC = b'\x1f\x8b'
+
+logger = logging.getLogger(__name__)
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def integer(query, name, default, highest=None):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise BadRequest(f'{name} must be an integer')
+    if value < 0:
+        raise BadRequest(f'{name} must not be negative')
+    return value if highest is None else min(value, highest)
+
+
+def selections(query):
+    """Filter column -> selected values of a parsed query string"""
+    picked = {}
+    for name, column in COLUMNS.items():
+        values = query.get(name, [])
+        if name == 'year':
+            try:
+                values = [int(value) for value in values]
+            except ValueError:
+                raise BadRequest('year must be an integer')
+        picked[column] = values
+    return picked
+
+
+def entity_tag(digest, gzipped):
+    """ETag of a response: the gzipped and the identity body are different representations"""
+    return f'"{digest}-gzip"' if gzipped else f'"{digest}"'
+
+
+def normalized(path, query):
+    """Query in canonical form: selections are sets, everything else keeps its order"""
+    return path, tuple(sorted((name, tuple(sorted(values)) if name in COLUMNS else tuple(values))
+                              for name, values in query.items()))
+
+
+class QueryService:
+    """Dataset, filter index and response cache shared by all request handlers"""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.cache = FigureCache(max_entries, max_bytes)
+        self.lock = threading.Lock()
+        self.version = None
+        self.state = None
+        self.current()
+
+    def current(self):
+        """(version tag, frame, filter index) of the dataset on disk, reloaded when it changed"""
+        version = dataset_version()
+        if version != self.version:
+            with self.lock:
+                if version != self.version:
+                    df = compact(prepare(read_dataset(version[0])))
+                    tag = hashlib.sha1(f'{version[0]}:{version[1]}'.encode()).hexdigest()[:16]
+                    self.state = (tag, df, build_filter_index(df))
+                    self.version = version
+                    self.cache.clear()
+        return self.state
+
+    def options(self):
+        _, _, index = self.current()
+        values = {name: [value for value in options(index, column) if value == value]
+                  for name, column in COLUMNS.items()}
+        values['year'] = sorted(int(year) for year in values['year'])
+        return json.dumps(values)
+
+    def incidents(self, query):
+        _, df, index = self.current()
+        positions = filter_positions(index, selections(query))
+        total = len(df) if positions is None else len(positions)
+        offset = integer(query, 'offset', 0)
+        limit = integer(query, 'limit', DEFAULT_LIMIT, MAX_LIMIT)
+        page = slice(offset, offset + limit)
+        rows = df.iloc[page] if positions is None else df.take(positions[page])
+        records = rows[export_columns(df)].to_json(orient='records', date_format='iso')
+        return f'{{"total":{total},"offset":{offset},"limit":{limit},"incidents":{records}}}'
+
+    def aggregates(self, query):
+        _, df, index = self.current()
+        by = [name for value in query.get('by', ['route']) for name in value.split(',') if name]
+        unknown = [name for name in by if name not in COLUMNS]
+        if unknown or not by:
+            raise BadRequest(f'by must name groups among {", ".join(COLUMNS)}')
+        positions = filter_positions(index, selections(query))
+        rows = df if positions is None else df.take(positions)
+        groups = rows.groupby([COLUMNS[name] for name in by], observed=True)
+        table = groups[MEASURES].sum()
+        table.insert(0, 'incidents', groups.size())
+        table = table.reset_index().rename(columns={column: name for name, column in COLUMNS.items()})
+        return f'{{"groups":{table.to_json(orient="records")}}}'
+
+    def stream(self, query, export_format):
+        """Byte chunks of the whole selection in an export format"""
+        _, df, index = self.current()
+        return export_chunks(df, filter_positions(index, selections(query)), export_format)
+
+    def describe(self):
+        tag, df, _ = self.current()
+        return json.dumps({'version': tag, 'rows': len(df), 'cache': self.cache.stats()})
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, every response has a length or is chunked
+        protocol_version = 'HTTP/1.1'
+        # headers and body are separate writes, don't wait for the ACK of the first
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def accepts_gzip(self):
+            return 'gzip' in self.headers.get('Accept-Encoding', '')
+
+        def send_response(self, *args):
+            self.responded = True
+            super().send_response(*args)
+            # the body, its ETag and the 304s depend on Accept-Encoding
+            self.send_header('Vary', 'Accept-Encoding')
+
+        def send_headers(self, status, content_type, tag, etag, headers=()):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('X-Dataset-Version', tag)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+
+        def send_error_json(self, status, message):
+            data = json.dumps({'error': message}).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def not_modified(self, digest):
+            '''Answers 304 when the client has a body it can still use
+
+            A client that accepts gzip can use either body; one that does not
+            can only use the identity body.
+            '''
+            tags = [entity_tag(digest, False)] + ([entity_tag(digest, True)] if self.accepts_gzip() else [])
+            matches = [value.strip() for value in self.headers.get('If-None-Match', '').split(',')]
+            for etag in tags:
+                if etag in matches:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return True
+            return False
+
+        def send_cached(self, key, tag, digest, build):
+            gzipped = self.accepts_gzip()
+            cache_key = (tag, key, gzipped)
+            data = service.cache.get(cache_key)
+            if data is None:
+                data = build().encode()
+                if gzipped and len(data) >= GZIP_MIN_BYTES:
+                    data = gzip.compress(data, GZIP_LEVEL)
+                service.cache.put(cache_key, data)
+            headers = [('Content-Length', str(len(data)))]
+            # JSON never starts with the gzip magic number
+            gzipped = data[:2] == GZIP_MAGIC
+            if gzipped:
+                headers.append(('Content-Encoding', 'gzip'))
+            self.send_headers(200, 'application/json', tag, entity_tag(digest, gzipped), headers)
+            self.wfile.write(data)
+
+        def send_stream(self, chunks, export_format, tag, digest):
+            extension, content_type = EXPORT_FORMATS[export_format]
+            # Parquet is already compressed
+            compressor = zlib.compressobj(GZIP_LEVEL, wbits=31) \
+                if self.accepts_gzip() and export_format != 'Parquet' else None
+            headers = [('Transfer-Encoding', 'chunked'),
+                       ('Content-Disposition', f'attachment; filename="missing_migrants.{extension}"')]
+            if compressor:
+                headers.append(('Content-Encoding', 'gzip'))
+            self.send_headers(200, content_type, tag, entity_tag(digest, compressor is not None), headers)
+            for chunk in chunks:
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            if compressor:
+                chunk = compressor.flush()
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+
+        def do_GET(self):
+            self.responded = False
+            try:
+                self.answer()
+            except BadRequest as error:
+                self.send_error_json(400, str(error))
+            except Exception:
+                logger.exception('GET %s failed', self.path)
+                if self.responded:
+                    # part of the response is out, the client sees it cut short
+                    self.close_connection = True
+                else:
+                    self.send_error_json(500, 'Internal server error')
+
+        def answer(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            routes = {
+                '/options': lambda: service.options(),
+                '/incidents': lambda: service.incidents(query),
+                '/aggregates': lambda: service.aggregates(query),
+                '/version': lambda: service.describe(),
+            }
+            if url.path not in routes:
+                self.send_error_json(404, f'Unknown path {url.path}, expected one of {", ".join(routes)}')
+                return
+            tag = service.current()[0]
+            key = normalized(url.path, query)
+            digest = hashlib.sha1(repr((tag, key)).encode()).hexdigest()[:20]
+            export_format = query.get('format', ['json'])[0].lower()
+            if url.path == '/incidents' and export_format in STREAM_FORMATS:
+                chunks = service.stream(query, STREAM_FORMATS[export_format])
+                if not self.not_modified(digest):
+                    self.send_stream(chunks, STREAM_FORMATS[export_format], tag, digest)
+            elif export_format != 'json':
+                raise BadRequest(f'format must be json or one of {", ".join(STREAM_FORMATS)}')
+            elif url.path == '/version':
+                # changes with the cache, never cached
+                data = service.describe().encode()
+                self.send_headers(200, 'application/json', tag, entity_tag(digest, False),
+                                  [('Content-Length', str(len(data)))])
+                self.wfile.write(data)
+            elif not self.not_modified(digest):
+                self.send_cached(key, tag, digest, routes[url.path])
+
+    return Handler
+
+
+def serve(port=0, host='127.0.0.1', **kwargs):
+    """Starts the service on a background thread; returns (server, QueryService, base URL)
+
+    Port 0 picks a free port. Stop it with server.shutdown().
+    """
+    service = QueryService(**kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, service, f'http://{host}:{server.server_address[1]}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON query service over the incident dataset')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--cache-entries', type=int, default=MAX_ENTRIES)
+    args = parser.parse_args()
+
+    server, service, url = serve(args.port, args.host, max_entries=args.cache_entries)
+    print(f'Query service on {url}, dataset version {service.current()[0]} (Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
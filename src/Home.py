@@ -1,9 +1,17 @@
 import streamlit as st
-import pandas as pd
+import numpy as np
 import plotly.express as px
-import plotly.graph_objects as go
 from millify import prettify
 
+from data_table import get_sort_orders, show_table
+from dataset import get_df
+from export import EXPORT_FORMATS, export_file, export_file_name
+from figure_cache import plot_cached
+from filter_index import filter_positions, filter_rows, get_filter_index, options
+from map_clusters import AUTO, DETAIL_OPTIONS, INDIVIDUAL, choose_level, cluster_incidents, get_grid_index
+from profiling import finish_rerun, span, start_rerun
+from spatial_index import get_spatial_index, nearest, within_bbox, within_radius
+
 # Reference: Columns in our dataframe (migrantdf.columns):
 # ['Unnamed: 0', 'Main ID', 'Incident ID', 'Incident Type',
 #    'Region of Incident', 'Incident year', 'Reported Month',
@@ -14,50 +22,66 @@ from millify import prettify
 #    'Migration route', 'Location of death', 'Information Source',
 #    'Coordinates', 'UNSD Geographical Grouping', 'X', 'Y']
 
-# Import the data
-data_url = "data/Missing_Migrants_Global_Figures_filtered.csv"
-
-# Prepare the Data
-
-
-@st.cache
-def get_data():
-    url = data_url
-    return pd.read_csv(url)
-
-
-df = get_data()
-df = df.rename(columns={"X": "lon", "Y": "lat"})
-migrantdf = df
-
+# Time the stages of this rerun when profiling is on (see profiling.py)
+start_rerun('Home')
 
-def get_df():
-    '''Exports the full dataframe for use in other pages'''
-    return df
+# Import the data (loaded once per server process, shared by all pages)
+df = get_df()
 
 
 # 0. Section for  Sidebar filters   *      *       *      *      *       *      *      *       *      *      *       *
+# The filter options and row selection come from a prebuilt bitmap index
+index = get_filter_index()
+
 # 0.1 Migration Route filter
 st.sidebar.write("Data Filters")
 route_input = st.sidebar.multiselect(
-    'Migration Route', df['Migration route'].unique().tolist())
+    'Migration Route', options(index, 'Migration route'))
 if len(route_input) > 0:
-    migrantdf = migrantdf[migrantdf['Migration route'].isin(route_input)]
     show_route_death = True
 
 # 0.2 Cause of death filter
 cause_of_death_input = st.sidebar.multiselect(
-    'Cause of Death', df['Cause of Death'].unique().tolist())
-if len(cause_of_death_input) > 0:
-    migrantdf = migrantdf[migrantdf['Cause of Death'].isin(
-        cause_of_death_input)]
+    'Cause of Death', options(index, 'Cause of Death'))
 
 year_input = st.sidebar.multiselect('Year',
-                                    df['Incident year'].unique().tolist())
+                                    options(index, 'Incident year'))
 if len(year_input) > 0:
     year_input.sort()
-    migrantdf = migrantdf[migrantdf['Incident year'].isin(
-        year_input)]
+
+with span('filters'):
+    positions = filter_positions(index, {'Migration route': route_input,
+                                         'Cause of Death': cause_of_death_input,
+                                         'Incident year': year_input})
+
+# 0.3 Location filter, answered by a prebuilt spatial index
+area_input = st.sidebar.selectbox(
+    'Location', ['Anywhere', 'Near a point', 'Inside a box', 'Nearest incidents to a point'])
+area_state = (area_input,)
+spatial = get_spatial_index()
+with span('location filter'):
+    if area_input == 'Near a point' or area_input == 'Nearest incidents to a point':
+        # Defaults to Lampedusa
+        lat_input = st.sidebar.number_input('Latitude', -90.0, 90.0, 35.5)
+        lon_input = st.sidebar.number_input('Longitude', -180.0, 180.0, 12.6)
+    if area_input == 'Near a point':
+        radius_input = st.sidebar.number_input('Radius (km)', 1.0, 20000.0, 100.0, step=10.0)
+        area_state += (lat_input, lon_input, radius_input)
+        area_positions = within_radius(spatial, lat_input, lon_input, radius_input)
+        positions = area_positions if positions is None else np.intersect1d(positions, area_positions)
+    elif area_input == 'Inside a box':
+        lat_range = st.sidebar.slider('Latitude range', -90.0, 90.0, (30.0, 40.0))
+        lon_range = st.sidebar.slider('Longitude range', -180.0, 180.0, (-10.0, 30.0))
+        area_state += (lat_range, lon_range)
+        area_positions = within_bbox(spatial, *lat_range, *lon_range)
+        positions = area_positions if positions is None else np.intersect1d(positions, area_positions)
+    elif area_input == 'Nearest incidents to a point':
+        k_input = st.sidebar.number_input('Number of incidents', 1, 1000, 20)
+        area_state += (lat_input, lon_input, k_input)
+        positions = np.sort(nearest(spatial, lat_input, lon_input, k_input, positions)[0])
+
+# 0.4 Level of detail of the map markers
+map_detail = st.sidebar.select_slider('Map detail', DETAIL_OPTIONS, value=AUTO)
 
 # 1.0 Introduction in Main Body  *      *       *      *      *       *      *      *       *      *      *       *
 # 1.1 title and subtitle
@@ -82,15 +106,12 @@ elif len(year_input) > 2:
 else:
     year_text = ''
 
-if len(year_input) > 0:
-    statsdf = df[df['Incident year'].isin(
-        year_input)]
-else:
-    statsdf = df
-df_cause_of_death = statsdf.groupby('Cause of Death Abbreviation')['Total Number of Dead and Missing'].sum(
-).sort_values(ascending=False).reset_index()
-df_cause_of_death['Total Number of Dead and Missing'] = df_cause_of_death['Total Number of Dead and Missing'].apply(
-    lambda x: prettify(x))
+with span('statistics'):
+    statsdf = filter_rows(df, index, {'Incident year': year_input})
+    df_cause_of_death = statsdf.groupby('Cause of Death Abbreviation', observed=True)['Total Number of Dead and Missing'].sum(
+    ).sort_values(ascending=False).reset_index()
+    df_cause_of_death['Total Number of Dead and Missing'] = df_cause_of_death['Total Number of Dead and Missing'].apply(
+        lambda x: prettify(x))
 
 st.subheader(f'Global Statistics' + str(year_text))
 st.markdown(f'Most common causes of death')
@@ -104,82 +125,86 @@ with col3:
     st.metric(f'Total Number of Recorded Survivors',
               prettify(statsdf['Number of Survivors'].sum()))
 
+
 # 1.3 Display the map
-fig = go.Figure(data=go.Scattergeo(
-    lon=migrantdf['lon'],
-    lat=migrantdf['lat'],
-    text=migrantdf['Cause of Death Abbreviation'],
-    #hoverlabel=migrantdf['Migration route'],
-    hoverinfo=['text'],
-    mode='markers',
-    marker_color='rgb(210,30,0)',
-    marker=dict(
-        colorscale='Reds'
+# Large selections are aggregated into grid cells so only one marker per cell
+# is sent to the browser. The rendered map is cached for every filter state.
+def build_map():
+    grid = get_grid_index()
+    map_level = choose_level(grid, map_detail, positions)
+
+    if map_level == INDIVIDUAL:
+        migrantdf = df if positions is None else df.take(positions)
+        # changing column names for the hovering capability
+        plotdf = migrantdf[['lat', 'lon']]
+        plotdf['Migration Route'] = migrantdf['Migration route']
+        plotdf['Cause of Death'] = migrantdf['Cause of Death Abbreviation']
+        plotdf['Year'] = migrantdf['Incident year']
+        plotdf['People Dead/Missing'] = migrantdf['Total Number of Dead and Missing']
+
+        plot = px.scatter_geo(plotdf, lat='lat', lon='lon',
+                              hover_name='Migration Route',
+                              hover_data={'Cause of Death': True,
+                                          'People Dead/Missing': True,
+                                          'Year': True,
+                                          'lon': False,
+                                          'lat': False
+                                          },
+                              color_discrete_sequence=['red']
+                              )
+    else:
+        plotdf = cluster_incidents(grid, map_level, positions)
+        plotdf['Area'] = plotdf['Incidents'].astype(str) + ' incidents'
+        # Marker area follows the number of people, at least 1 so empty cells show
+        plotdf['Marker Size'] = plotdf['People Dead/Missing'].clip(lower=1)
+
+        plot = px.scatter_geo(plotdf, lat='lat', lon='lon',
+                              hover_name='Area',
+                              hover_data={'Incidents': False,
+                                          'People Dead/Missing': True,
+                                          'Marker Size': False,
+                                          'lon': False,
+                                          'lat': False
+                                          },
+                              size='Marker Size',
+                              size_max=30,
+                              color_discrete_sequence=['red']
+                              )
+
+    plot.update_layout(
+        title='Locations of the Reports',
+        autosize=False,
+        # width=750,
+        # height=400,
+        geo=dict(
+            scope='world',
+            showcountries=True,
+            showocean=True,
+            landcolor="#f2f2f0",
+            oceancolor="#cad2d3",
+            showcoastlines=False,
+        ),
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
     )
-))
-
-fig.update_layout(
-    title='Locations of the Reports',
-    autosize=False,
-    # width=750,
-    # height=400,
-    geo=dict(
-        scope='world',
-        showcountries=True,
-        showocean=True,
-        landcolor="#f2f2f0",
-        oceancolor="#cad2d3",
-        showcoastlines=False,
-    ),
-    margin={"r": 0, "t": 0, "l": 0, "b": 0},
-)
-
-# changing column names for the hovering capability
-plotdf = migrantdf[['lat', 'lon']]
-plotdf['Migration Route'] = migrantdf['Migration route']
-plotdf['Cause of Death'] = migrantdf['Cause of Death Abbreviation']
-plotdf['Year'] = migrantdf['Incident year']
-plotdf['People Dead/Missing'] = migrantdf['Total Number of Dead and Missing']
-
-plot = px.scatter_geo(plotdf, lat='lat', lon='lon',
-                      hover_name='Migration Route',
-                      hover_data={'Cause of Death': True,
-                                  'People Dead/Missing': True,
-                                  'Year': True,
-                                  'lon': False,
-                                  'lat': False
-                                  },
-                      color_discrete_sequence=['red']
-                      )
-
-plot.update_layout(
-    title='Locations of the Reports',
-    autosize=False,
-    # width=750,
-    # height=400,
-    geo=dict(
-        scope='world',
-        showcountries=True,
-        showocean=True,
-        landcolor="#f2f2f0",
-        oceancolor="#cad2d3",
-        showcoastlines=False,
-    ),
-    margin={"r": 0, "t": 0, "l": 0, "b": 0},
-)
+    return plot
+
 
 st.header("Explore the World Map")
 st.markdown("When you hover over the graph with your mouse, you'll see additional data appear. Each dot on the graph marks a single incident, and the tooltip for that dot gives data on: (1) Cause of Death, (2) How many total people died or went missing for the incident, and (3) Which year the incident occured in.")
+st.markdown("When a selection has too many incidents to draw one by one, nearby incidents are grouped into a grid and each dot shows how many incidents and people it stands for. The *Map detail* slider in the left sidebar chooses the size of the grid, or shows every incident individually.")
+st.markdown("The *Location* filter in the left sidebar narrows the map and table to the incidents within a distance of a point, inside a latitude/longitude box, or to the incidents nearest to a point.")
 st.markdown("The map can be made full-screen. When you hover over the map, a menu should appear above it. The right-most arrows, when selected, will make the map full screen.")
-st.plotly_chart(plot)
+plot_cached('Home map', build_map, route=route_input, cause=cause_of_death_input, year=year_input,
+            area=area_state, detail=map_detail)
 
 #  1.4 Explore tabular data
 st.header("Explore the Tabular Data")
-total_no_deaths = prettify(df['Total Number of Dead and Missing'].sum())
-total_med_deaths = prettify(df[df['Migration route'].isin(
-    ['Central Mediterranean', 'Western Mediterranean', 'Eastern Mediterranean'])]['Total Number of Dead and Missing'].sum())
-total_drown_deaths = prettify(df[df['Cause of Death'].isin(
-    ['Drowning'])]['Total Number of Dead and Missing'].sum())
+with span('totals'):
+    total_no_deaths = prettify(df['Total Number of Dead and Missing'].sum())
+    total_med_deaths = prettify(filter_rows(df, index, {'Migration route': [
+        'Central Mediterranean', 'Western Mediterranean', 'Eastern Mediterranean']})['Total Number of Dead and Missing'].sum())
+    total_drown_deaths = prettify(filter_rows(df, index, {'Cause of Death': [
+        'Drowning']})['Total Number of Dead and Missing'].sum())
 
 st.markdown(
     "The data used in this project is collected and shared by the [Missing Migrants Project](https://missingmigrants.iom.int/). Each incident tracked by the project involves a migrant, refugee, or asylum-seeker who has died or gone missing while migrating across a border.")
@@ -188,5 +213,21 @@ st.markdown(" There have been over " + total_no_deaths + " recorded deaths since
 st.markdown("All of these estimates are undercounts, as the project does not include counts of deaths or disappearances of migrants who have been established in a home, such as a refugee camp, or the deaths of persons who die within their country of origin despite beginning their journey.")
 st.markdown('From the Missing Migrant Project:\n\n *"Missing Migrants Project data include the deaths of migrants who die in transportation accidents, shipwrecks, violent attacks, or due to medical complications during their journeys. It also includes the number of corpses found at border crossings that are categorized as the bodies of migrants, on the basis of belongings and/or the characteristics of the death. For instance, a death of an unidentified person might be included if the decedent is found without any identifying documentation in an area known to be on a migration route.  Deaths during migration may also be identified based on the cause of death, especially if is related to trafficking, smuggling, or means of travel such as on top of a train, in the back of a cargo truck, as a stowaway on a plane, in unseaworthy boats, or crossing a border fence.  While the location and cause of death can provide strong evidence that an unidentified decedent should be included in Missing Migrants Project data, this should always be evaluated in conjunction with migration history and trends."*')
 st.markdown(
-    'Explore the tabular data yourself using the filters in the left side menu.')
-st.dataframe(migrantdf)
+    'Explore the tabular data yourself using the filters in the left side menu. The table shows one page at a time; pick the columns to show and the column to sort by above it.')
+with span('table'):
+    show_table(df, positions, get_sort_orders())
+
+# 1.5 Download the selection, encoded chunk by chunk only once asked for
+st.subheader("Download the Selection")
+st.markdown("Download the incidents selected by the filters in the left sidebar as CSV, Parquet or GeoJSON points, for example to open them in a spreadsheet or a GIS application.")
+export_format = st.selectbox('File format', list(EXPORT_FORMATS))
+export_rows = len(df) if positions is None else len(positions)
+if st.button(f'Prepare {prettify(export_rows)} incidents as {export_format}'):
+    with span('export'):
+        # st.download_button reads the whole file, the only copy of it in memory
+        export_data = export_file(df, positions, export_format)
+    with export_data:
+        st.download_button('Download', export_data, file_name=export_file_name(export_format, export_rows),
+                           mime=EXPORT_FORMATS[export_format][1])
+
+finish_rerun()
@@ -0,0 +1,102 @@
+'''
+Paginated table of incidents with a column picker and server-side sorting.
+
+Only the rows of the current page and the picked columns are sent to the
+browser. Sorting does not re-sort the frame: the stable ascending order of
+every column is computed once per dataset version, and a filtered selection is
+put in order by walking that order and keeping the selected rows.
+'''
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import DERIVED_COLUMNS, dataset_version, get_df, latest_only
+from profiling import timed
+
+# Wide text columns left out of the table until picked
+HIDDEN_COLUMNS = ['Information Source', 'UNSD Geographical Grouping', 'lon', 'lat']
+PAGE_SIZES = [25, 50, 100, 250]
+NO_SORT = 'Dataset order'
+
+
+def table_columns(df):
+    return [col for col in df.columns if col not in DERIVED_COLUMNS]
+
+
+def sort_order(values):
+    '''Row positions in stable ascending order, missing values last'''
+    values = values.reset_index(drop=True)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Categories come in order of appearance, sort them by value instead
+        values = values.cat.reorder_categories(sorted(values.cat.categories, key=str))
+    order = values.sort_values(kind='stable', na_position='last').index.to_numpy()
+    return {'order': order.astype(np.int32), 'missing': int(values.isna().sum())}
+
+
+def build_sort_orders(df):
+    '''Sort order of every table column'''
+    return {col: sort_order(df[col]) for col in table_columns(df)}
+
+
+def sorted_positions(sort_orders, column, rows, positions=None, descending=False):
+    '''Positions of the selected rows (all `rows` when positions is None) sorted by a column
+
+    Descending puts the values in reverse, still with missing values last.
+    '''
+    order, missing = sort_orders[column]['order'], sort_orders[column]['missing']
+    present, absent = order[:len(order) - missing], order[len(order) - missing:]
+    if descending:
+        present = present[::-1]
+    if positions is not None:
+        selected = np.zeros(rows, dtype=bool)
+        selected[positions] = True
+        present, absent = present[selected[present]], absent[selected[absent]]
+    return np.concatenate([present, absent])
+
+
+def page_count(rows, page_size):
+    return max(1, -(-rows // page_size))
+
+
+def show_table(df, positions, sort_orders, key='table'):
+    '''Draws one page of the selected rows of `df` with controls to pick the
+    columns, the sort column and direction, the page size and the page'''
+    columns = table_columns(df)
+    rows = len(df) if positions is None else len(positions)
+
+    picked = st.multiselect('Columns', columns, [col for col in columns if col not in HIDDEN_COLUMNS],
+                            key=f'{key} columns')
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        sort_by = st.selectbox('Sort by', [NO_SORT] + columns, key=f'{key} sort')
+    with col2:
+        descending = st.selectbox('Order', ['Ascending', 'Descending'], key=f'{key} order') == 'Descending'
+    with col3:
+        page_size = st.selectbox('Rows per page', PAGE_SIZES, key=f'{key} page size')
+    with col4:
+        pages = page_count(rows, page_size)
+        page = st.number_input('Page', 1, pages, 1, key=f'{key} page')
+
+    if sort_by == NO_SORT:
+        ordered = np.arange(len(df)) if positions is None else positions
+        if descending:
+            ordered = ordered[::-1]
+    else:
+        ordered = sorted_positions(sort_orders, sort_by, len(df), positions, descending)
+    start = (min(page, pages) - 1) * page_size
+    page_positions = ordered[start:start + page_size]
+
+    st.dataframe(df.take(page_positions)[picked or columns])
+    st.caption(f'Rows {min(start + 1, rows)}–{start + len(page_positions)} of {rows}')
+
+
+@latest_only
+@st.experimental_singleton(show_spinner=False)
+def _load(path, modified):
+    return build_sort_orders(get_df())
+
+
+@timed()
+def get_sort_orders():
+    '''Returns the shared per-column sort orders of the current dataset version'''
+    return _load(*dataset_version())
@@ -0,0 +1,235 @@
+'''
+Shared data access for all pages of the app.
+
+The processed Missing Migrants dataset is loaded once per server process and
+all derived columns are computed a single time, vectorized. The frame is then
+compacted (see `compact()`), whichever file it came from. Pages call
+`get_df()` and receive a shallow view of that shared frame: adding columns to
+the view is fine, but its values must be treated as read-only.
+'''
+import functools
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from profiling import timed
+
+# Import the data
+data_url = "data/Missing_Migrants_Global_Figures_filtered.csv"
+# Typed columnar copy written by `process_new_data.py --format parquet`
+parquet_url = "data/Missing_Migrants_Global_Figures_filtered.parquet"
+tweet_data_url = "data/data.csv"
+
+logger = logging.getLogger(__name__)
+
+# Columns added by prepare() on top of the processed dataset
+DERIVED_COLUMNS = ['date', 'Number of People']
+
+# Dropped at load: the index column of older exports, and the coordinate text
+# that lon/lat were parsed from
+REDUNDANT_COLUMNS = ['Unnamed: 0', 'Coordinates']
+# Whole numbers stored as floats in the CSV because of missing values
+COUNT_COLUMNS = [
+    'Incident year', 'Number of Dead', 'Minimum Estimated Number of Missing',
+    'Total Number of Dead and Missing', 'Number of Survivors', 'Number of Females',
+    'Number of Males', 'Number of Children', 'Number of People',
+]
+# Same low-cardinality columns process_new_data.py stores as dictionaries
+CATEGORY_COLUMNS = [
+    'Incident Type', 'Region of Incident', 'Reported Month', 'Region of Origin',
+    'Cause of Death', 'Migration route', 'UNSD Geographical Grouping', 'Season',
+    'Cause of Death Abbreviation',
+]
+COORDINATE_COLUMNS = ['lon', 'lat']
+INTEGER_TYPES = ['Int8', 'Int16', 'Int32', 'Int64']
+
+MONTH_NUMBERS = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    **{str(month): month for month in range(1, 13)},
+}
+
+
+def latest_only(loader):
+    '''Keeps only the entry of the latest arguments of a singleton loader
+
+    st.experimental_singleton has no eviction: keyed on file versions, it would
+    keep what it loaded for every earlier version until the server restarts.
+    Wrapped loaders clear their cache when called with new arguments, so the
+    previous version is released before the next one is loaded:
+
+        @latest_only
+        @st.experimental_singleton(show_spinner=False)
+        def _load(path, modified): ...
+    '''
+    lock = threading.Lock()
+    latest = []
+
+    @functools.wraps(loader)
+    def load(*args):
+        with lock:
+            if latest and latest[0] != args:
+                loader.clear()
+            latest[:] = [args]
+        return loader(*args)
+    return load
+
+
+def dataset_path():
+    '''Path of the processed dataset, preferring the Parquet file unless the CSV is newer
+
+    `process_new_data.py --format csv` only rewrites the CSV, which would leave
+    an older Parquet file from a previous run in place.
+    '''
+    if not os.path.exists(parquet_url):
+        return data_url
+    if os.path.exists(data_url) and os.path.getmtime(data_url) > os.path.getmtime(parquet_url):
+        return data_url
+    return parquet_url
+
+
+def read_dataset(path, columns=None):
+    '''Reads the processed dataset from disk, memory-mapped if it is Parquet'''
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path, columns=columns, memory_map=True)
+        # Arrow keeps the buffers freed after the conversion for reuse
+        pa.default_memory_pool().release_unused()
+        return df
+    return pd.read_csv(path, usecols=columns)
+
+
+def used_columns(path):
+    '''Columns of the dataset file the app keeps: all of them but REDUNDANT_COLUMNS
+
+    The pages share one frame, and the Home table and the exports show every
+    column, so only the columns nobody uses are left unread.
+    '''
+    if path.endswith('.parquet'):
+        names = pq.read_schema(path).names
+    else:
+        names = pd.read_csv(path, nrows=0).columns
+    return [col for col in names if col not in REDUNDANT_COLUMNS]
+
+
+def month_numbers(months):
+    '''Month names (or numbers) to month numbers, looked up once per distinct value'''
+    codes, uniques = pd.factorize(months)
+    lookup = pd.Series(uniques, dtype=object).astype(str).str.strip().str.lower().map(MONTH_NUMBERS)
+    # factorize marks missing months with code -1
+    return pd.Series(lookup.tolist() + [None], dtype='float64').to_numpy()[codes]
+
+
+def prepare(df):
+    '''Adds the columns derived from the processed dataset that the pages use'''
+    df = df.rename(columns={"X": "lon", "Y": "lat"})
+    if 'Reported Month' in df.columns:
+        df['date'] = pd.to_datetime(pd.DataFrame({
+            'year': df['Incident year'].astype('float64'),
+            'month': month_numbers(df['Reported Month']),
+            'day': 1,
+        }))
+    if 'Number of Survivors' in df.columns:
+        df['Number of People'] = df[['Total Number of Dead and Missing',
+                                     'Number of Survivors']].sum(axis=1)
+    return df
+
+
+def smallest_integer_type(values):
+    '''Smallest nullable integer type holding every value of a column'''
+    lowest, highest = values.min(), values.max()
+    for name in INTEGER_TYPES:
+        limits = np.iinfo(name.lower())
+        if pd.isna(lowest) or (limits.min <= lowest and highest <= limits.max):
+            return name
+    return INTEGER_TYPES[-1]
+
+
+def compact(df):
+    '''The frame with redundant columns dropped and every column in its smallest type
+
+    Counts become the smallest nullable integer type that holds them (sums and
+    groupby sums still come out as Int64), low-cardinality text becomes
+    categorical and coordinates float32. Counts with fractions are left as
+    they are.
+    '''
+    df = df.drop(columns=[col for col in REDUNDANT_COLUMNS if col in df.columns])
+    dtypes = {}
+    for col in COUNT_COLUMNS:
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+            values = df[col].dropna()
+            if (values == np.round(values.astype('float64'))).all():
+                dtypes[col] = smallest_integer_type(values)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            dtypes[col] = 'category'
+    for col in COORDINATE_COLUMNS:
+        if col in df.columns:
+            dtypes[col] = 'float32'
+    return df.astype(dtypes)
+
+
+def memory_report(before, after):
+    '''Type and memory of every column before and after compaction, largest saving first'''
+    report = pd.DataFrame({
+        'dtype before': before.dtypes.astype(str),
+        'MB before': before.memory_usage(deep=True, index=False) / 1e6,
+        'dtype after': after.dtypes.astype(str),
+        'MB after': after.memory_usage(deep=True, index=False) / 1e6,
+    })
+    report['dtype after'] = report['dtype after'].fillna('dropped')
+    report['MB after'] = report['MB after'].fillna(0)
+    report['MB saved'] = report['MB before'] - report['MB after']
+    report = report.sort_values('MB saved', ascending=False)
+    report.loc['total'] = ['', report['MB before'].sum(), '', report['MB after'].sum(), report['MB saved'].sum()]
+    return report.round(3)
+
+
+@latest_only
+@st.experimental_singleton(show_spinner=False)
+def _load(path, modified):
+    '''One shared, prepared and compacted frame per server process, for the current dataset file version'''
+    df = prepare(read_dataset(path, used_columns(path)))
+    compacted = compact(df)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('memory of %s per column:\n%s', path, memory_report(df, compacted).to_string())
+    return compacted
+
+
+def dataset_version():
+    '''Identifies the dataset file currently on disk (path and modification time)'''
+    path = dataset_path()
+    return path, os.path.getmtime(path)
+
+
+@timed()
+def get_df():
+    '''Returns a read-only view of the shared dataset'''
+    return _load(*dataset_version()).copy(deep=False)
+
+
+def read_tweet_data():
+    '''Reads the incidents gathered from Twitter'''
+    tweet_df = pd.read_csv(tweet_data_url)
+    tweet_df['date'] = pd.to_datetime(tweet_df['date'])
+    tweet_df['date_dmy'] = tweet_df['date'].dt.strftime('%d/%m/%Y')
+    tweet_df['number dead'] = tweet_df['number dead'].astype(int)
+    tweet_df['number missing'] = tweet_df['number missing'].astype(int)
+    return tweet_df
+
+
+@latest_only
+@st.experimental_singleton(show_spinner=False)
+def _load_tweet_data(modified):
+    return read_tweet_data()
+
+
+@timed()
+def get_tweet_df():
+    '''Returns a read-only view of the shared Twitter incidents'''
+    return _load_tweet_data(os.path.getmtime(tweet_data_url)).copy(deep=False)
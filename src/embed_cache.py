@@ -0,0 +1,132 @@
+'''
+Persistent cache of tweet embeds from the oEmbed endpoint.
+
+The HTML of every embedded tweet is kept in a JSON file next to the data, so
+after the first fetch a page rerun never waits on the network:
+
+- a fresh entry (younger than `ttl`) is returned as is;
+- a stale entry is returned as is too, and refreshed on a background thread;
+- a missing entry is fetched on a background thread, and the caller waits at
+  most `wait` seconds for it before falling back (the next rerun finds it).
+
+Requests have strict connect and read timeouts, at most one request per tweet
+is in flight, and after a failure a tweet is not asked for again for
+`retry_after` seconds. OEMBED_URL can point the cache to a local stub such as
+fake_twitter_api.py.
+
+    html = get_embed_cache().html(tweet_url)
+'''
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import requests
+import streamlit as st
+
+logger = logging.getLogger(__name__)
+
+OEMBED_URL = os.environ.get('OEMBED_URL', 'https://publish.twitter.com/oembed')
+EMBED_CACHE_PATH = 'data/embeds.json'
+TTL = 24 * 60 * 60
+# (connect, read) timeouts of one request, in seconds
+TIMEOUT = (2, 3)
+WAIT = 1.0
+RETRY_AFTER = 60
+
+
+class EmbedCache:
+    '''Thread-safe oEmbed HTML cache persisted to a JSON file'''
+
+    def __init__(self, path=EMBED_CACHE_PATH, endpoint=OEMBED_URL, ttl=TTL, timeout=TIMEOUT, wait=WAIT,
+                 retry_after=RETRY_AFTER):
+        self.path = path
+        self.endpoint = endpoint
+        self.ttl = ttl
+        self.timeout = timeout
+        self.wait = wait
+        self.retry_after = retry_after
+        self.entries = self.load()
+        self.failures = {}
+        self.pending = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='embed')
+        self.session = requests.Session()
+
+    def load(self):
+        '''Entries saved by a previous run, or none if the file is missing or unreadable'''
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        '''Writes the entries atomically, so a crash never leaves a truncated file'''
+        with self.save_lock:
+            with self.lock:
+                data = json.dumps(self.entries)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(f'{self.path}.part', 'w', encoding='utf-8') as file:
+                file.write(data)
+            os.replace(f'{self.path}.part', self.path)
+
+    def fetch(self, url):
+        '''Fetches and stores the embed HTML of a tweet; returns it, or None on failure'''
+        try:
+            with self.lock:
+                self.requests += 1
+            response = self.session.get(self.endpoint, params={'url': url}, timeout=self.timeout)
+            response.raise_for_status()
+            html = response.json()['html']
+        except (requests.RequestException, ValueError, KeyError) as error:
+            logger.warning('Could not fetch the embed of %s: %s', url, error)
+            with self.lock:
+                self.failures[url] = time.time()
+            return None
+        else:
+            with self.lock:
+                self.entries[url] = {'html': html, 'fetched': time.time()}
+                self.failures.pop(url, None)
+            self.save()
+            return html
+        finally:
+            with self.lock:
+                self.pending.pop(url, None)
+
+    def schedule(self, url):
+        '''Future of the fetch of a tweet, starting one unless it is in flight or failed recently'''
+        with self.lock:
+            future = self.pending.get(url)
+            if future is None and time.time() - self.failures.get(url, float('-inf')) >= self.retry_after:
+                future = self.pending[url] = self.pool.submit(self.fetch, url)
+            return future
+
+    def html(self, url):
+        '''Embed HTML of a tweet, possibly stale, or None when it is not available yet'''
+        with self.lock:
+            entry = self.entries.get(url)
+        if entry is not None:
+            if time.time() - entry['fetched'] >= self.ttl:
+                self.schedule(url)
+            return entry['html']
+        future = self.schedule(url)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=self.wait)
+        except FutureTimeoutError:
+            return None
+
+
+@st.experimental_singleton(show_spinner=False)
+def get_embed_cache():
+    '''The embed cache shared by all sessions'''
+    return EmbedCache()
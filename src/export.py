@@ -0,0 +1,158 @@
+'''
+Export of a selection of incidents as CSV, Parquet or GeoJSON.
+
+Every writer is a generator of byte chunks: the selected rows are taken
+`chunk_rows` at a time, encoded and handed over before the next ones are
+taken, so the first bytes are ready straight away and memory stays bounded by
+one chunk whatever the size of the selection. No copy of the selection and no
+string of the whole file is built; a caller that streams (a file, an HTTP
+response) never holds more than a chunk:
+
+    for chunk in export_chunks(df, positions, 'GeoJSON'):
+        stream.write(chunk)
+'''
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dataset import DERIVED_COLUMNS
+
+CHUNK_ROWS = 10000
+# A GeoJSON feature is about ten times the size of a CSV row, and every chunk
+# is held a few times over while it is encoded: fewer rows keep it as small
+GEOJSON_CHUNK_ROWS = 1000
+# Format -> (file extension, MIME type)
+EXPORT_FORMATS = {
+    'CSV': ('csv', 'text/csv'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+    'GeoJSON': ('geojson', 'application/geo+json'),
+}
+
+
+def export_columns(df):
+    '''Columns of the processed dataset, without the ones the app derives'''
+    return [col for col in df.columns if col not in DERIVED_COLUMNS]
+
+
+def row_chunks(df, positions, columns, chunk_rows=CHUNK_ROWS):
+    '''The selected rows, `chunk_rows` at a time, in dataset order'''
+    if positions is None:
+        positions = np.arange(len(df))
+    for start in range(0, len(positions), chunk_rows):
+        yield df.take(positions[start:start + chunk_rows])[columns]
+
+
+def csv_chunks(df, positions, chunk_rows=CHUNK_ROWS):
+    columns = export_columns(df)
+    yield df[columns].iloc[:0].to_csv(index=False).encode()
+    for chunk in row_chunks(df, positions, columns, chunk_rows):
+        yield chunk.to_csv(index=False, header=False).encode()
+
+
+class ChunkSink:
+    '''Write-only file handing over what was written since the last drain
+
+    Keeps counting the position, which the Parquet footer offsets rely on.
+    '''
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+def arrow_schema(df, columns):
+    '''Arrow schema of the columns, text columns typed as strings even when empty'''
+    schema = pa.Schema.from_pandas(df[columns].iloc[:0], preserve_index=False)
+    for position, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            schema = schema.set(position, field.with_type(pa.string()))
+    return schema
+
+
+def parquet_chunks(df, positions, chunk_rows=CHUNK_ROWS):
+    '''One row group per chunk, each handed over once written'''
+    columns = export_columns(df)
+    schema = arrow_schema(df, columns)
+    sink = ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in row_chunks(df, positions, columns, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def geometries(chunk):
+    '''GeoJSON point geometry of every row, null without coordinates'''
+    lon = chunk['lon'].to_numpy(dtype='float64', na_value=np.nan)
+    lat = chunk['lat'].to_numpy(dtype='float64', na_value=np.nan)
+    return ['null' if np.isnan(x) or np.isnan(y) else f'{{"type":"Point","coordinates":[{x:.6f},{y:.6f}]}}'
+            for x, y in zip(lon.tolist(), lat.tolist())]
+
+
+def geojson_chunks(df, positions, chunk_rows=CHUNK_ROWS):
+    '''A FeatureCollection of points at lon/lat with the other columns as properties'''
+    chunk_rows = min(chunk_rows, GEOJSON_CHUNK_ROWS)
+    columns = export_columns(df)
+    properties = [col for col in columns if col not in ('lon', 'lat')]
+    yield b'{"type":"FeatureCollection","features":['
+    separator = ''
+    for chunk in row_chunks(df, positions, columns, chunk_rows):
+        # one JSON object per line, encoded by pandas
+        values = chunk[properties].to_json(orient='records', lines=True, date_format='iso').splitlines()
+        features = ','.join(f'{{"type":"Feature","geometry":{geometry},"properties":{value}}}'
+                            for geometry, value in zip(geometries(chunk), values))
+        yield (separator + features).encode()
+        separator = ','
+    yield b']}'
+
+
+WRITERS = {'CSV': csv_chunks, 'Parquet': parquet_chunks, 'GeoJSON': geojson_chunks}
+
+
+def export_chunks(df, positions, export_format, chunk_rows=CHUNK_ROWS):
+    '''Byte chunks of the selected rows (all rows when `positions` is None) in a format of EXPORT_FORMATS'''
+    if export_format not in WRITERS:
+        raise ValueError(f'Unknown export format {export_format!r}, expected one of {", ".join(WRITERS)}')
+    return WRITERS[export_format](df, positions, chunk_rows)
+
+
+def export_file(df, positions, export_format, chunk_rows=CHUNK_ROWS):
+    '''The export written chunk by chunk to an unnamed temporary file, rewound
+
+    For consumers that need the whole file at once, such as st.download_button
+    in Streamlit 1.13: it reads the file in one go, which is then the only copy
+    of the export in memory. The file is unbuffered, which st.download_button
+    accepts as a raw file.
+    '''
+    spool = tempfile.TemporaryFile(buffering=0)
+    for chunk in export_chunks(df, positions, export_format, chunk_rows):
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def export_file_name(export_format, rows):
+    extension, _ = EXPORT_FORMATS[export_format]
+    return f'missing_migrants_{rows}_incidents.{extension}'
@@ -0,0 +1,181 @@
+'''
+Cache of rendered Plotly figures shared by all sessions.
+
+Figures are stored as the JSON spec Streamlit sends to the browser, keyed on
+the figure name, the normalized filter state and the dataset version. A cache
+hit skips building, validating and serializing the figure: the stored spec is
+sent as is. The cache is a least-recently-used map bounded both by number of
+entries and by the total size of the stored specs.
+
+    plot_cached('route month', lambda: px.line(...), route=route, cause=causes)
+
+Charts go to the active container, like st.plotly_chart (the main area, or the
+one of an enclosing `with st.sidebar:` / column / expander block), or to the
+one passed as `container=`. Hit rate and occupancy are shown by the profiling
+panel (see profiling.py).
+
+Sending a stored spec as is goes through Streamlit internals, so it is only
+done on the versions `benchmarks/bench_show_spec.py` checked against
+st.plotly_chart (SPEC_STREAMLIT_VERSIONS); any other version draws the spec
+with st.plotly_chart.
+'''
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.tools
+import plotly.utils
+import streamlit as st
+from streamlit.proto.PlotlyChart_pb2 import PlotlyChart as PlotlyChartProto
+
+from dataset import dataset_version
+from profiling import register_stats, span
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES = 512
+MAX_BYTES = 128 * 1024 * 1024
+# Config Streamlit attaches to every chart drawn with st.plotly_chart
+CHART_CONFIG = json.dumps({'showLink': False, 'linkText': False})
+# Streamlit versions whose chart element show_spec() fills directly
+SPEC_STREAMLIT_VERSIONS = ('1.13.0',)
+
+
+class FigureCache:
+    '''Thread-safe LRU cache of figure specs bounded by entries and bytes'''
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        '''Stored spec of a key, or None; counts the lookup as a hit or a miss'''
+        with self.lock:
+            spec = self.entries.get(key)
+            if spec is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            return spec
+
+    def put(self, key, spec):
+        '''Stores a spec, evicting the least recently used ones over the caps'''
+        if len(spec) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= len(self.entries.pop(key))
+            self.entries[key] = spec
+            self.bytes += len(spec)
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        '''Hit rate and occupancy of the cache'''
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'evictions': self.evictions,
+            }
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+def normalize(value):
+    '''Hashable form of a filter value
+
+    Lists and sets are selections, so their order does not matter; tuples are
+    kept in order.
+    '''
+    if isinstance(value, (list, set)):
+        return tuple(sorted((normalize(item) for item in value), key=repr))
+    if isinstance(value, tuple):
+        return tuple(normalize(item) for item in value)
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return None
+    if hasattr(value, 'item'):
+        # numpy scalars
+        return value.item()
+    return value
+
+
+def figure_key(name, state):
+    return name, dataset_version(), tuple(sorted((key, normalize(value)) for key, value in state.items()))
+
+
+def serialize(fig):
+    '''The spec Streamlit would send for a figure'''
+    return json.dumps(plotly.tools.return_figure_from_figure_or_data(fig, validate_figure=True),
+                      cls=plotly.utils.PlotlyJSONEncoder)
+
+
+@st.experimental_singleton(show_spinner=False)
+def get_figure_cache():
+    '''Returns the figure cache shared by all sessions of the server process'''
+    return FigureCache()
+
+
+def cached_spec(name, build, **state):
+    '''Spec of the figure `build()` returns for the given filter state, built at most once'''
+    cache = get_figure_cache()
+    key = figure_key(name, state)
+    spec = cache.get(key)
+    if spec is None:
+        with span('build'):
+            fig = build()
+        with span('serialize'):
+            spec = serialize(fig)
+        cache.put(key, spec)
+        stats = cache.stats()
+        logger.debug('figure cache miss for %s (hit rate %.1f%% over %d lookups)',
+                     name, 100 * stats['hit_rate'], stats['hits'] + stats['misses'])
+    return spec
+
+
+def show_spec(spec, container=None):
+    '''Draws a stored spec like st.plotly_chart would, without rebuilding the figure
+
+    On the Streamlit versions in SPEC_STREAMLIT_VERSIONS (requirements.txt
+    pins one), the spec goes straight into the chart element of `container`
+    (by default the active one), the way st.plotly_chart ends. On any other
+    version it is drawn through st.plotly_chart, which validates it again.
+    '''
+    if st.__version__ not in SPEC_STREAMLIT_VERSIONS:
+        (st if container is None else container).plotly_chart(go.Figure(json.loads(spec)))
+        return
+    enqueue = (st._main if container is None else container)._enqueue
+    proto = PlotlyChartProto()
+    proto.use_container_width = False
+    proto.figure.spec = spec
+    proto.figure.config = CHART_CONFIG
+    # Resolves to the container of the enclosing `with` block, if any
+    enqueue('plotly_chart', proto)
+
+
+def plot_cached(name, build, container=None, **state):
+    '''Draws the figure `build()` returns, served from the cache when possible'''
+    with span(name):
+        show_spec(cached_spec(name, build, **state), container)
+
+
+register_stats('figure cache', lambda: get_figure_cache().stats())
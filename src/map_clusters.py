@@ -0,0 +1,96 @@
+'''
+Server-side clustering of the incident markers on the Home world map.
+
+Incidents are binned into square latitude/longitude cells at several levels of
+detail. The cell of every incident at every level is computed once per dataset
+version, so aggregating any filtered selection is a handful of `bincount`s.
+Only the level that fits the selection is sent to the browser, instead of one
+marker with hover data per incident.
+'''
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import dataset_version, get_df, latest_only
+from profiling import timed
+
+AUTO = 'Auto'
+INDIVIDUAL = 'Individual incidents'
+# Cell size in degrees of each level, coarsest first
+GRID_LEVELS = {'10° grid': 10.0, '5° grid': 5.0, '2° grid': 2.0, '1° grid': 1.0, '0.5° grid': 0.5}
+DETAIL_OPTIONS = [AUTO] + list(GRID_LEVELS) + [INDIVIDUAL]
+# Most markers the map shows before Auto switches to a coarser level
+MAX_MARKERS = 2000
+
+
+def build_grid_index(df):
+    '''Cell of every incident at every grid level, plus the values that get summed'''
+    lat = df['lat'].to_numpy(dtype='float64')
+    lon = df['lon'].to_numpy(dtype='float64')
+    levels = {}
+    for name, size in GRID_LEVELS.items():
+        # Cell rows and columns are well within +-1000 even at 0.5°
+        key = (np.floor(lat / size).astype('int64') + 1000) * 10000 + np.floor(lon / size).astype('int64') + 1000
+        codes, _ = pd.factorize(key)
+        levels[name] = {'codes': codes, 'cells': codes.max() + 1 if len(codes) else 0}
+    return {
+        'lat': lat,
+        'lon': lon,
+        'dead_missing': df['Total Number of Dead and Missing'].to_numpy(dtype='float64', na_value=0),
+        'levels': levels,
+    }
+
+
+def occupied_cells(grid, level, positions=None):
+    codes = grid['levels'][level]['codes']
+    if positions is not None:
+        codes = codes[positions]
+    return np.count_nonzero(np.bincount(codes, minlength=grid['levels'][level]['cells']))
+
+
+def choose_level(grid, detail, positions=None):
+    '''Level to draw for the selected map detail and filtered rows
+
+    `Auto` shows individual incidents when there are at most MAX_MARKERS of
+    them, otherwise the finest grid level with at most MAX_MARKERS cells.
+    '''
+    if detail != AUTO:
+        return detail
+    rows = len(grid['lat']) if positions is None else len(positions)
+    if rows <= MAX_MARKERS:
+        return INDIVIDUAL
+    for level in reversed(GRID_LEVELS):
+        if occupied_cells(grid, level, positions) <= MAX_MARKERS:
+            return level
+    return next(iter(GRID_LEVELS))
+
+
+def cluster_incidents(grid, level, positions=None):
+    '''One row per occupied cell with the incident count, summed dead and missing,
+    and the mean position of its incidents'''
+    codes = grid['levels'][level]['codes']
+    lat, lon, dead_missing = grid['lat'], grid['lon'], grid['dead_missing']
+    if positions is not None:
+        codes, lat, lon, dead_missing = codes[positions], lat[positions], lon[positions], dead_missing[positions]
+    cells = grid['levels'][level]['cells']
+    incidents = np.bincount(codes, minlength=cells)
+    occupied = incidents > 0
+    incidents = incidents[occupied]
+    return pd.DataFrame({
+        'lat': np.bincount(codes, weights=lat, minlength=cells)[occupied] / incidents,
+        'lon': np.bincount(codes, weights=lon, minlength=cells)[occupied] / incidents,
+        'Incidents': incidents,
+        'People Dead/Missing': np.bincount(codes, weights=dead_missing, minlength=cells)[occupied].astype('int64'),
+    })
+
+
+@latest_only
+@st.experimental_singleton(show_spinner=False)
+def _load(path, modified):
+    return build_grid_index(get_df())
+
+
+@timed()
+def get_grid_index():
+    '''Returns the shared grid index of the current dataset version'''
+    return _load(*dataset_version())
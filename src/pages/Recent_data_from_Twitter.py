@@ -1,17 +1,19 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import requests
-import pandas as pd
 import plotly.express as px
-import streamlit.components.v1 as components
 
-def get_data():
-    return pd.read_csv("data/data.csv")
+from dataset import get_tweet_df
+from embed_cache import get_embed_cache
+from profiling import finish_rerun, span, start_rerun, timed
+from reconcile import RADIUS_KM, WINDOW_DAYS, get_reconciliation
 
+# Time the stages of this rerun when profiling is on (see profiling.py)
+start_rerun('Recent_data_from_Twitter')
 
-tweet_df = get_data()
+tweet_df = get_tweet_df()
 
 
+@timed('route figure')
 def plot_deaths_month(route, df):
     route_df = df[df['route'] == route]
     fig = px.bar(
@@ -32,26 +34,24 @@ def plot_deaths_month(route, df):
     st.write(fig)
 
 
+@timed('tweet embed')
 def tweet_embed(tweet_url):
-    link = f'https://publish.twitter.com/oembed?url={tweet_url}'
-    resp = requests.get(link)
-    rjs = resp.json()['html']
+    # cached embed, refreshed in the background; a plain link while it is unavailable
+    rjs = get_embed_cache().html(tweet_url)
+    if rjs is None:
+        return st.markdown(f'[View the Tweet on Twitter]({tweet_url})')
     return components.html(rjs, height=700)
 
 
-tweet_df['date'] = pd.to_datetime(tweet_df['date'])
-tweet_df['date_dmy'] = tweet_df['date'].dt.strftime('%d/%m/%Y')
-tweet_df['number dead'] = tweet_df['number dead'].astype(int)
-tweet_df['number missing'] = tweet_df['number missing'].astype(int)
-
-df1 = tweet_df.groupby(['route', 'date'])[
-    ['number dead', 'number missing']].sum().reset_index()
+with span('aggregates'):
+    df1 = tweet_df.groupby(['route', 'date'])[
+        ['number dead', 'number missing']].sum().reset_index()
 
-plotdf = tweet_df[['lat', 'lon']]
-plotdf['Migration Route'] = tweet_df['route']
-plotdf['Date'] = tweet_df['date_dmy']
-plotdf['Number of People Dead'] = tweet_df['number dead']
-plotdf['Number of People Missing'] = tweet_df['number missing']
+    plotdf = tweet_df[['lat', 'lon']]
+    plotdf['Migration Route'] = tweet_df['route']
+    plotdf['Date'] = tweet_df['date_dmy']
+    plotdf['Number of People Dead'] = tweet_df['number dead']
+    plotdf['Number of People Missing'] = tweet_df['number missing']
 
 plot = px.scatter_geo(
     plotdf,
@@ -112,7 +112,19 @@ Mediterranean routes report the most incidents, and can also be partly because t
 reports on search-and-rescue operations in the Mediterranean.')
 
 st.markdown('Below is a map of these incidents pulled from Twitter.')
-st.plotly_chart(plot)
+with span('map'):
+    st.plotly_chart(plot)
+
+reconciled = get_reconciliation()
+status_counts = reconciled['status'].value_counts()
+
+st.markdown(f'We compared these incidents with the Missing Migrants Project data: an incident from Twitter matches \
+an incident of the Missing Migrants Project within {RADIUS_KM} km of it and {WINDOW_DAYS} days of its month, on the same \
+route and with similar numbers of dead and missing. {status_counts["matched"]} incidents are already in the data, \
+{status_counts["conflicting"]} are close to an incident with a different route or numbers, and {status_counts["new"]} \
+are new.')
+st.dataframe(reconciled[['status', 'conflict', 'route', 'location', 'date_dmy', 'number dead', 'number missing',
+                         'IOM Main ID', 'distance (km)', 'days apart']])
 
 st.markdown('Each incident plotted in the below graph shows the number of people dead or missing. You can filter this data using the migration route filter in the left side menu.')
 
@@ -123,3 +135,5 @@ route_input = [st.sidebar.selectbox(
 if route_input:
     route_s = route_input[0]
     plot_deaths_month(route_s, df1)
+
+finish_rerun()
@@ -0,0 +1,182 @@
+'''
+Pre-rendered Explore_Regions artifacts, written at build time.
+
+`prerender()` builds the route cube once and writes, for every route, the
+serialized figures of the page without a cause filter (see
+`route_figures.DEFAULT_FIGURES`) and the values of its statistics panel and
+country of origin table:
+
+    data/prerendered/<version>/manifest.json     routes table, sidebar options
+    data/prerendered/<version>/routes/03/season.json   figure spec, sent as is
+    data/prerendered/<version>/routes/03/panel.json    stats and origins
+
+The version hashes the dataset file together with the code that loads it and
+renders the figures, and the Plotly version, so artifacts left by another dataset or another
+release are never served; the page then computes everything live, as it does
+whenever a cause filter is active.
+
+    python process_new_data.py --format parquet --prerender
+'''
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+import pandas as pd
+import plotly
+import streamlit as st
+
+import dataset
+import rollups
+import route_figures
+from dataset import compact, dataset_path, dataset_version, latest_only, prepare, read_dataset
+from figure_cache import plot_cached, serialize, show_spec
+from profiling import span, timed
+from rollups import build_route_cube
+
+PRERENDER_DIR = 'data/prerendered'
+MANIFEST = 'manifest.json'
+PANEL = 'panel.json'
+
+
+def artifact_version(path):
+    '''Hash of the dataset file, the loading, rollup and figure code and the Plotly version'''
+    digest = hashlib.sha1(plotly.__version__.encode())
+    for source in (dataset.__file__, rollups.__file__, route_figures.__file__, path):
+        with open(source, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def table_to_json(df):
+    return json.loads(df.to_json(orient='split', index=False, double_precision=15))
+
+
+def table_from_json(table):
+    return pd.read_json(StringIO(json.dumps(table)), orient='split', dtype=False, convert_dates=False)
+
+
+def panel_values(route_cube):
+    '''Statistics panel and country of origin table of one route, as JSON values'''
+    stats = route_cube['stats']
+    return {
+        'stats': {
+            'totals': {name: int(value) for name, value in stats['totals'].items()},
+            'top_causes': stats['top_causes'],
+            'worst_month': stats['worst_month'],
+            'worst_month_total': int(stats['worst_month_total']),
+        },
+        'origins': table_to_json(route_cube['origins']),
+    }
+
+
+def write_artifacts(cube, directory):
+    '''Writes the artifacts of a route cube into an empty directory'''
+    files = {}
+    for number, (route, route_cube) in enumerate(cube['by_route'].items()):
+        files[route] = f'routes/{number:02d}'
+        os.makedirs(os.path.join(directory, files[route]))
+        for name, build in route_figures.DEFAULT_FIGURES.items():
+            with open(os.path.join(directory, files[route], f'{name}.json'), 'w') as f:
+                f.write(serialize(build(route, route_cube)))
+        with open(os.path.join(directory, files[route], PANEL), 'w') as f:
+            json.dump(panel_values(route_cube), f)
+    manifest = {
+        'routes': table_to_json(cube['routes']),
+        'route_options': cube['route_options'],
+        'cause_options': cube['cause_options'],
+        'files': files,
+    }
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump(manifest, f)
+
+
+def prerender(path=None, directory=PRERENDER_DIR):
+    '''Writes the artifacts of the dataset at `path` (the one the app reads by default)
+
+    The new version is moved into place whole, then older versions are removed.
+    Returns the directory of the new version.
+    '''
+    path = path or dataset_path()
+    version = artifact_version(path)
+    target = os.path.join(directory, version)
+    os.makedirs(directory, exist_ok=True)
+    if not os.path.exists(os.path.join(target, MANIFEST)):
+        cube = build_route_cube(compact(prepare(read_dataset(path))))
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=directory)
+        try:
+            write_artifacts(cube, staging)
+            # mkdtemp makes it private; the server may run as another user
+            os.chmod(staging, 0o755)
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(staging, target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+    for name in os.listdir(directory):
+        if name != version and os.path.isdir(os.path.join(directory, name)):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return target
+
+
+def read_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    manifest['routes'] = table_from_json(manifest['routes'])
+    manifest['directory'] = directory
+    return manifest
+
+
+def read_route(directory, files):
+    '''Figure specs and panel values of one route'''
+    with open(os.path.join(directory, files, PANEL)) as f:
+        route_data = json.load(f)
+    route_data['origins'] = table_from_json(route_data['origins'])
+    route_data['figures'] = {}
+    for name in route_figures.DEFAULT_FIGURES:
+        with open(os.path.join(directory, files, f'{name}.json')) as f:
+            route_data['figures'][name] = f.read()
+    return route_data
+
+
+@latest_only
+@st.experimental_singleton(show_spinner=False)
+def _load(path, modified, directory, written):
+    # the routes of the previous version are not needed anymore
+    _load_route.clear()
+    target = os.path.join(directory, artifact_version(path))
+    if not os.path.exists(os.path.join(target, MANIFEST)):
+        return None
+    return read_manifest(target)
+
+
+@st.experimental_singleton(show_spinner=False)
+def _load_route(directory, files):
+    return read_route(directory, files)
+
+
+@timed()
+def get_prerendered(directory=None):
+    '''Returns the manifest of the artifacts of the current dataset version, or None'''
+    directory = directory or PRERENDER_DIR
+    # a new version moved into the directory changes its modification time
+    written = os.path.getmtime(directory) if os.path.isdir(directory) else None
+    return _load(*dataset_version(), directory, written)
+
+
+@timed()
+def get_prerendered_route(manifest, route):
+    '''Returns the figure specs, statistics and origins of a pre-rendered route'''
+    return _load_route(manifest['directory'], manifest['files'][route])
+
+
+def plot_prerendered(name, spec, build, container=None, **state):
+    '''Draws a pre-rendered spec when there is one, otherwise the figure
+    `build()` returns, through the figure cache'''
+    if spec is None:
+        plot_cached(name, build, container, **state)
+        return
+    with span(name):
+        show_spec(spec, container)
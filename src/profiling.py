@@ -0,0 +1,158 @@
+'''
+Timing spans for the stages of a page rerun.
+
+Spans are off unless the app is started with `PROFILE=1` (breakdown of the
+current rerun in the sidebar) or `PROFILE_LOG=<file>` (one JSON line per
+rerun appended to that file), or both:
+
+    PROFILE=1 PROFILE_LOG=profile.jsonl streamlit run src/Home.py
+
+A page calls `start_rerun()` first and `finish_rerun()` last, and wraps its
+stages in `span()` blocks or decorates them with `timed()`; spans nest. Each span
+records its duration and the change of the resident memory of the process
+while it ran (shared by all sessions, so only meaningful on a quiet server).
+When profiling is off, `span()` returns a shared no-op context and `timed()`
+returns the function unchanged. Shared caches report their statistics (hit
+rate, size...) through `register_stats()`; they are shown and logged with
+every rerun.
+
+    start_rerun('Home')
+    with span('filters'):
+        positions = filter_positions(index, selections)
+    finish_rerun()
+'''
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+import streamlit as st
+
+PROFILE_LOG = os.environ.get('PROFILE_LOG')
+SHOW_PANEL = bool(os.environ.get('PROFILE'))
+ENABLED = SHOW_PANEL or bool(PROFILE_LOG)
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+MB = 1024 * 1024
+
+# Every session reruns its page in its own script thread
+_local = threading.local()
+_log_lock = threading.Lock()
+_disabled = contextlib.nullcontext()
+# Name -> function returning a dict of statistics of a shared cache
+_stats = {}
+
+
+def rss_bytes():
+    '''Resident memory of the process, or None where /proc is not available'''
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def memory_delta(before, after):
+    '''Change of resident memory in MB, or None when unknown'''
+    if before is None or after is None:
+        return None
+    return round((after - before) / MB, 2)
+
+
+@contextlib.contextmanager
+def _span(name):
+    rerun = getattr(_local, 'rerun', None)
+    if rerun is None:
+        # outside a profiled rerun, e.g. in a background thread
+        yield
+        return
+    # recorded when it starts, so parents come before their children
+    record = {'name': name, 'depth': rerun['depth']}
+    rerun['spans'].append(record)
+    rerun['depth'] += 1
+    rss = rss_bytes()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record['ms'] = round(1000 * (time.perf_counter() - started), 3)
+        record['rss_delta_mb'] = memory_delta(rss, rss_bytes())
+        rerun['depth'] -= 1
+
+
+def span(name):
+    '''Context manager timing the code it wraps as a stage of the current rerun'''
+    if not ENABLED:
+        return _disabled
+    return _span(name)
+
+
+def timed(name=None):
+    '''Decorator timing every call of a function as a span, named after it by default'''
+    def decorate(func):
+        if not ENABLED:
+            return func
+        label = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _span(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def register_stats(name, stats):
+    '''Reports `stats()` (a dict) of a shared cache with every profiled rerun'''
+    _stats[name] = stats
+
+
+def start_rerun(page):
+    '''Begins recording the spans of a rerun of `page`'''
+    if ENABLED:
+        _local.rerun = {'page': page, 'spans': [], 'depth': 0, 'started': time.perf_counter(), 'rss': rss_bytes()}
+
+
+def breakdown(spans):
+    '''Table of the spans of a rerun, nested stages indented under their parent'''
+    return pd.DataFrame({
+        'Stage': [' ' * record['depth'] + record['name'] for record in spans],
+        'ms': [record.get('ms') for record in spans],
+        'Memory (MB)': [record.get('rss_delta_mb') for record in spans],
+    })
+
+
+def write_log(record, path):
+    line = json.dumps(record) + '\n'
+    with _log_lock, open(path, 'a') as file:
+        file.write(line)
+
+
+def finish_rerun():
+    '''Ends the rerun: shows its breakdown in the sidebar and appends it to the log'''
+    rerun = getattr(_local, 'rerun', None)
+    if rerun is None:
+        return
+    _local.rerun = None
+    rss = rss_bytes()
+    record = {
+        'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+        'page': rerun['page'],
+        'total_ms': round(1000 * (time.perf_counter() - rerun['started']), 3),
+        'rss_mb': None if rss is None else round(rss / MB, 1),
+        'rss_delta_mb': memory_delta(rerun['rss'], rss),
+        'spans': rerun['spans'],
+        'stats': {name: stats() for name, stats in _stats.items()},
+    }
+    if SHOW_PANEL:
+        st.sidebar.markdown(f"**Profile of this rerun:** {record['total_ms']:.0f} ms")
+        st.sidebar.dataframe(breakdown(rerun['spans']))
+        for name, values in record['stats'].items():
+            st.sidebar.markdown(f"**{name.capitalize()}:** " + ', '.join(
+                f"{key.replace('_', ' ')} {value:.1%}" if isinstance(value, float) else f"{key.replace('_', ' ')} {value}"
+                for key, value in values.items()))
+    if PROFILE_LOG:
+        write_log(record, PROFILE_LOG)
@@ -0,0 +1,175 @@
+'''
+Reconciliation of the incidents gathered from Twitter with the IOM dataset.
+
+Every tweet incident is paired with the closest IOM incident that is within
+`radius_km` of it and whose date is within `window_days` of it. IOM dates only
+give the month, so an IOM incident covers the whole month of its date. The
+tweet incident is then:
+
+- `matched` when the pair also has the same route and close totals of dead
+  and missing,
+- `conflicting` when the route or the totals disagree,
+- `new` when no IOM incident is close enough in space and time.
+
+The IOM incidents are swept in date order next to the tweet incidents, also
+sorted by date. Each IOM incident enters a bucket of its 1° grid cell when the
+sweep comes within `window_days` of its month, and leaves it once the sweep is
+past it. A tweet incident is only compared with the incidents currently in
+the cells around it, never with the whole archive:
+
+    reconciled = reconcile(get_tweet_df(), get_df())
+'''
+import os
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import dataset_version, get_df, get_tweet_df, latest_only, tweet_data_url
+from profiling import timed
+from spatial_index import CELL_DEGREES, KM_PER_DEGREE, LON_CELLS, haversine_km, lat_cell, lon_cell
+
+RADIUS_KM = 50
+WINDOW_DAYS = 7
+# Largest difference of the totals of dead and missing still counted as agreeing
+COUNT_TOLERANCE = 0.25
+STATUSES = ['matched', 'conflicting', 'new']
+
+TWEET_COLUMNS = {'route': 'route', 'dead': 'number dead', 'missing': 'number missing'}
+IOM_COLUMNS = {'route': 'Migration route', 'dead': 'Number of Dead', 'missing': 'Minimum Estimated Number of Missing'}
+
+
+def day_numbers(dates):
+    '''Days since 1970-01-01 of a datetime column'''
+    return pd.to_datetime(dates).to_numpy(dtype='datetime64[D]').astype('int64')
+
+
+def month_spans(dates):
+    '''First and last day numbers of the months of a datetime column'''
+    dates = pd.to_datetime(dates)
+    first = dates.to_numpy(dtype='datetime64[M]')
+    return first.astype('datetime64[D]').astype('int64'), (first + 1).astype('datetime64[D]').astype('int64') - 1
+
+
+def totals(df, columns):
+    '''Dead plus missing of every row, missing values counted as 0'''
+    return (df[columns['dead']].astype('float64').fillna(0) + df[columns['missing']].astype('float64').fillna(0)) \
+        .to_numpy()
+
+
+def counts_agree(tweet_totals, iom_totals, tolerance=COUNT_TOLERANCE):
+    '''Whether totals differ by at most one person or by `tolerance` of the larger one'''
+    difference = np.abs(tweet_totals - iom_totals)
+    return difference <= np.maximum(1, tolerance * np.maximum(tweet_totals, iom_totals))
+
+
+def neighbour_cells(lat, lon, radius_km):
+    '''Keys of the grid cells that can hold points within radius_km of a point'''
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(np.cos(np.radians(min(abs(lat) + dlat, 89.9))), 1e-6))
+    lat_cells = range(lat_cell(lat - dlat), lat_cell(lat + dlat) + 1)
+    if dlon >= 180:
+        lon_cells = range(LON_CELLS)
+    else:
+        # wrap around the antimeridian
+        lowest, highest = np.floor((np.array([lon - dlon, lon + dlon]) + 180) / CELL_DEGREES).astype('int64')
+        lon_cells = {cell % LON_CELLS for cell in range(lowest, highest + 1)}
+    return [band * LON_CELLS + cell for band in lat_cells for cell in lon_cells]
+
+
+def pair_incidents(candidates, reference, radius_km=RADIUS_KM, window_days=WINDOW_DAYS):
+    '''Closest reference row of every candidate row in space and time, or -1
+
+    Both frames need lat, lon and date columns; reference dates stand for their
+    whole month. Returns the reference positions, the distances in km and the
+    days between each candidate and its month (0 inside it).
+    '''
+    days = day_numbers(candidates['date'])
+    dated = candidates['date'].notna().to_numpy()
+    lat = candidates['lat'].to_numpy(dtype='float64')
+    lon = candidates['lon'].to_numpy(dtype='float64')
+    first, last = month_spans(reference['date'])
+    ref_lat = reference['lat'].to_numpy(dtype='float64')
+    ref_lon = reference['lon'].to_numpy(dtype='float64')
+    ref_cells = lat_cell(ref_lat) * LON_CELLS + lon_cell(ref_lon)
+    # incidents without coordinates or dates can't be paired
+    known = ~(np.isnan(ref_lat) | np.isnan(ref_lon) | reference['date'].isna().to_numpy())
+    entering = np.flatnonzero(known)[np.argsort(first[known], kind='stable')]
+
+    matches = np.full(len(candidates), -1, dtype='int64')
+    distances = np.full(len(candidates), np.nan)
+    gaps = np.full(len(candidates), np.nan)
+    buckets = defaultdict(deque)
+    entered = 0
+    for position in np.argsort(days, kind='stable'):
+        day = days[position]
+        if not dated[position] or np.isnan(lat[position]) or np.isnan(lon[position]):
+            continue
+        # months starting up to window_days after the candidate enter the sweep
+        while entered < len(entering) and first[entering[entered]] <= day + window_days:
+            row = entering[entered]
+            buckets[ref_cells[row]].append(row)
+            entered += 1
+        rows = []
+        for cell in neighbour_cells(lat[position], lon[position], radius_km):
+            bucket = buckets.get(cell)
+            if not bucket:
+                continue
+            # months ending more than window_days before the candidate have left it;
+            # months are at most 31 days long, so the rest of the bucket can't
+            while bucket and first[bucket[0]] < day - window_days - 31:
+                bucket.popleft()
+            rows.extend(bucket)
+        if not rows:
+            continue
+        rows = np.array(rows)
+        gap = np.maximum(np.maximum(first[rows] - day, day - last[rows]), 0)
+        distance = haversine_km(lat[position], lon[position], ref_lat[rows], ref_lon[rows])
+        close = (gap <= window_days) & (distance <= radius_km)
+        if close.any():
+            # closest in space and time together, ties by reference position
+            score = distance[close] / radius_km + gap[close] / max(window_days, 1)
+            best = np.lexsort((rows[close], score))[0]
+            matches[position] = rows[close][best]
+            distances[position] = distance[close][best]
+            gaps[position] = gap[close][best]
+    return matches, distances, gaps
+
+
+def reconcile(tweets, iom, radius_km=RADIUS_KM, window_days=WINDOW_DAYS, tolerance=COUNT_TOLERANCE):
+    '''Tweet incidents with their status, the IOM incident paired with each and why they disagree'''
+    matches, distances, gaps = pair_incidents(tweets, iom, radius_km, window_days)
+    paired = matches >= 0
+    result = tweets.copy()
+    result['IOM position'] = matches
+    result['IOM Main ID'] = None
+    result['distance (km)'] = distances.round(1)
+    result['days apart'] = gaps
+    result['status'] = 'new'
+    result['conflict'] = ''
+    if paired.any():
+        rows = matches[paired]
+        if 'Main ID' in iom.columns:
+            result.loc[paired, 'IOM Main ID'] = iom['Main ID'].to_numpy()[rows]
+        same_route = tweets[TWEET_COLUMNS['route']].astype(str).to_numpy()[paired] \
+            == iom[IOM_COLUMNS['route']].astype(str).to_numpy()[rows]
+        same_counts = counts_agree(totals(tweets, TWEET_COLUMNS)[paired], totals(iom, IOM_COLUMNS)[rows], tolerance)
+        conflict = np.where(~same_route & ~same_counts, 'route, counts',
+                            np.where(~same_route, 'route', np.where(~same_counts, 'counts', '')))
+        result.loc[paired, 'status'] = np.where(conflict == '', 'matched', 'conflicting')
+        result.loc[paired, 'conflict'] = conflict
+    result['status'] = pd.Categorical(result['status'], categories=STATUSES)
+    return result
+
+
+@latest_only
+@st.experimental_singleton(show_spinner=False)
+def _load(path, modified, tweets_modified):
+    return reconcile(get_tweet_df(), get_df())
+
+
+@timed()
+def get_reconciliation():
+    '''Tweet incidents reconciled with the current dataset, recomputed when either file changes'''
+    return _load(*dataset_version(), os.path.getmtime(tweet_data_url))
@@ -0,0 +1,179 @@
+'''
+Precomputed route rollups for the Explore_Regions page.
+
+All the groupbys that page needs are computed once per dataset version over the
+full dataset and split by migration route. Reruns then only look up the slices
+of the selected route, so interaction latency does not depend on the number of
+incidents.
+
+Monthly measures per cause are kept in a dense array instead of a table (see
+`build_cause_tensor()`), so the curves of any set of causes are a slice and a
+sum over the cause axis rather than a filter and a groupby.
+'''
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from dataset import dataset_version, get_df, latest_only
+from profiling import timed
+
+MEASURES = ['Total Number of Dead and Missing', 'Minimum Estimated Number of Missing',
+            'Number of Females', 'Number of Males', 'Number of Children', 'Number of Survivors']
+
+
+def split_by_route(df):
+    '''Splits an aggregate with a `Migration route` column into per-route slices'''
+    return {route: part.reset_index(drop=True)
+            for route, part in df.groupby('Migration route', observed=True, sort=False)}
+
+
+def route_statistics(totals, month, causes):
+    '''Values shown in the statistics panel of one route
+
+    `worst_month` is None (and its total 0) when no incident of the route has
+    a date.
+    '''
+    worst_month = month.sort_values(by='Total Number of Dead and Missing', ascending=False)
+    top_causes = causes.sort_values(by='Total Number of Dead and Missing', ascending=False)
+    return {
+        'totals': totals,
+        'top_causes': top_causes['Cause of Death'].tolist(),
+        'worst_month': worst_month['date'].dt.strftime('%Y-%m').iloc[0] if len(worst_month) else None,
+        'worst_month_total': worst_month['Total Number of Dead and Missing'].iloc[0] if len(worst_month) else 0,
+    }
+
+
+def country_of_origin(df):
+    '''People per country of origin of one route, with their share of the route total'''
+    df = df[['Country of Origin', 'Number of People']].copy()
+    df['Percentage of People from Country of Origin'] = df['Number of People'] / df['Number of People'].sum()
+    return df.groupby(['Country of Origin'])[['Number of People', 'Percentage of People from Country of Origin']].sum(
+    ).sort_values('Number of People', ascending=False).reset_index()
+
+
+def build_cause_tensor(df, measures=MEASURES):
+    '''Dense monthly sums of every measure by route and cause
+
+    Returns a dict with:
+
+    - `values`: int64 array of shape (measure, route, cause, month) in C order.
+      Every measure is one contiguous slab; inside it, the months of one route
+      and cause are contiguous, so `values[:, route, causes].sum(axis=1)` gives
+      the monthly curves of a route over any set of causes, shape (measure,
+      month). Missing counts add 0.
+    - `incidents`: int64 array of shape (route, cause, month) counting the
+      incidents behind every cell, which tells months without incidents apart
+      from months whose measures add up to 0.
+    - `measures`, `routes`, `causes`, `months`: the labels of the axes, months
+      as a sorted datetime64 array; `route_index` and `cause_index` map labels
+      to positions.
+
+    Rows without a route, cause or date are left out, like groupby does.
+    '''
+    route_codes, routes = pd.factorize(df['Migration route'], sort=True)
+    cause_codes, causes = pd.factorize(df['Cause of Death'], sort=True)
+    month_codes, months = pd.factorize(df['date'], sort=True)
+    known = (route_codes >= 0) & (cause_codes >= 0) & (month_codes >= 0)
+    shape = (len(routes), len(causes), len(months))
+    cells = np.ravel_multi_index((route_codes[known], cause_codes[known], month_codes[known]), shape)
+    size = int(np.prod(shape))
+    values = np.empty((len(measures),) + shape, dtype='int64')
+    for position, measure in enumerate(measures):
+        weights = df[measure].to_numpy(dtype='float64', na_value=0)[known]
+        values[position] = np.bincount(cells, weights=weights, minlength=size).round().reshape(shape)
+    return {
+        'values': values,
+        'incidents': np.bincount(cells, minlength=size).reshape(shape),
+        'measures': list(measures),
+        'routes': list(routes),
+        'causes': list(causes),
+        'months': pd.DatetimeIndex(months).to_numpy(),
+        'route_index': {route: position for position, route in enumerate(routes)},
+        'cause_index': {cause: position for position, cause in enumerate(causes)},
+    }
+
+
+def route_tensor(tensor, route):
+    '''The cause x month slabs of one route, as views of the shared arrays'''
+    position = tensor['route_index'][route]
+    return {
+        'values': tensor['values'][:, position],
+        'incidents': tensor['incidents'][position],
+        'measures': tensor['measures'],
+        'months': tensor['months'],
+        'cause_index': tensor['cause_index'],
+    }
+
+
+def monthly_sums(route_months, causes):
+    '''Months of a route with incidents of the picked causes, and the measures
+    summed over those causes, shape (measure, month)'''
+    picked = [route_months['cause_index'][cause] for cause in causes if cause in route_months['cause_index']]
+    occupied = route_months['incidents'][picked].sum(axis=0) > 0
+    return route_months['months'][occupied], route_months['values'][:, picked].sum(axis=1)[:, occupied]
+
+
+def monthly_measures(route_months, route, causes):
+    '''Monthly sums of the measures of a route over the picked causes
+
+    Same table as grouping the incidents of those causes by route and month:
+    one row per month with at least one incident.
+    '''
+    months, sums = monthly_sums(route_months, causes)
+    table = pd.DataFrame(sums.T, columns=route_months['measures'])
+    table.insert(0, 'date', months)
+    table.insert(0, 'Migration route', route)
+    return table
+
+
+def build_route_cube(df):
+    '''Materializes every Explore_Regions aggregate, keyed by migration route
+
+    Returns a dict with the route totals table (`routes`), the route and cause
+    options for the sidebar, and under `by_route` one dict of slices per route:
+    `season` (season x year), `causes` (cause totals), `month` (monthly
+    measures), `cause_months` (its slabs of the cause tensor, see
+    `build_cause_tensor()`), `origins` and `stats` for the statistics panel.
+    '''
+    season = df.groupby(['Migration route', 'Season', 'Incident year'], observed=True)[
+        'Total Number of Dead and Missing'].sum().reset_index(name='count')
+    causes = df.groupby(['Migration route', 'Cause of Death', 'Cause of Death Abbreviation'], observed=True)[
+        'Total Number of Dead and Missing'].sum().reset_index(name='Total Number of Dead and Missing')
+    month = df.groupby(['Migration route', 'date'], observed=True)[MEASURES].sum().reset_index()
+    routes = df.groupby(['Migration route'], observed=True)[['Total Number of Dead and Missing']].sum(
+    ).sort_values('Total Number of Dead and Missing', ascending=False).reset_index()
+    totals = df.groupby(['Migration route'], observed=True)[MEASURES].sum()
+
+    tables = {'season': season, 'causes': causes, 'month': month}
+    slices = {name: split_by_route(table) for name, table in tables.items()}
+    tensor = build_cause_tensor(df)
+    origins = {route: country_of_origin(part)
+               for route, part in df.groupby('Migration route', observed=True, sort=False)}
+
+    by_route = {}
+    for route in routes['Migration route']:
+        # a route without causes or dates has no rows in some slices
+        by_route[route] = {name: slices[name].get(route, table.iloc[:0].reset_index(drop=True))
+                           for name, table in tables.items()}
+        by_route[route]['origins'] = origins[route]
+        by_route[route]['cause_months'] = route_tensor(tensor, route)
+        by_route[route]['stats'] = route_statistics(
+            totals.loc[route], by_route[route]['month'], by_route[route]['causes'])
+    return {
+        'routes': routes,
+        'route_options': df['Migration route'].dropna().unique().tolist(),
+        'cause_options': df['Cause of Death'].unique().tolist(),
+        'by_route': by_route,
+    }
+
+
+@latest_only
+@st.experimental_singleton(show_spinner=False)
+def _load(path, modified):
+    return build_route_cube(get_df())
+
+
+@timed()
+def get_route_cube():
+    '''Returns the shared route cube of the current dataset version'''
+    return _load(*dataset_version())
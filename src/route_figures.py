@@ -0,0 +1,104 @@
+'''
+Figures of the Explore_Regions page, built from the route cube of rollups.py.
+
+Shared by the page, which draws them through the figure cache, and by the
+pre-render step (prerender.py), which serializes the figures of every route
+without a cause filter ahead of time.
+'''
+import plotly.express as px
+
+from rollups import monthly_measures
+
+
+def season_figure(m_route, route_cube):
+    '''Line plot of deaths by season'''
+    dft = route_cube['season']
+
+    fig = px.line(dft, x='Incident year', y='count',
+                  color='Season', title=f"Lives lost by season along {m_route}")
+    fig.update_layout({
+        'plot_bgcolor': 'rgba(0, 0, 0, 0)',
+        'paper_bgcolor': 'rgba(0, 0, 0, 0)',
+        'xaxis_title': "",
+    })
+    return fig
+
+
+def month_figure(m_route, cause, route_cube):
+    if len(cause) > 0:
+        dft = monthly_measures(route_cube['cause_months'], m_route, cause)
+    else:
+        dft = route_cube['month']
+    fig = px.line(dft, x='date', y=['Total Number of Dead and Missing', 'Number of Females',
+                  'Number of Males', 'Number of Children'], title=f"Lives lost by month along the {m_route} route")
+    fig.update_layout({
+        'plot_bgcolor': 'rgba(0, 0, 0, 0)',
+        'paper_bgcolor': 'rgba(0, 0, 0, 0)',
+        'xaxis_title': "",
+        'yaxis_title': "Number of lives lost",
+    })
+    return fig
+
+
+def survivors_figure(m_route, cause, route_cube):
+    if len(cause) > 0:
+        dft = monthly_measures(route_cube['cause_months'], m_route, cause)
+    else:
+        dft = route_cube['month']
+    fig = px.line(dft, x='date', y=['Total Number of Dead and Missing', 'Number of Survivors'],
+                  title=f"Lives lost and survivors by month along the {m_route} route")
+    fig.update_layout({
+        'plot_bgcolor': 'rgba(0, 0, 0, 0)',
+        'paper_bgcolor': 'rgba(0, 0, 0, 0)',
+        'xaxis_title': "",
+        'yaxis_title': "Number of people",
+    })
+    return fig
+
+
+def causes_figure(m_route, causes, route_cube):
+    dft = route_cube['causes'].sort_values(
+        by='Total Number of Dead and Missing', ascending=False).reset_index()
+    if causes:
+        colors = ['lightslategray', ] * dft.shape[0]
+        for i in causes:
+            try:
+                index = dft[dft['Cause of Death'] == i].index
+                colors[index[0]] = 'crimson'
+            except:
+                pass
+        fig = px.bar(dft, x='Cause of Death Abbreviation', y='Total Number of Dead and Missing',
+                     title=f"Documented causes of death along {m_route}", color=colors)
+    else:
+        fig = px.bar(dft, x='Cause of Death Abbreviation', y='Total Number of Dead and Missing',
+                     title=f"Documented causes of death along {m_route}")
+
+    fig.update_layout({
+        'plot_bgcolor': 'rgba(0, 0, 0, 0)',
+        'paper_bgcolor': 'rgba(0, 0, 0, 0)',
+        'xaxis_title': "",
+    })
+    return fig
+
+
+def comparison_figure(m_route, cause, route_cube):
+    df = route_cube['causes']
+    dft = df[df['Cause of Death'].isin(cause)].sort_values(by='Total Number of Dead and Missing', ascending=False)
+    fig = px.bar(dft, x='Cause of Death Abbreviation', y='Total Number of Dead and Missing', color='Migration route', barmode='group',
+                 title="Lives lost by documented cause of death")
+
+    fig.update_layout({
+        'plot_bgcolor': 'rgba(0, 0, 0, 0)',
+        'paper_bgcolor': 'rgba(0, 0, 0, 0)',
+    })
+
+    return fig
+
+
+# Figures pre-rendered for every route: name -> builder without a cause filter
+DEFAULT_FIGURES = {
+    'season': season_figure,
+    'month': lambda m_route, route_cube: month_figure(m_route, [], route_cube),
+    'survivors': lambda m_route, route_cube: survivors_figure(m_route, [], route_cube),
+    'causes': lambda m_route, route_cube: causes_figure(m_route, [], route_cube),
+}
@@ -0,0 +1,153 @@
+'''
+Spatial index over incident coordinates.
+
+Incidents are bucketed into 1° latitude/longitude cells and sorted by cell, so
+the rows of any cell are one contiguous slice and the cells of one latitude
+band over a range of longitudes are too. Queries only look at the candidate
+cells and then check exact distances, returning row positions into the frame
+the index was built from:
+
+    index = build_spatial_index(df)
+    within_radius(index, 35.50, 12.60, 50)        # rows within 50 km of Lampedusa
+    within_bbox(index, 30, 40, 10, 20)            # rows in a lat/lon box
+    nearest(index, 35.50, 12.60, 10)              # 10 nearest rows and their distances
+'''
+import numpy as np
+import streamlit as st
+
+from dataset import dataset_version, get_df, latest_only
+from profiling import timed
+
+EARTH_RADIUS_KM = 6371.0088
+CELL_DEGREES = 1.0
+LAT_CELLS = int(180 / CELL_DEGREES)
+LON_CELLS = int(360 / CELL_DEGREES)
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat, lon, lats, lons):
+    '''Great-circle distance in km from one point to arrays of points'''
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = np.sin((lats - lat) / 2) ** 2 + np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def lat_cell(lat):
+    return np.clip(np.floor((np.asarray(lat) + 90) / CELL_DEGREES).astype('int64'), 0, LAT_CELLS - 1)
+
+
+def lon_cell(lon):
+    return np.clip(np.floor((np.asarray(lon) + 180) / CELL_DEGREES).astype('int64'), 0, LON_CELLS - 1)
+
+
+def build_spatial_index(df):
+    '''Sorts the incidents by grid cell and records where each cell starts'''
+    lat = df['lat'].to_numpy(dtype='float64')
+    lon = df['lon'].to_numpy(dtype='float64')
+    cells = lat_cell(lat) * LON_CELLS + lon_cell(lon)
+    order = np.argsort(cells, kind='stable')
+    offsets = np.searchsorted(cells[order], np.arange(LAT_CELLS * LON_CELLS + 1))
+    return {'lat': lat[order], 'lon': lon[order], 'rows': order, 'offsets': offsets}
+
+
+def candidate_slots(index, min_lat, max_lat, lon_ranges):
+    '''Sorted-order slots of all incidents in the cells covering the box
+
+    Each latitude band contributes one contiguous run of slots per longitude
+    range; the runs are expanded into slots without a Python loop.
+    '''
+    offsets = index['offsets']
+    bands = np.arange(lat_cell(min_lat), lat_cell(max_lat) + 1) * LON_CELLS
+    starts = np.concatenate([offsets[bands + lon_cell(low)] for low, _ in lon_ranges])
+    ends = np.concatenate([offsets[bands + lon_cell(high) + 1] for _, high in lon_ranges])
+    lengths = ends - starts
+    run_starts = np.cumsum(lengths) - lengths
+    return np.repeat(starts - run_starts, lengths) + np.arange(lengths.sum())
+
+
+def lon_ranges_of(min_lon, max_lon):
+    '''Splits a longitude range crossing the antimeridian (min_lon > max_lon) in two'''
+    if min_lon <= max_lon:
+        return [(min_lon, max_lon)]
+    return [(min_lon, 180.0), (-180.0, max_lon)]
+
+
+def within_bbox(index, min_lat, max_lat, min_lon, max_lon):
+    '''Row positions of incidents inside a bounding box, ascending
+
+    A box with min_lon > max_lon wraps around the antimeridian.
+    '''
+    lon_ranges = lon_ranges_of(min_lon, max_lon)
+    slots = candidate_slots(index, min_lat, max_lat, lon_ranges)
+    lat, lon = index['lat'][slots], index['lon'][slots]
+    inside = (lat >= min_lat) & (lat <= max_lat)
+    in_lon = np.zeros(len(slots), dtype=bool)
+    for low, high in lon_ranges:
+        in_lon |= (lon >= low) & (lon <= high)
+    return np.sort(index['rows'][slots[inside & in_lon]])
+
+
+def radius_candidates(index, lat, lon, radius_km):
+    '''Slots of the incidents in the cells that can be within radius_km of the point'''
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    # Widest longitude span of the circle, at the latitude closest to a pole
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 89.9 or radius_km / (KM_PER_DEGREE * np.cos(np.radians(widest))) >= 180:
+        lon_ranges = [(-180.0, 180.0)]
+    else:
+        dlon = radius_km / (KM_PER_DEGREE * np.cos(np.radians(widest)))
+        low, high = lon - dlon, lon + dlon
+        lon_ranges = lon_ranges_of((low + 180) % 360 - 180, (high + 180) % 360 - 180)
+    return candidate_slots(index, min_lat, max_lat, lon_ranges)
+
+
+def within_radius(index, lat, lon, radius_km):
+    '''Row positions of incidents within radius_km of a point, ascending'''
+    slots = radius_candidates(index, lat, lon, radius_km)
+    distances = haversine_km(lat, lon, index['lat'][slots], index['lon'][slots])
+    return np.sort(index['rows'][slots[distances <= radius_km]])
+
+
+def nearest(index, lat, lon, k, positions=None):
+    '''Row positions of the k incidents nearest to a point and their distances in km
+
+    With `positions`, only those rows are considered. The search radius doubles
+    until it holds k incidents; every incident closer than the k-th one is then
+    inside it.
+    '''
+    allowed = None
+    if positions is not None:
+        allowed = np.zeros(len(index['rows']), dtype=bool)
+        allowed[positions] = True
+        k = min(k, len(positions))
+    k = min(k, len(index['rows']))
+    if k == 0:
+        return np.zeros(0, dtype='int64'), np.zeros(0)
+    radius_km = CELL_DEGREES * KM_PER_DEGREE
+    while True:
+        slots = radius_candidates(index, lat, lon, radius_km)
+        distances = haversine_km(lat, lon, index['lat'][slots], index['lon'][slots])
+        found = distances <= radius_km
+        if allowed is not None:
+            found &= allowed[index['rows'][slots]]
+        if found.sum() >= k or radius_km >= np.pi * EARTH_RADIUS_KM:
+            slots, distances = slots[found], distances[found]
+            if len(distances) > k:
+                partial = np.argpartition(distances, k - 1)[:k]
+                slots, distances = slots[partial], distances[partial]
+            closest = np.argsort(distances, kind='stable')
+            return index['rows'][slots[closest]], distances[closest]
+        radius_km *= 2
+
+
+@latest_only
+@st.experimental_singleton(show_spinner=False)
+def _load(path, modified):
+    return build_spatial_index(get_df())
+
+
+@timed()
+def get_spatial_index():
+    '''Returns the shared spatial index of the current dataset version'''
+    return _load(*dataset_version())